@@ -1,8 +1,8 @@
-from flask import Flask, render_template, request, redirect, jsonify, flash, url_for, session, send_from_directory
+from flask import Flask, render_template, request, redirect, jsonify, flash, url_for, session, send_from_directory, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, login_user, login_required, logout_user, current_user
 from flask_wtf.csrf import CSRFProtect
-from models import db, StudentInfo, MenuItem, Order, Vote, Feedback, FeedbackMedia, Parent, ParentChild, Payment, RewardCategory, Achievement, StudentPoints, RewardItem, StudentRedemption, Directory, Facility, News
+from models import db, StudentInfo, MenuItem, Order, Vote, Feedback, FeedbackMedia, Parent, ParentChild, Payment, RewardCategory, Achievement, StudentPoints, RewardItem, StudentRedemption, Directory, Facility, News, PickupTicket, Stall, KitchenQueueEntry, Grade, SchoolClass, WalletAnomaly
 import os, json, uuid
 from barcode import Code128
 from barcode.writer import ImageWriter
@@ -10,17 +10,42 @@ from flask_migrate import Migrate
 from flask_migrate import upgrade as alembic_upgrade
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
-from transactions import Transaction
+from transactions import Transaction, add_transaction_lines, checkout_lines, order_line, topup_line
 from sqlalchemy import func
 from sqlalchemy.engine import make_url
-from datetime import timedelta
+from datetime import date, datetime, timedelta
 from tz_utils import now_myt, MYT
 from config import config
 from error_handlers import register_error_handlers
+from queue_service import (
+    issue_pickup_ticket, record_completions, close_finished_tickets, ticket_status,
+    stall_queue, stall_queue_fingerprint, stall_queue_counts,
+)
+from service_times import record_serve_times, service_time_report
+from sales_rollup import record_sales, sales_by_item
+from favourites import FAVOURITE_LIMIT, favourite_item_ids, record_favourites
+from spending_rollup import SPENDING_LEVELS, record_spending, spending_breakdown
+from wallet_anomalies import FEATURE_LABELS
+from child_spending import TIMELINE_BUCKETS, record_child_spending, record_topup, spending_timeline
+from sales_analytics import BUCKET_SIZES, forget_sales_buckets, sales_series, weekday_hour_heatmap
+from demand_forecast import get_forecast
+from co_purchase import PAIR_SORT_KEYS, top_pairs
+from pricing import describe_model, get_pricing_model, parse_candidates, price_sweep, project
+from dashboard_stats import dashboard_stats
+from ledger import parse_ledger_filters, ledger_page, ledger_totals, ledger_types, item_totals
+from db_routing import init_routing, replica_reads, use_primary
+from settlement import SETTLEMENT_FIELDS, settlement_range
+from exports import EXPORT_DATASETS, EXPORT_FORMATS, XLSX_MIMETYPE, iter_export, export_filename
+from kitchen_queue import (
+    project_paid_orders, refresh_menu_item,
+    mark_started as kitchen_mark_started, mark_completed as kitchen_mark_completed,
+    remove_orders as kitchen_remove_orders,
+)
 import re
 from functools import wraps
 import time
 from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import NamedTuple
 
 # Load environment variables from .env file if it exists
 try:
@@ -56,6 +81,7 @@ for folder in [app.config['FEEDBACK_UPLOAD_FOLDER'], app.config['MENU_IMAGE_UPLO
 
 # Initialize extensions
 db.init_app(app)
+init_routing(app, db)
 migrate = Migrate(app, db)
 
 login_manager = LoginManager()
@@ -764,6 +790,23 @@ def parent_payment(child_id):
     
     return render_template('parent_payment.html', child=child)
 
+def _credit_qr_payment(payment):
+    """Credit a completed QR payment to the child's balance, with its ledger entry"""
+    child = StudentInfo.query.get(payment.student_id)
+    if child:
+        child.balance += int(payment.amount)
+        child.bump_orders_version()
+        new_tx = Transaction(
+            student_id=child.id,
+            type="Top-up",
+            amount=int(payment.amount),
+            description=f"QR Payment top-up for {child.name} (Transaction: {payment.transaction_id[:8]})"
+        )
+        db.session.add(new_tx)
+        add_transaction_lines(new_tx, [topup_line(int(payment.amount))])
+        record_topup(child.id, int(payment.amount))
+        db.session.commit()
+
 @app.route('/api/payment/status/<transaction_id>')
 @login_required
 def check_payment_status(transaction_id):
@@ -797,10 +840,7 @@ def check_payment_status(transaction_id):
                 payment.bank_reference = result.get('reference_id')
                 
                 # Add balance to child's account
-                child = StudentInfo.query.get(payment.student_id)
-                if child:
-                    child.balance += int(payment.amount)
-                    db.session.commit()
+                _credit_qr_payment(payment)
         else:
             # Fallback to mock behavior for testing
             import time
@@ -810,10 +850,7 @@ def check_payment_status(transaction_id):
                     payment.completed_at = now_myt()
                     
                     # Add balance to child's account
-                    child = StudentInfo.query.get(payment.student_id)
-                    if child:
-                        child.balance += int(payment.amount)
-                        db.session.commit()
+                    _credit_qr_payment(payment)
     
     except Exception as e:
         app.logger.error(f"Payment status check error: {str(e)}")
@@ -825,10 +862,7 @@ def check_payment_status(transaction_id):
                 payment.completed_at = now_myt()
                 
                 # Add balance to child's account
-                child = StudentInfo.query.get(payment.student_id)
-                if child:
-                    child.balance += int(payment.amount)
-                    db.session.commit()
+                _credit_qr_payment(payment)
     
     return jsonify({
         'status': payment.status,
@@ -838,6 +872,62 @@ def check_payment_status(transaction_id):
         'completed_at': payment.completed_at.isoformat() if payment.completed_at else None
     })
 
+def _json_row(row):
+    """A rollup row dict with Decimals as floats and dates as ISO strings"""
+    return {key: float(value) if isinstance(value, Decimal) else
+            value.isoformat() if isinstance(value, date) else value
+            for key, value in row.items()}
+
+CHILD_TIMELINE_DEFAULT_DAYS = {'day': 30, 'week': 12 * 7}
+CHILD_TIMELINE_MAX_DAYS = 366
+# Closed periods only change if an old order is deleted or the rollup is re-run
+CLOSED_PERIOD_CACHE_SECONDS = 24 * 3600
+
+@app.route('/api/parent/children/<int:child_id>/spending')
+@login_required
+@replica_reads
+def api_child_spending(child_id):
+    """A linked child's spending in ?bucket=day|week buckets over ?start=&end=, with top items and top-ups"""
+    if not hasattr(current_user, 'email'):  # Not a parent
+        return jsonify({'error': ACCESS_DENIED}), 403
+    child = StudentInfo.query.get(child_id)
+    if not child or child not in current_user.children:
+        return jsonify({'error': ACCESS_DENIED}), 403
+    
+    bucket = request.args.get('bucket', 'day')
+    if bucket not in TIMELINE_BUCKETS:
+        return jsonify({'error': f"bucket must be one of: {', '.join(TIMELINE_BUCKETS)}"}), 400
+    today = now_myt().date()
+    try:
+        end = date.fromisoformat(request.args['end']) if request.args.get('end') else today
+        start = date.fromisoformat(request.args['start']) if request.args.get('start') else \
+            end - timedelta(days=CHILD_TIMELINE_DEFAULT_DAYS[bucket] - 1)
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+    if start > end or (end - start).days >= CHILD_TIMELINE_MAX_DAYS:
+        return jsonify({'error': f'Range must run forwards and cover at most {CHILD_TIMELINE_MAX_DAYS} days'}), 400
+    
+    timeline = spending_timeline(child.id, start, end, bucket)
+    response = jsonify({
+        'success': True,
+        'child': {'id': child.id, 'name': child.name},
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'bucket': bucket,
+        'totals': _json_row(timeline['totals']),
+        'buckets': [_json_row(row) for row in timeline['buckets']],
+        'top_items': [_json_row(item) for item in timeline['top_items']],
+        'topups': [_json_row(topup) for topup in timeline['topups']],
+    })
+    # A period that ended before today is settled: let the browser keep it,
+    # and answer revalidations of the current period with 304 when unchanged
+    if end < today:
+        response.headers['Cache-Control'] = f'private, max-age={CLOSED_PERIOD_CACHE_SECONDS}'
+    else:
+        response.headers['Cache-Control'] = 'private, no-cache'
+    response.add_etag()
+    return response.make_conditional(request)
+
 def generate_bank_qr_code(amount, transaction_id):
     """Generate bank QR code data using real payment provider"""
     from bank_qr_integration import get_payment_provider
@@ -1134,30 +1224,8 @@ def student_profile():
 def admin_dashboard():
     print(f"Admin dashboard accessed by user: {current_user.name}, role: {current_user.role}")
     if current_user.role == 'admin':
-        # Calculate statistics
-        total_students = StudentInfo.query.count()
-        
-        # Active orders: paid orders that are not completed
-        active_orders = Order.query.filter_by(
-            payment_status='paid',
-            status='pending'
-        ).count()
-        
-        # Total revenue: sum of all paid orders
-        total_revenue_result = db.session.query(func.sum(Order.total_price)).filter_by(
-            payment_status='paid'
-        ).scalar()
-        total_revenue = float(total_revenue_result) if total_revenue_result else 0.0
-        
-        # Pending feedback: all feedback (assuming all feedback needs review)
-        pending_feedback = Feedback.query.count()
-        
-        stats = {
-            'total_students': total_students,
-            'active_orders': active_orders,
-            'total_revenue': total_revenue,
-            'pending_feedback': pending_feedback
-        }
+        # Counts and revenue from the rollup/read-model tables, shared for a few seconds
+        stats = dashboard_stats()
         
         return render_template('admin.html', user=current_user, stats=stats)
     else:
@@ -1252,97 +1320,136 @@ def delete_news(news_id):
 @login_required
 def staff_dashboard():
     if current_user.role == 'staff':
-        # Calculate statistics
-        # Active orders: paid orders that are not completed
-        active_orders = Order.query.filter_by(
-            payment_status='paid',
-            status='pending'
-        ).count()
-        
-        # Total revenue: sum of all paid orders
-        total_revenue_result = db.session.query(func.sum(Order.total_price)).filter_by(
-            payment_status='paid'
-        ).scalar()
-        total_revenue = float(total_revenue_result) if total_revenue_result else 0.0
-        
-        # Paid orders: count of all paid orders
-        paid_orders = Order.query.filter_by(payment_status='paid').count()
-        
-        # Pending feedback: all feedback (assuming all feedback needs review)
-        pending_feedback = Feedback.query.count()
-        
-        stats = {
-            'active_orders': active_orders,
-            'total_revenue': total_revenue,
-            'paid_orders': paid_orders,
-            'pending_feedback': pending_feedback
-        }
+        # Counts and revenue from the rollup/read-model tables, shared for a few seconds
+        stats = dashboard_stats()
         
         return render_template('staff.html', user=current_user, stats=stats)
     else:
         return redirect(url_for('home'))
 
 
-def _get_staff_student_paid_summaries(search_query: str):
-    """Helper: return list of students with their paid-order summaries."""
-    # Base query: only students (exclude parents and other future roles)
-    students_query = StudentInfo.query
+def _query_staff_student_paid_rows(search_query: str, page: int = 1, per_page: int = None, since: int = None):
+    """Helper: one aggregated query of paid-order totals per (student, menu item).
+
+    Returns plain row tuples of (student_id, name, ic_number, balance, orders_version,
+    menu_item_id, item_name, item_price, quantity, total_price).
+    The main view (no search) only returns students with paid orders; a search also
+    returns matching students without any, with the item columns set to None.
+    Students are paged by name; one extra student is fetched to detect a next page.
+    With ``since``, only students whose orders_version is newer, or who changed within
+    ORDERS_CURSOR_OVERLAP_SECONDS, are returned (unpaged), including ones whose paid
+    orders were all refunded. Each row also carries the student's orders_version.
+    """
+    page_query = db.session.query(StudentInfo.id)
     if search_query:
         like_pattern = f"%{search_query}%"
-        students_query = students_query.filter(
+        page_query = page_query.filter(
             db.or_(
                 StudentInfo.name.ilike(like_pattern),
                 StudentInfo.ic_number.ilike(like_pattern),
             )
         )
-
-    students = students_query.order_by(StudentInfo.name.asc()).all()
-
-    summaries = []
-    from collections import defaultdict
-
-    for student in students:
-        paid_orders = (
-            Order.query.filter_by(student_id=student.id, payment_status="paid")
-            .order_by(Order.order_time.desc())
-            .all()
+    if since is not None:
+        overlap = timedelta(seconds=app.config["ORDERS_CURSOR_OVERLAP_SECONDS"])
+        page_query = page_query.filter(
+            db.or_(
+                StudentInfo.orders_version > since,
+                StudentInfo.orders_changed_at >= now_myt().replace(tzinfo=None) - overlap,
+            )
         )
-
-        grouped = defaultdict(
-            lambda: {"name": None, "quantity": 0, "price": 0.0, "total_price": 0.0}
+    elif not search_query:
+        page_query = page_query.filter(
+            db.session.query(Order.id)
+            .filter(Order.student_id == StudentInfo.id, Order.payment_status == "paid")
+            .exists()
         )
+    page_query = page_query.order_by(StudentInfo.name.asc(), StudentInfo.id.asc())
+    if per_page and since is None:
+        page_query = page_query.limit(per_page + 1).offset((page - 1) * per_page)
+    page_ids = page_query.subquery()
+
+    # Outer joins keep searched students without paid orders in the result
+    paid_join = db.and_(
+        Order.student_id == StudentInfo.id,
+        Order.payment_status == "paid",
+    )
+    return (
+        db.session.query(
+            StudentInfo.id,
+            StudentInfo.name,
+            StudentInfo.ic_number,
+            StudentInfo.balance,
+            StudentInfo.orders_version,
+            MenuItem.id,
+            MenuItem.name,
+            MenuItem.price,
+            func.sum(Order.quantity),
+            func.sum(Order.total_price),
+        )
+        .select_from(StudentInfo)
+        .join(page_ids, page_ids.c.id == StudentInfo.id)
+        .outerjoin(Order, paid_join)
+        .outerjoin(MenuItem, MenuItem.id == Order.menu_item_id)
+        .group_by(
+            StudentInfo.id,
+            StudentInfo.name,
+            StudentInfo.ic_number,
+            StudentInfo.balance,
+            StudentInfo.orders_version,
+            MenuItem.id,
+            MenuItem.name,
+            MenuItem.price,
+        )
+        .order_by(
+            StudentInfo.name.asc(),
+            StudentInfo.id.asc(),
+            func.max(Order.order_time).desc(),
+        )
+        .all()
+    )
 
-        for order in paid_orders:
-            menu_id = order.menu_item_id
-            item = order.item
-            if grouped[menu_id]["name"] is None and item is not None:
-                grouped[menu_id]["name"] = item.name
-                grouped[menu_id]["price"] = float(item.price or 0)
-            grouped[menu_id]["quantity"] += order.quantity or 0
-            grouped[menu_id]["total_price"] += float(order.total_price or 0)
-
-        paid_items = []
-        total_paid = 0.0
-        for data in grouped.values():
-            if not data["name"]:
-                continue
-            paid_items.append(data)
-            total_paid += data["total_price"]
 
-        summaries.append(
+def _get_staff_student_paid_summaries(search_query: str, page: int = 1, per_page: int = None, since: int = None):
+    """Helper: return (summaries, has_next) for students and their paid-order summaries."""
+    rows = _query_staff_student_paid_rows(search_query, page, per_page, since)
+
+    summaries = []
+    for (student_id, name, ic_number, balance, orders_version, menu_item_id, item_name,
+         item_price, quantity, total_price) in rows:
+        if not summaries or summaries[-1]["student"]["id"] != student_id:
+            summaries.append(
+                {
+                    "student": {"id": student_id, "name": name, "ic_number": ic_number},
+                    "cart_items": [],
+                    "total": 0.0,
+                    "user_balance": float(balance or 0),
+                    "version": orders_version,
+                }
+            )
+        if menu_item_id is None:
+            continue
+        entry = summaries[-1]
+        line_total = float(total_price or 0)
+        entry["cart_items"].append(
             {
-                "student": student,
-                "cart_items": paid_items,
-                "total": total_paid,
-                "user_balance": float(student.balance or 0),
+                "name": item_name,
+                "quantity": int(quantity or 0),
+                "price": float(item_price or 0),
+                "total_price": line_total,
             }
         )
+        entry["total"] += line_total
 
-    # On main view (no search), only show students who actually have paid orders
-    if not search_query:
-        summaries = [s for s in summaries if s["cart_items"]]
+    has_next = bool(per_page) and since is None and len(summaries) > per_page
+    if has_next:
+        summaries = summaries[:per_page]
+    return summaries, has_next
 
-    return summaries
+
+def _get_page_arg():
+    """Read a 1-based ?page= argument, falling back to the first page."""
+    page = request.args.get("page", 1, type=int) or 1
+    return max(page, 1)
 
 
 @app.route("/staff/student-orders", methods=["GET"])
@@ -1354,42 +1461,68 @@ def staff_student_orders():
         return redirect(url_for("student_dashboard"))
 
     search_query = (request.args.get("search") or "").strip()
-    students_data = _get_staff_student_paid_summaries(search_query)
+    page = _get_page_arg()
+    students_data, has_next = _get_staff_student_paid_summaries(
+        search_query, page, app.config["STUDENTS_PER_PAGE"]
+    )
 
     return render_template(
         "staff_student_orders.html",
         students_data=students_data,
         search_query=search_query,
+        page=page,
+        has_next=has_next,
     )
 
 
 @app.route("/api/staff/student-orders", methods=["GET"])
 @login_required
 def api_staff_student_orders():
-    """JSON API for staff_student_orders (used for live search/refresh)."""
+    """JSON API for staff_student_orders (used for live search/refresh).
+
+    Pass the returned ``cursor`` back as ``?since=`` to receive only students whose
+    paid orders or balance changed since then (``incremental`` is true). Students
+    changed within ORDERS_CURSOR_OVERLAP_SECONDS are sent again, since versions are
+    drawn before commit; clients skip entries whose ``version`` they already applied.
+    """
     if current_user.role not in ["staff", "admin"]:
         return jsonify({"success": False, "error": "Unauthorized"}), 403
 
     search_query = (request.args.get("search") or "").strip()
-    summaries = _get_staff_student_paid_summaries(search_query)
+    page = _get_page_arg()
+    since = request.args.get("since", type=int)
+
+    # Read the cursor before the data so changes committed mid-request are picked up next time
+    cursor = db.session.query(func.max(StudentInfo.orders_version)).scalar() or 0
+
+    summaries, has_next = _get_staff_student_paid_summaries(
+        search_query, page, app.config["STUDENTS_PER_PAGE"], since
+    )
 
     students = []
     for entry in summaries:
-        student = entry["student"]
         students.append(
             {
-                "student": {
-                    "id": student.id,
-                    "name": student.name,
-                    "ic_number": student.ic_number,
-                },
+                "student": entry["student"],
                 "wallet_balance": entry["user_balance"],
                 "total_paid": entry["total"],
                 "items": entry["cart_items"],
+                "version": entry["version"],
             }
         )
 
-    return jsonify({"success": True, "students": students})
+    if since is not None:
+        return jsonify({"success": True, "students": students, "cursor": cursor, "incremental": True})
+    return jsonify(
+        {
+            "success": True,
+            "students": students,
+            "page": page,
+            "has_next": has_next,
+            "cursor": cursor,
+            "incremental": False,
+        }
+    )
 
 
 @app.route("/staff/student-orders/<int:student_id>", methods=["GET", "POST"])
@@ -1436,11 +1569,12 @@ def staff_student_orders_detail(student_id):
 
         try:
             total_amount = validate_payment_conditions(student, cart_orders)
-            process_payment_transaction(student, cart_orders, total_amount)
+            ticket = process_payment_transaction(student, cart_orders, total_amount)
             db.session.commit()
 
             flash(
-                f"Payment of RM {total_amount:.2f} recorded for {student.name}.",
+                f"Payment of RM {total_amount:.2f} recorded for {student.name}. "
+                f"Pickup number #{ticket.pickup_number}.",
                 "success",
             )
             return redirect(url_for("staff_student_orders_detail", student_id=student.id))
@@ -1477,6 +1611,12 @@ def get_menu_data():
     ).distinct().all()
     return items, [cat[0] for cat in categories]
 
+def get_favourite_items(student_id, items):
+    """The student's "order again" items, best first, taken from the already loaded menu"""
+    available = {item.id: item for item in items}
+    favourites = [available[item_id] for item_id in favourite_item_ids(student_id) if item_id in available]
+    return favourites[:FAVOURITE_LIMIT]
+
 def build_cart_summary(student):
     """Build a summary of the student's current unpaid cart items"""
     from collections import defaultdict
@@ -1566,9 +1706,11 @@ def order():
         return handle_order_submission()
     
     items, categories = get_menu_data()
+    favourites = []
     
     # Load existing unpaid orders for the cart
     if current_user.role == 'student':
+        favourites = get_favourite_items(current_user.id, items)
         student = StudentInfo.query.get(current_user.id)
         if student:
             unpaid_orders = Order.query.filter_by(student_id=student.id, payment_status='unpaid').all()
@@ -1595,7 +1737,7 @@ def order():
     else:
         existing_cart = []
     
-    return render_template("order.html", items=items, categories=categories, existing_cart=existing_cart)
+    return render_template("order.html", items=items, categories=categories, existing_cart=existing_cart, favourites=favourites)
 
 
 @app.route("/admin/menu/new", methods=["GET", "POST"])
@@ -1614,6 +1756,7 @@ def create_menu_item():
         category = sanitize_input(request.form.get('category'))
         price_input = request.form.get('price', '').strip()
         is_available = request.form.get('is_available') == 'on'
+        stall_id = request.form.get('stall_id', type=int)
         image_file = request.files.get('image')
 
         if not name:
@@ -1633,6 +1776,7 @@ def create_menu_item():
         temp_item.category = category if category else None
         temp_item.price = price_decimal
         temp_item.is_available = is_available
+        temp_item.stall_id = stall_id
 
         new_image_filename = None
 
@@ -1661,6 +1805,7 @@ def create_menu_item():
     return render_template(
         'edit_menu_item.html',
         item=temp_item,
+        stalls=Stall.query.filter_by(is_active=True).order_by(Stall.display_order, Stall.name).all(),
         form_action=url_for('create_menu_item'),
         is_new=True
     )
@@ -1682,6 +1827,7 @@ def edit_menu_item(item_id):
         category = sanitize_input(request.form.get('category'))
         price_input = request.form.get('price', '').strip()
         is_available = request.form.get('is_available') == 'on'
+        stall_id = request.form.get('stall_id', type=int)
         image_file = request.files.get('image')
 
         if not name:
@@ -1705,6 +1851,7 @@ def edit_menu_item(item_id):
             item.category = category if category else None
             item.price = price_decimal
             item.is_available = is_available
+            item.stall_id = stall_id
 
             if image_file and image_file.filename:
                 new_image_filename = save_menu_image(image_file)
@@ -1712,6 +1859,7 @@ def edit_menu_item(item_id):
                 if old_image and old_image != new_image_filename:
                     delete_menu_image(old_image)
 
+            refresh_menu_item(item)
             db.session.commit()
             flash(f"{item.name} updated successfully.", "success")
             return redirect(url_for('order'))
@@ -1731,6 +1879,7 @@ def edit_menu_item(item_id):
     return render_template(
         'edit_menu_item.html',
         item=item,
+        stalls=Stall.query.filter_by(is_active=True).order_by(Stall.display_order, Stall.name).all(),
         form_action=url_for('edit_menu_item', item_id=item.id),
         is_new=False
     )
@@ -1755,6 +1904,7 @@ def delete_menu_item(item_id):
                 delete_menu_image(item.image_path)
                 item.image_path = None
             item.is_available = False
+            refresh_menu_item(item)
             db.session.commit()
             flash(f"{item.name} archived because it has existing orders.", "info")
         else:
@@ -2117,13 +2267,17 @@ def validate_payment_conditions(student, unpaid_orders):
     return total_amount_int
 
 def process_payment_transaction(student, unpaid_orders, total_amount):
-    """Process the payment transaction"""
+    """Process the payment transaction and return the checkout's pickup ticket"""
     # Update student balance using integer arithmetic (amount in RM)
     student.balance -= total_amount
+    student.bump_orders_version()
     
     # Mark orders as paid
+    paid_at = now_myt()
     for order in unpaid_orders:
         order.payment_status = 'paid'
+        order.paid_at = paid_at
+        order.class_id = student.class_id
     
     # Build description with item details
     item_names = []
@@ -2145,6 +2299,15 @@ def process_payment_transaction(student, unpaid_orders, total_amount):
         description=description
         )
     db.session.add(new_tx)
+    add_transaction_lines(new_tx, checkout_lines(unpaid_orders, total_amount))
+    
+    ticket = issue_pickup_ticket(student, unpaid_orders)
+    project_paid_orders(student, unpaid_orders)
+    record_sales(unpaid_orders)
+    record_spending(unpaid_orders)
+    record_child_spending(unpaid_orders)
+    record_favourites(unpaid_orders)
+    return ticket
 
 def handle_order_payment(student):
     """Handle order payment processing"""
@@ -2152,10 +2315,10 @@ def handle_order_payment(student):
         unpaid_orders = Order.query.filter_by(student_id=student.id, payment_status='unpaid').all()
         total_amount = validate_payment_conditions(student, unpaid_orders)
         
-        process_payment_transaction(student, unpaid_orders, total_amount)
+        ticket = process_payment_transaction(student, unpaid_orders, total_amount)
         db.session.commit()
         
-        flash("✅ Payment successful!", "success")
+        flash(f"✅ Payment successful! Your pickup number is #{ticket.pickup_number}.", "success")
         return redirect(url_for("student_dashboard"))
         
     except ValueError as e:
@@ -2180,6 +2343,94 @@ def confirm_payment():
     flash("Payment successful!", "success")
     return redirect(url_for('student_dashboard'))
 
+class PaidOrderStudent(NamedTuple):
+    """Student columns shown on the paid-orders board"""
+    id: int
+    name: str
+    ic_number: str
+
+
+class PaidOrderGroup:
+    """A student's paid orders for one menu item, folded into a single board row"""
+    __slots__ = ('name', 'image_path', 'order_ids', 'total_qty', 'total_price', 'status')
+
+    def __init__(self, name, image_path):
+        self.name = name
+        self.image_path = image_path
+        self.order_ids = []
+        self.total_qty = 0
+        self.total_price = 0.0
+        self.status = 'pending'
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'total_qty': self.total_qty,
+            'total_price': self.total_price,
+            'status': self.status,
+            'order_ids': self.order_ids,
+            'image_path': self.image_path or None,
+            'orders_count': len(self.order_ids),
+        }
+
+
+def _group_paid_orders(search_query: str):
+    """Helper: return [(PaidOrderStudent, [PaidOrderGroup, ...]), ...] for the paid-orders board.
+
+    Reads only the kitchen_queue read model, selecting just the columns the board
+    shows, so no joins run and no ORM instances are built. Students with the most
+    pending items come first, then by name; within a student, pending items come
+    before completed ones.
+    """
+    query = db.session.query(
+        KitchenQueueEntry.student_id,
+        KitchenQueueEntry.student_name,
+        KitchenQueueEntry.ic_number,
+        KitchenQueueEntry.item_name,
+        KitchenQueueEntry.image_path,
+        KitchenQueueEntry.order_id,
+        KitchenQueueEntry.quantity,
+        KitchenQueueEntry.total_price,
+        KitchenQueueEntry.status,
+    ).order_by(KitchenQueueEntry.order_time.desc())
+
+    if search_query:
+        query = query.filter(
+            db.or_(
+                KitchenQueueEntry.student_name.ilike(f'%{search_query}%'),
+                KitchenQueueEntry.ic_number.ilike(f'%{search_query}%'),
+                KitchenQueueEntry.item_name.ilike(f'%{search_query}%')
+            )
+        )
+
+    # student_id -> (PaidOrderStudent, {menu item name -> PaidOrderGroup})
+    students = {}
+    for (student_id, student_name, ic_number, item_name, image_path,
+         order_id, quantity, total_price, status) in query:
+        entry = students.get(student_id)
+        if entry is None:
+            entry = students[student_id] = (PaidOrderStudent(student_id, student_name, ic_number), {})
+        group = entry[1].get(item_name)
+        if group is None:
+            group = entry[1][item_name] = PaidOrderGroup(item_name, image_path)
+        group.order_ids.append(order_id)
+        group.total_qty += quantity
+        group.total_price += float(total_price or 0)
+        # If any order is completed, mark as completed
+        if status == 'completed':
+            group.status = 'completed'
+
+    board = []
+    for student, groups in students.values():
+        items = sorted(groups.values(), key=lambda g: g.status == 'completed')
+        board.append((student, items))
+    board.sort(key=lambda entry: (
+        -sum(1 for g in entry[1] if g.status == 'pending'),
+        entry[0].name.lower()
+    ))
+    return board
+
+
 @app.route("/paid-orders", methods=["GET", "POST"])
 @login_required
 def paid_orders():
@@ -2189,68 +2440,7 @@ def paid_orders():
 
     # Get search query
     search_query = request.args.get('search', '').strip()
-    
-    # Optimize query with join to avoid N+1 queries
-    query = db.session.query(Order, StudentInfo, MenuItem)\
-        .join(StudentInfo)\
-        .join(MenuItem)\
-        .filter(Order.payment_status == 'paid')\
-        .order_by(Order.order_time.desc())
-    
-    # Apply search filter
-    if search_query:
-        query = query.filter(
-            db.or_(
-                StudentInfo.name.ilike(f'%{search_query}%'),
-                StudentInfo.ic_number.ilike(f'%{search_query}%'),
-                MenuItem.name.ilike(f'%{search_query}%')
-            )
-        )
-    
-    paid_orders = query.all()
-
-    # Group orders by student and menu item name
-    from collections import defaultdict
-    grouped_by_student = defaultdict(lambda: defaultdict(lambda: {'orders': [], 'total_qty': 0, 'total_price': 0, 'status': 'pending'}))
-    
-    for order, student, menu_item in paid_orders:
-        grouped_by_student[student][menu_item.name]['orders'].append(order)
-        grouped_by_student[student][menu_item.name]['total_qty'] += order.quantity
-        grouped_by_student[student][menu_item.name]['total_price'] += float(order.total_price or 0)
-        # If any order is completed, mark as completed
-        if order.status == 'completed':
-            grouped_by_student[student][menu_item.name]['status'] = 'completed'
-        grouped_by_student[student][menu_item.name]['menu_item'] = menu_item
-
-    # Convert to format expected by template
-    grouped_orders = {}
-    for student, items in grouped_by_student.items():
-        grouped_orders[student] = []
-        for item_name, data in items.items():
-            grouped_orders[student].append({
-                'name': item_name,
-                'orders': data['orders'],
-                'total_qty': data['total_qty'],
-                'total_price': data['total_price'],
-                'status': data['status'],
-                'menu_item': data['menu_item'],
-                'order_ids': [o.id for o in data['orders']]
-            })
-        # Sort by status (pending first)
-        grouped_orders[student].sort(key=lambda x: x['status'] == 'completed')
-
-    # Sort students: first by pending orders count (descending), then by name
-    sorted_students = sorted(
-        grouped_orders.items(),
-        key=lambda x: (
-            -sum(1 for item in x[1] if item['status'] == 'pending'),  # More pending orders first
-            x[0].name.lower()  # Then alphabetically by name
-        )
-    )
-    
-    # Convert to OrderedDict for template
-    from collections import OrderedDict
-    grouped_orders = OrderedDict(sorted_students)
+    grouped_orders = dict(_group_paid_orders(search_query))
 
     return render_template("paid_orders.html", grouped_orders=grouped_orders, search_query=search_query)
 
@@ -2263,69 +2453,16 @@ def api_paid_orders():
 
     # Get search query
     search_query = request.args.get('search', '').strip()
-    
-    # Optimize query with join to avoid N+1 queries
-    query = db.session.query(Order, StudentInfo, MenuItem)\
-        .join(StudentInfo)\
-        .join(MenuItem)\
-        .filter(Order.payment_status == 'paid')\
-        .order_by(Order.order_time.desc())
-    
-    # Apply search filter
-    if search_query:
-        query = query.filter(
-            db.or_(
-                StudentInfo.name.ilike(f'%{search_query}%'),
-                StudentInfo.ic_number.ilike(f'%{search_query}%'),
-                MenuItem.name.ilike(f'%{search_query}%')
-            )
-        )
-    
-    paid_orders = query.all()
 
-    # Group orders by student and menu item name
-    from collections import defaultdict
-    grouped_by_student = defaultdict(lambda: defaultdict(lambda: {'orders': [], 'total_qty': 0, 'total_price': 0, 'status': 'pending'}))
-    
-    for order, student, menu_item in paid_orders:
-        grouped_by_student[student][menu_item.name]['orders'].append(order)
-        grouped_by_student[student][menu_item.name]['total_qty'] += order.quantity
-        grouped_by_student[student][menu_item.name]['total_price'] += float(order.total_price or 0)
-        # If any order is completed, mark as completed
-        if order.status == 'completed':
-            grouped_by_student[student][menu_item.name]['status'] = 'completed'
-        grouped_by_student[student][menu_item.name]['menu_item'] = menu_item
-
-    # Convert to JSON-serializable format
-    result = []
-    for student, items in grouped_by_student.items():
-        student_data = {
+    result = [
+        {
             'id': student.id,
             'name': student.name,
             'ic_number': student.ic_number,
-            'items': []
+            'items': [group.to_dict() for group in items]
         }
-        
-        for item_name, data in items.items():
-            student_data['items'].append({
-                'name': item_name,
-                'total_qty': data['total_qty'],
-                'total_price': data['total_price'],
-                'status': data['status'],
-                'order_ids': [o.id for o in data['orders']],
-                'image_path': data['menu_item'].image_path if data['menu_item'].image_path else None,
-                'orders_count': len(data['orders'])
-            })
-        
-        # Sort by status (pending first)
-        student_data['items'].sort(key=lambda x: x['status'] == 'completed')
-        result.append(student_data)
-
-    # Sort students: first by pending orders count (descending), then by name
-    result.sort(key=lambda x: (
-        -sum(1 for item in x['items'] if item['status'] == 'pending'),
-        x['name'].lower()
-    ))
+        for student, items in _group_paid_orders(search_query)
+    ]
 
     return jsonify({
         'success': True,
@@ -2352,14 +2489,22 @@ def mark_order_done():
         return jsonify({'error': 'No order IDs provided'}), 400
     
     updated_count = 0
+    completed_orders = []
+    completed_at = now_myt()
     try:
         for oid in order_ids:
             order = Order.query.get(oid)
             if order and order.payment_status == 'paid':
+                if order.status != 'completed':
+                    order.completed_at = completed_at
+                    completed_orders.append(order)
                 order.status = 'completed'
                 updated_count += 1
         
         if updated_count > 0:
+            record_completions(completed_orders)
+            record_serve_times(completed_orders)
+            kitchen_mark_completed([o.id for o in completed_orders])
             db.session.commit()
             return jsonify({'success': True, 'message': f'{updated_count} order(s) marked as completed'})
         else:
@@ -2369,6 +2514,47 @@ def mark_order_done():
         app.logger.error(f"Error marking orders as done: {str(e)}")
         return jsonify({'error': 'Failed to update orders'}), 500
 
+@app.route("/mark-started", methods=["POST"])
+@login_required
+def mark_order_started():
+    """Record that the kitchen has started preparing order(s) - accepts JSON with order_ids"""
+    if current_user.role not in ['admin', 'staff']:
+        return jsonify({'error': 'Unauthorized access'}), 403
+
+    data = request.get_json() or {}
+    order_ids = data.get('order_ids', [])
+    if not order_ids:
+        return jsonify({'error': 'No order IDs provided'}), 400
+
+    started_at = now_myt()
+    try:
+        started_ids = [oid for (oid,) in db.session.query(Order.id).filter(
+            Order.id.in_(order_ids),
+            Order.payment_status == 'paid',
+            Order.status == 'pending',
+            Order.started_at.is_(None),
+        )]
+        if started_ids:
+            Order.query.filter(Order.id.in_(started_ids)).update(
+                {Order.started_at: started_at}, synchronize_session=False
+            )
+            kitchen_mark_started(started_ids, started_at)
+        db.session.commit()
+        return jsonify({'success': True, 'message': f'{len(started_ids)} order(s) started'})
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Error marking orders as started: {str(e)}")
+        return jsonify({'error': 'Failed to update orders'}), 500
+
+@app.route("/api/kitchen/service-times")
+@login_required
+def api_kitchen_service_times():
+    """Time-to-serve (paid -> completed) p50/p90/p99 in seconds, per menu item and per MYT hour"""
+    if current_user.role not in ['admin', 'staff']:
+        return jsonify({'error': 'Unauthorized access'}), 403
+
+    return jsonify({'success': True, **service_time_report()})
+
 @app.route("/delete-order", methods=["POST"])
 @login_required
 def delete_order():
@@ -2389,26 +2575,48 @@ def delete_order():
     
     deleted_count = 0
     refunded_amount = 0
+    ticket_ids = set()
+    deleted_ids = []
+    deleted_orders = []
     
     try:
         for oid in order_ids:
             order = Order.query.get(oid)
             if order and order.payment_status == 'paid':
+                ticket_ids.add(order.ticket_id)
                 student = StudentInfo.query.get(order.student_id)
                 if student:
+                    student.bump_orders_version()
                     # If order is not completed (pending), refund the money to student
                     if order.status != 'completed':
                         refund_amount = float(order.total_price or 0)
                         # Refund the full amount back to student balance
                         student.balance += int(refund_amount)
                         refunded_amount += refund_amount
+                        refund_tx = Transaction(
+                            student_id=student.id,
+                            type="Refund",
+                            amount=int(refund_amount),
+                            description=f"Refund for deleted order {oid}"
+                        )
+                        db.session.add(refund_tx)
+                        add_transaction_lines(refund_tx, [order_line(order, int(refund_amount), kind="refund")])
                         app.logger.info(f"Refunding RM {refund_amount:.2f} to student {student.id} ({student.name}) for deleted order {oid}")
                     # If order is completed, no refund (order already fulfilled)
                 
+                deleted_ids.append(order.id)
+                deleted_orders.append(order)
                 db.session.delete(order)
                 deleted_count += 1
         
         if deleted_count > 0:
+            record_sales(deleted_orders, sign=-1)
+            record_spending(deleted_orders, sign=-1)
+            record_child_spending(deleted_orders, sign=-1)
+            record_favourites(deleted_orders, sign=-1)
+            forget_sales_buckets(deleted_orders)
+            kitchen_remove_orders(deleted_ids)
+            close_finished_tickets(ticket_ids)
             db.session.commit()
             message = f'{deleted_count} order(s) deleted'
             if refunded_amount > 0:
@@ -2421,6 +2629,113 @@ def delete_order():
         app.logger.error(f"Error deleting orders: {str(e)}")
         return jsonify({'error': 'Failed to delete orders'}), 500
 
+QUEUE_CACHE_SECONDS = 5
+
+
+def _queue_json(payload):
+    """JSON response that browsers may reuse for a few seconds while polling the queue"""
+    response = jsonify(payload)
+    response.headers['Cache-Control'] = f'private, max-age={QUEUE_CACHE_SECONDS}'
+    return response
+
+@app.route('/api/queue/my-tickets')
+@login_required
+def api_queue_my_tickets():
+    """Today's pickup tickets for the logged-in student with queue position and ETA"""
+    if getattr(current_user, 'role', None) != 'student':
+        return jsonify({'error': ACCESS_DENIED}), 403
+    
+    tickets = PickupTicket.query.filter_by(
+        student_id=current_user.id,
+        pickup_date=now_myt().date()
+    ).order_by(PickupTicket.pickup_number.desc()).all()
+    
+    return _queue_json({'success': True, 'tickets': [ticket_status(t) for t in tickets]})
+
+@app.route('/api/queue/tickets/<int:ticket_id>')
+@login_required
+def api_queue_ticket(ticket_id):
+    """Queue position and ETA for one pickup ticket (owner, staff or admin)"""
+    ticket = PickupTicket.query.get_or_404(ticket_id)
+    role = getattr(current_user, 'role', None)
+    if role not in ['admin', 'staff'] and not (role == 'student' and ticket.student_id == current_user.id):
+        return jsonify({'error': ACCESS_DENIED}), 403
+    
+    return _queue_json({'success': True, **ticket_status(ticket)})
+
+# Kitchen stall screens
+STALL_POLL_SECONDS = 3
+
+@app.route('/stalls', methods=['GET', 'POST'])
+@login_required
+def stalls():
+    """List kitchen stalls with their pending queue size; admins can add stalls"""
+    if current_user.role not in ['admin', 'staff']:
+        flash(ACCESS_DENIED, "error")
+        return redirect(url_for('home'))
+    
+    if request.method == 'POST':
+        if current_user.role != 'admin':
+            flash(ACCESS_DENIED, "error")
+            return redirect(url_for('stalls'))
+        
+        name = sanitize_input(request.form.get('name', ''))
+        description = sanitize_input(request.form.get('description', ''))
+        display_order = request.form.get('display_order', 0, type=int)
+        
+        if not name:
+            flash('Stall name is required.', 'error')
+            return redirect(url_for('stalls'))
+        
+        if Stall.query.filter_by(name=name).first():
+            flash('A stall with this name already exists.', 'error')
+            return redirect(url_for('stalls'))
+        
+        try:
+            db.session.add(Stall(name=name, description=description or None, display_order=display_order))
+            db.session.commit()
+            flash(f'Stall "{name}" created. Assign menu items to it from the menu editor.', 'success')
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Stall creation error: {e}")
+            flash('Failed to create stall. Please try again.', 'error')
+        return redirect(url_for('stalls'))
+    
+    all_stalls = Stall.query.filter_by(is_active=True).order_by(Stall.display_order, Stall.name).all()
+    return render_template('stalls.html', stalls=all_stalls, pending_counts=stall_queue_counts())
+
+@app.route('/stalls/<int:stall_id>')
+@login_required
+def stall_screen(stall_id):
+    """Kitchen screen for a single stall's queue"""
+    if current_user.role not in ['admin', 'staff']:
+        flash(ACCESS_DENIED, "error")
+        return redirect(url_for('home'))
+    
+    stall = Stall.query.get_or_404(stall_id)
+    return render_template('stall_queue.html', stall=stall, poll_seconds=STALL_POLL_SECONDS)
+
+@app.route('/api/stalls/<int:stall_id>/queue')
+@login_required
+def api_stall_queue(stall_id):
+    """JSON snapshot of one stall's pending queue, polled by its kitchen screen.
+
+    The ETag is the queue's fingerprint, so a poll of an unchanged queue is
+    answered with 304 after one aggregate query.
+    """
+    if current_user.role not in ['admin', 'staff']:
+        return jsonify({'error': 'Unauthorized access'}), 403
+    
+    Stall.query.get_or_404(stall_id)
+    etag = f"stall-{stall_id}-" + '-'.join(str(value or 0) for value in stall_queue_fingerprint(stall_id))
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify({'success': True, 'stall_id': stall_id, 'tickets': stall_queue(stall_id)})
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
 @app.route('/scan', methods=['POST'])
 def scan():
     data = request.get_json()
@@ -2636,6 +2951,10 @@ def delete_feedback(id):
         flash('You can only delete your own feedback.', 'error')
     return redirect(url_for('feedback'))
 
+FINANCE_HISTORY_DAYS = 14
+SETTLEMENT_MAX_DAYS = 366
+
+
 def _render_admin_finance_page():
     if current_user.role != 'admin':
         flash(ACCESS_DENIED, "error")
@@ -2668,6 +2987,7 @@ def _render_admin_finance_page():
         try:
             amount_int = int(amount)
             student.balance += amount_int
+            student.bump_orders_version()
             topup_student = student
             
             new_tx = Transaction(
@@ -2677,6 +2997,8 @@ def _render_admin_finance_page():
                 description=f"Top-up for {student.name}"
             )
             db.session.add(new_tx)
+            add_transaction_lines(new_tx, [topup_line(amount_int)])
+            record_topup(student.id, amount_int)
             db.session.commit()
             flash(f"Successfully topped up RM{amount_int} for {student.name}.", "success")
         except Exception as e:
@@ -2688,11 +3010,16 @@ def _render_admin_finance_page():
     pending_payments = Payment.query.filter_by(status='pending').order_by(Payment.created_at.desc()).all()
     completed_payments = Payment.query.filter_by(status='completed').order_by(Payment.completed_at.desc()).limit(20).all()
     
+    # Closed days come from their frozen snapshots, today is computed live
+    today = now_myt().date()
+    settlements = settlement_range(today - timedelta(days=FINANCE_HISTORY_DAYS - 1), today)
+    
     return render_template(
         'admin_finance.html',
         pending_payments=pending_payments,
         completed_payments=completed_payments,
-        topup_student=topup_student
+        topup_student=topup_student,
+        settlements=settlements
     )
 
 
@@ -2716,6 +3043,35 @@ def admin_payments():
     """Backward-compatible route that now renders the finance dashboard"""
     return _render_admin_finance_page()
 
+@app.route('/api/finance/settlements')
+@login_required
+@replica_reads
+def api_finance_settlements():
+    """Daily close figures for ?start=..&end= (YYYY-MM-DD); closed days are frozen snapshots"""
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Unauthorized access'}), 403
+    
+    today = now_myt().date()
+    try:
+        end = min(date.fromisoformat(request.args['end']) if request.args.get('end') else today, today)
+        start = date.fromisoformat(request.args['start']) if request.args.get('start') else \
+            end - timedelta(days=FINANCE_HISTORY_DAYS - 1)
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+    if start > end or (end - start).days >= SETTLEMENT_MAX_DAYS:
+        return jsonify({'error': f'Range must be 1 to {SETTLEMENT_MAX_DAYS} days'}), 400
+    
+    days = [
+        {
+            'date': day['settle_date'].isoformat(),
+            'closed': day['closed'],
+            **{field: float(day[field]) if isinstance(day[field], Decimal) else day[field]
+               for field in SETTLEMENT_FIELDS},
+        }
+        for day in settlement_range(start, end)
+    ]
+    return jsonify({'success': True, 'days': days})
+
 @app.route('/admin/payments/approve/<transaction_id>', methods=['POST'])
 @login_required
 def approve_payment(transaction_id):
@@ -2742,6 +3098,7 @@ def approve_payment(transaction_id):
         child = StudentInfo.query.get(payment.student_id)
         if child:
             child.balance += int(payment.amount)
+            child.bump_orders_version()
             
             # Create transaction record
             new_tx = Transaction(
@@ -2751,6 +3108,8 @@ def approve_payment(transaction_id):
                 description=f"QR Payment top-up for {child.name} (Transaction: {transaction_id[:8]})"
             )
             db.session.add(new_tx)
+            add_transaction_lines(new_tx, [topup_line(int(payment.amount))])
+            record_topup(child.id, int(payment.amount))
             db.session.commit()
             
             flash(f'Payment approved! RM{payment.amount} added to {child.name}\'s account.', 'success')
@@ -2842,6 +3201,7 @@ def toggle_card_status():
 
 @app.route('/student_balances')
 @login_required
+@replica_reads
 def student_balances():
     if current_user.role != 'admin':
         return redirect(url_for('home'))
@@ -2850,16 +3210,73 @@ def student_balances():
 
 @app.route('/transactions')
 @login_required
+@replica_reads
 def transactions():
     if current_user.role not in ['admin', 'staff']:
         return redirect(url_for('home'))
-    # Join with StudentInfo to get student details
-    logs = db.session.query(Transaction, StudentInfo)\
-        .outerjoin(StudentInfo, Transaction.student_id == StudentInfo.id)\
-        .order_by(Transaction.transaction_time.desc()).all()
-    total_in = sum(t[0].amount for t in logs if t[0].amount > 0)
-    total_out = sum(abs(t[0].amount) for t in logs if t[0].amount < 0)
-    return render_template('transactions.html', logs=logs, total_in=total_in, total_out=total_out)
+    
+    try:
+        filters = parse_ledger_filters(request.args)
+        logs, next_cursor = ledger_page(filters, request.args.get('after'))
+    except ValueError:
+        flash('Invalid filter or page. Showing the latest transactions.', 'error')
+        return redirect(url_for('transactions'))
+    
+    # Totals cover every page of the filtered ledger, not just this one
+    totals = ledger_totals(filters)
+    filter_args = {key: value for key, value in request.args.items() if key != 'after'}
+    next_url = url_for('transactions', after=next_cursor, **filter_args) if next_cursor else None
+    newest_url = url_for('transactions', **filter_args) if request.args.get('after') else None
+    return render_template(
+        'transactions.html',
+        logs=logs,
+        total_in=totals['total_in'],
+        total_out=totals['total_out'],
+        total_count=totals['count'],
+        filters=filters,
+        transaction_types=ledger_types(),
+        next_url=next_url,
+        newest_url=newest_url,
+        filter_args=filter_args
+    )
+
+@app.route('/api/transactions/items')
+@login_required
+@replica_reads
+def api_transaction_items():
+    """Per-item quantities and amounts paid and refunded, from the line items of the filtered ledger"""
+    if current_user.role not in ['admin', 'staff']:
+        return jsonify({'error': 'Unauthorized access'}), 403
+    try:
+        filters = parse_ledger_filters(request.args)
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+    return jsonify({'success': True, 'items': [_json_row(row) for row in item_totals(filters)]})
+
+@app.route('/export/<dataset>')
+@login_required
+@replica_reads
+def export_data(dataset):
+    """Stream the ledger, paid orders or balances as CSV/XLSX (?format=), with the ledger filters"""
+    if current_user.role not in ['admin', 'staff'] or (dataset == 'balances' and current_user.role != 'admin'):
+        flash(ACCESS_DENIED, "error")
+        return redirect(url_for('home'))
+    fmt = request.args.get('format', 'csv')
+    if dataset not in EXPORT_DATASETS or fmt not in EXPORT_FORMATS:
+        flash('Unknown export.', 'error')
+        return redirect(url_for('transactions'))
+    
+    try:
+        filters = parse_ledger_filters(request.args)
+    except ValueError:
+        flash('Invalid export filter.', 'error')
+        return redirect(url_for('transactions'))
+    
+    mimetype = XLSX_MIMETYPE if fmt == 'xlsx' else 'text/csv'
+    response = Response(stream_with_context(iter_export(dataset, fmt, filters)), mimetype=mimetype)
+    response.headers['Content-Disposition'] = \
+        f'attachment; filename="{export_filename(dataset, fmt, now_myt())}"'
+    return response
 
 @app.route('/manage_users')
 @login_required
@@ -2870,7 +3287,7 @@ def manage_users():
     
     # Return all users - client-side pagination handles display
     users = StudentInfo.query.order_by(StudentInfo.name).all()
-    return render_template('manage_users.html', users=users)
+    return render_template('manage_users.html', users=users, classes=school_classes())
 
 def validate_student_form_data(form_data):
     """Validate all student form data"""
@@ -2880,6 +3297,7 @@ def validate_student_form_data(form_data):
     role = form_data.get('role', 'student').strip()
     balance = form_data.get('balance', '0').strip()
     password = form_data.get('password', '').strip()
+    class_id = form_data.get('class_id', type=int)
     
     # Validate each field
     if not validate_name(name):
@@ -2894,6 +3312,9 @@ def validate_student_form_data(form_data):
     if role not in ['student', 'staff', 'admin']:
         raise ValueError('Invalid role selected.')
     
+    if class_id and (role != 'student' or not db.session.get(SchoolClass, class_id)):
+        raise ValueError('Invalid class selected.')
+    
     # Validate balance - allow 0 for new students
     try:
         balance_float = float(balance)
@@ -2915,7 +3336,8 @@ def validate_student_form_data(form_data):
         'pin': pin,
         'role': role,
         'balance': int(balance),
-        'password': password
+        'password': password,
+        'class_id': class_id or None
     }
 
 def create_new_student(student_data):
@@ -2931,6 +3353,7 @@ def create_new_student(student_data):
         ic_number=student_data['ic_number'],
         role=student_data['role'],
         balance=student_data['balance'],
+        class_id=student_data['class_id'],
         frozen=False
     )
     
@@ -2956,6 +3379,13 @@ def add_student():
         new_student = create_new_student(student_data)
         
         db.session.add(new_student)
+        if new_student.balance:
+            db.session.add(Transaction(
+                student=new_student,
+                type="Opening balance",
+                amount=new_student.balance,
+                description=f"Opening balance for {new_student.name}"
+            ))
         db.session.commit()
         
         flash(f'✅ Successfully added student: {student_data["name"]} (IC: {student_data["ic_number"]})', 'success')
@@ -2970,23 +3400,146 @@ def add_student():
         flash('Error adding student. Please try again.', 'error')
         return redirect(url_for('manage_users'))
 
+def school_classes():
+    """All classes with their grade, in display order"""
+    return SchoolClass.query.join(Grade).order_by(Grade.display_order, Grade.name, SchoolClass.name).all()
+
+CLASS_SPENDING_DEFAULT_DAYS = 30
+
+def _spending_days():
+    """?start= / ?end= (YYYY-MM-DD) as an inclusive date range, the last 30 days by default"""
+    today = now_myt().date()
+    end = date.fromisoformat(request.args['end']) if request.args.get('end') else today
+    start = date.fromisoformat(request.args['start']) if request.args.get('start') else \
+        end - timedelta(days=CLASS_SPENDING_DEFAULT_DAYS - 1)
+    if start > end:
+        raise ValueError('End must be on or after start')
+    return start, end
+
+def _handle_class_admin(form):
+    """Apply one /classes form (add grade, add class or assign students); returns the flash message"""
+    action = form.get('action')
+    if action == 'add_grade':
+        name = sanitize_input(form.get('name', ''))
+        if not name:
+            raise ValueError('Grade name is required.')
+        if Grade.query.filter_by(name=name).first():
+            raise ValueError('A grade with this name already exists.')
+        db.session.add(Grade(name=name, display_order=form.get('display_order', 0, type=int)))
+        return f'Grade "{name}" created.'
+    
+    if action == 'add_class':
+        name = sanitize_input(form.get('name', ''))
+        grade = db.session.get(Grade, form.get('grade_id', type=int) or 0)
+        if not name or grade is None:
+            raise ValueError('Class name and grade are required.')
+        if SchoolClass.query.filter_by(grade_id=grade.id, name=name).first():
+            raise ValueError('This grade already has a class with that name.')
+        db.session.add(SchoolClass(grade_id=grade.id, name=name))
+        return f'Class "{grade.name} {name}" created.'
+    
+    if action == 'assign':
+        class_id = form.get('class_id', type=int)
+        school_class = db.session.get(SchoolClass, class_id) if class_id else None
+        if class_id and school_class is None:
+            raise ValueError('Invalid class selected.')
+        ic_numbers = {ic.strip() for ic in re.split(r'[\s,]+', form.get('ic_numbers', '')) if ic.strip()}
+        if not ic_numbers:
+            raise ValueError('Enter at least one IC number.')
+        students = StudentInfo.query.filter(StudentInfo.ic_number.in_(ic_numbers), StudentInfo.role == 'student').all()
+        for student in students:
+            student.class_id = class_id or None
+        missing = len(ic_numbers) - len(students)
+        target = f"{school_class.grade.name} {school_class.name}" if school_class else 'no class'
+        return f'{len(students)} student(s) moved to {target}.' + (f' {missing} IC number(s) not found.' if missing else '')
+    
+    raise ValueError('Unknown action.')
+
+@app.route('/classes', methods=['GET', 'POST'])
+@login_required
+@replica_reads
+def classes():
+    """Spending and participation drilled down from the whole school to grades and classes"""
+    if current_user.role not in ['admin', 'staff']:
+        flash(ACCESS_DENIED, "error")
+        return redirect(url_for('home'))
+    
+    if request.method == 'POST':
+        if current_user.role != 'admin':
+            flash(ACCESS_DENIED, "error")
+            return redirect(url_for('classes'))
+        # The duplicate checks and lookups behind a write must see the primary
+        use_primary()
+        try:
+            message = _handle_class_admin(request.form)
+            db.session.commit()
+            flash(f'✅ {message}', 'success')
+        except ValueError as e:
+            db.session.rollback()
+            flash(f'❌ {str(e)}', 'error')
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Class update error: {e}")
+            flash('Failed to update classes. Please try again.', 'error')
+        return redirect(url_for('classes'))
+    
+    level = request.args.get('level', 'school')
+    try:
+        start, end = _spending_days()
+        breakdown = spending_breakdown(level, request.args.get('id', 0, type=int), start, end)
+    except ValueError as e:
+        flash(f'❌ {str(e)}', 'error')
+        return redirect(url_for('classes'))
+    
+    return render_template(
+        'classes.html',
+        breakdown=breakdown,
+        start=start,
+        end=end,
+        grades=Grade.query.order_by(Grade.display_order, Grade.name).all(),
+        classes=school_classes(),
+    )
+
+@app.route('/api/analytics/spending')
+@login_required
+@replica_reads
+def api_analytics_spending():
+    """Spending and participation for ?level=school|grade|class&id= over ?start=&end=, with its children"""
+    if current_user.role not in ['admin', 'staff']:
+        return jsonify({'error': 'Unauthorized access'}), 403
+    
+    level = request.args.get('level', 'school')
+    if level not in SPENDING_LEVELS:
+        return jsonify({'error': f"level must be one of: {', '.join(SPENDING_LEVELS)}"}), 400
+    try:
+        start, end = _spending_days()
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD, end on or after start'}), 400
+    
+    breakdown = spending_breakdown(level, request.args.get('id', 0, type=int), start, end)
+    return jsonify({
+        'success': True,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'level': breakdown['level'],
+        'child_level': breakdown['child_level'],
+        'trading_days': breakdown['trading_days'],
+        'group': _json_row(breakdown['group']),
+        'children': [_json_row(child) for child in breakdown['children']],
+        'series': [_json_row(day) for day in breakdown['series']],
+    })
+
 @app.route('/food-demand-analytics')
 @login_required
+@replica_reads
 def food_demand_analytics():
     """Show food demand analytics with pie chart"""
     if current_user.role not in ['admin', 'staff']:
         flash(ACCESS_DENIED, "error")
         return redirect(url_for('home'))
     
-    # Get food demand data from paid orders
-    food_stats = db.session.query(
-        MenuItem.name,
-        func.sum(Order.quantity).label('total_quantity')
-    ).join(MenuItem).filter(
-        Order.payment_status == 'paid'
-    ).group_by(MenuItem.name).order_by(
-        func.sum(Order.quantity).desc()
-    ).all()
+    # Get food demand data from the daily sales rollup
+    food_stats = [(name, quantity) for name, quantity, _revenue in sales_by_item()]
     
     # Prepare data for template
     food_data = []
@@ -3017,28 +3570,21 @@ def food_demand_analytics():
         food_values=food_values,
         total_orders=total_orders,
         top_item=top_item,
-        avg_orders=avg_orders
+        avg_orders=avg_orders,
+        forecast=get_forecast()
     )
 
 @app.route('/cash-flow-analytics')
 @login_required
+@replica_reads
 def cash_flow_analytics():
     """Show cash flow analytics with pie chart"""
     if current_user.role not in ['admin', 'staff']:
         flash(ACCESS_DENIED, "error")
         return redirect(url_for('home'))
     
-    # Get revenue data from paid orders
-    revenue_stats = db.session.query(
-        MenuItem.name,
-        MenuItem.price,
-        func.sum(Order.quantity).label('total_quantity'),
-        func.sum(Order.total_price).label('revenue')
-    ).join(MenuItem).filter(
-        Order.payment_status == 'paid'
-    ).group_by(MenuItem.name, MenuItem.price).order_by(
-        func.sum(Order.total_price).desc()
-    ).all()
+    # Get revenue data from the daily sales rollup
+    revenue_stats = sales_by_item(group_by_price=True)
     
     # Prepare data for template
     revenue_data = []
@@ -3077,6 +3623,218 @@ def cash_flow_analytics():
         avg_revenue=avg_revenue
     )
 
+ANALYTICS_DEFAULT_DAYS = 7
+
+
+def _parse_analytics_range():
+    """Read ?start= / ?end= (YYYY-MM-DD or YYYY-MM-DDTHH:MM, MYT) into naive MYT datetimes.
+
+    A date-only end includes that whole day. Defaults to the last ANALYTICS_DEFAULT_DAYS days.
+    """
+    now = now_myt().replace(tzinfo=None)
+    start_raw = (request.args.get('start') or '').strip()
+    end_raw = (request.args.get('end') or '').strip()
+    start = datetime.fromisoformat(start_raw) if start_raw else \
+        now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=ANALYTICS_DEFAULT_DAYS - 1)
+    if end_raw:
+        end = datetime.fromisoformat(end_raw)
+        if len(end_raw) == 10:
+            end += timedelta(days=1)
+    else:
+        end = now
+    if end <= start:
+        raise ValueError('End must be after start')
+    return start.replace(tzinfo=None), end.replace(tzinfo=None)
+
+@app.route('/api/analytics/sales')
+@login_required
+@replica_reads
+def api_analytics_sales():
+    """Paid sales per time bucket (15min/hour/day/week) and per item over a date range"""
+    if current_user.role not in ['admin', 'staff']:
+        return jsonify({'error': 'Unauthorized access'}), 403
+    
+    bucket = request.args.get('bucket', 'day')
+    if bucket not in BUCKET_SIZES:
+        return jsonify({'error': f"bucket must be one of: {', '.join(BUCKET_SIZES)}"}), 400
+    menu_item_id = request.args.get('menu_item_id', type=int)
+    
+    try:
+        start, end = _parse_analytics_range()
+        series, items = sales_series(bucket, start, end, menu_item_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    names = dict(
+        db.session.query(MenuItem.id, MenuItem.name).filter(MenuItem.id.in_(items)).all()
+    ) if items else {}
+    item_totals = sorted(
+        ({'menu_item_id': item_id, 'name': names.get(item_id), **totals} for item_id, totals in items.items()),
+        key=lambda entry: -entry['quantity']
+    )
+    return jsonify({
+        'success': True,
+        'bucket': bucket,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'series': series,
+        'items': item_totals,
+    })
+
+@app.route('/api/analytics/heatmap')
+@login_required
+@replica_reads
+def api_analytics_heatmap():
+    """Hour-of-day x weekday grid of paid sales over a date range"""
+    if current_user.role not in ['admin', 'staff']:
+        return jsonify({'error': 'Unauthorized access'}), 403
+    
+    metric = request.args.get('metric', 'quantity')
+    if metric not in ('quantity', 'revenue', 'orders'):
+        return jsonify({'error': 'metric must be one of: quantity, revenue, orders'}), 400
+    
+    try:
+        start, end = _parse_analytics_range()
+        grid = weekday_hour_heatmap(start, end, metric)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'success': True,
+        'metric': metric,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'weekdays': ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'],
+        'grid': grid,
+    })
+
+@app.route('/api/analytics/forecast')
+@login_required
+@replica_reads
+def api_analytics_forecast():
+    """Tomorrow's expected quantity per menu item with a 90% band, for prep planning"""
+    if current_user.role not in ['admin', 'staff']:
+        return jsonify({'error': 'Unauthorized access'}), 403
+    
+    return jsonify({'success': True, **get_forecast()})
+
+@app.route('/api/analytics/co-purchases')
+@login_required
+@replica_reads
+def api_analytics_co_purchases():
+    """Item pairs most often bought together, with support, confidence and lift"""
+    if current_user.role not in ['admin', 'staff']:
+        return jsonify({'error': 'Unauthorized access'}), 403
+    
+    sort = request.args.get('sort', 'lift')
+    if sort not in PAIR_SORT_KEYS:
+        return jsonify({'error': f"sort must be one of: {', '.join(PAIR_SORT_KEYS)}"}), 400
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    min_baskets = max(request.args.get('min_baskets', 5, type=int), 1)
+    
+    return jsonify({
+        'success': True,
+        'sort': sort,
+        'pairs': top_pairs(limit=limit, sort=sort, min_baskets=min_baskets),
+    })
+
+WALLET_ANOMALY_STATUSES = ('open', 'reviewed', 'dismissed')
+WALLET_ANOMALY_PAGE_SIZE = 100
+
+@app.route('/admin/wallet-anomalies', methods=['GET', 'POST'])
+@login_required
+def admin_wallet_anomalies():
+    """Students flagged by the nightly wallet scoring, for admins to review or dismiss"""
+    if current_user.role != 'admin':
+        flash(ACCESS_DENIED, "error")
+        return redirect(url_for('home'))
+    
+    status = request.args.get('status', 'open')
+    if status not in WALLET_ANOMALY_STATUSES:
+        status = 'open'
+    
+    if request.method == 'POST':
+        anomaly = WalletAnomaly.query.get_or_404(request.form.get('anomaly_id', type=int))
+        outcome = request.form.get('outcome')
+        if outcome not in ('reviewed', 'dismissed'):
+            flash('Unknown review outcome.', 'error')
+            return redirect(url_for('admin_wallet_anomalies', status=status))
+        try:
+            anomaly.status = outcome
+            anomaly.review_note = sanitize_input(request.form.get('note', '')) or None
+            anomaly.reviewed_by = current_user.id
+            anomaly.reviewed_at = now_myt().replace(tzinfo=None)
+            db.session.commit()
+            flash(f'✅ Flag for {anomaly.student.name} marked {outcome}.', 'success')
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Wallet anomaly review error: {e}")
+            flash('Failed to update the flag. Please try again.', 'error')
+        return redirect(url_for('admin_wallet_anomalies', status=status))
+    
+    anomalies = WalletAnomaly.query.filter_by(status=status) \
+        .order_by(WalletAnomaly.detected_on.desc(), WalletAnomaly.score.desc()) \
+        .limit(WALLET_ANOMALY_PAGE_SIZE).all()
+    counts = dict(db.session.query(WalletAnomaly.status, func.count(WalletAnomaly.id)).group_by(WalletAnomaly.status))
+    return render_template(
+        'admin_wallet_anomalies.html',
+        anomalies=anomalies,
+        status=status,
+        statuses=WALLET_ANOMALY_STATUSES,
+        counts=counts,
+        feature_labels=FEATURE_LABELS,
+    )
+
+@app.route('/admin/pricing')
+@login_required
+@replica_reads
+def admin_pricing():
+    """What-if simulator: projected daily volume and revenue for proposed menu prices"""
+    if current_user.role != 'admin':
+        flash(ACCESS_DENIED, "error")
+        return redirect(url_for('home'))
+    
+    model = get_pricing_model()
+    proposed = {
+        key[len('price_'):]: value.strip() for key, value in request.args.items()
+        if key.startswith('price_') and value.strip()
+    }
+    labels, prices = price_sweep(model)
+    proposal = None
+    if proposed:
+        try:
+            proposal_labels, proposal_prices = parse_candidates([{'label': 'Proposed prices', 'prices': proposed}], model)
+            proposal = project(model, proposal_labels, proposal_prices)['candidates'][0]
+        except ValueError as e:
+            flash(f"❌ {str(e)}", "error")
+    
+    return render_template(
+        'admin_pricing.html',
+        items=describe_model(model),
+        proposed=proposed,
+        proposal=proposal,
+        sweep=project(model, labels, prices),
+    )
+
+@app.route('/api/analytics/pricing', methods=['GET', 'POST'])
+@login_required
+@replica_reads
+def api_analytics_pricing():
+    """GET: fitted elasticities and baselines. POST {"candidates": [{"label", "prices": {id: price}}]}: projections"""
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Unauthorized access'}), 403
+    
+    model = get_pricing_model()
+    if request.method == 'GET':
+        return jsonify({'success': True, 'items': describe_model(model)})
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        labels, prices = parse_candidates(data.get('candidates'), model)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'success': True, **project(model, labels, prices)})
+
 if __name__ == '__main__':
     port = int(os.environ.get("PORT", 5000))
     app.run(host="0.0.0.0", port=port, debug=True)
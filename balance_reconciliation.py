@@ -0,0 +1,100 @@
+"""
+Balance reconciliation: every account's balance should equal the sum of its ledger.
+
+Every balance is read together with its per-student ledger sum in one query
+(one snapshot, so a top-up or checkout committing mid-run cannot show up as a
+mismatch) and compared in cents with NumPy, so a whole-school run costs one
+grouped scan of the ledger and a few array operations. Mismatches can be
+corrected by writing one "Adjustment" ledger row per account for its delta:
+each account is locked and re-checked first, so only deltas that still hold
+are written. Balances themselves are never changed here.
+"""
+from decimal import Decimal
+
+import numpy as np
+from sqlalchemy import func, insert
+
+from models import db, StudentInfo
+from transactions import Transaction
+from tz_utils import now_myt
+
+ADJUSTMENT_TYPE = 'Adjustment'
+
+
+def _cents(amount):
+    return round(Decimal(str(amount or 0)) * 100)
+
+
+def reconcile_balances():
+    """Compare balances with ledger sums.
+
+    Returns (mismatches, orphan_total) where mismatches is a list of
+    {'student_id', 'name', 'balance', 'ledger', 'delta'} (delta = balance - ledger,
+    Decimal RM) and orphan_total is the ledger sum of rows whose student no longer exists.
+    """
+    sums = db.session.query(Transaction.student_id.label('student_id'), func.sum(Transaction.amount).label('total')) \
+        .filter(Transaction.student_id.isnot(None)) \
+        .group_by(Transaction.student_id).subquery()
+    accounts = db.session.query(StudentInfo.id, StudentInfo.name, StudentInfo.balance, sums.c.total) \
+        .outerjoin(sums, sums.c.student_id == StudentInfo.id) \
+        .order_by(StudentInfo.id).all()
+    orphan_total = Decimal(str(db.session.query(func.coalesce(func.sum(Transaction.amount), 0)).filter(
+        Transaction.student_id.isnot(None),
+        Transaction.student_id.notin_(db.session.query(StudentInfo.id)),
+    ).scalar()))
+
+    ids = np.fromiter((a[0] for a in accounts), dtype=np.int64, count=len(accounts))
+    balance_cents = np.fromiter((int(a[2] or 0) * 100 for a in accounts), dtype=np.int64, count=len(accounts))
+    ledger_cents = np.fromiter((_cents(a[3]) for a in accounts), dtype=np.int64, count=len(accounts))
+
+    delta_cents = balance_cents - ledger_cents
+    mismatches = [
+        {
+            'student_id': int(ids[i]),
+            'name': accounts[i][1],
+            'balance': Decimal(int(balance_cents[i])) / 100,
+            'ledger': Decimal(int(ledger_cents[i])) / 100,
+            'delta': Decimal(int(delta_cents[i])) / 100,
+        }
+        for i in np.flatnonzero(delta_cents)
+    ]
+    return mismatches, orphan_total
+
+
+def write_adjustments(mismatches):
+    """Add one Adjustment ledger row per mismatch so the ledger matches the balance (no commit)
+
+    The accounts are locked (SELECT ... FOR UPDATE) and their balance and ledger
+    re-read first, so a payment that committed since reconcile_balances() is not
+    "corrected"; returns the number of rows written.
+    """
+    if not mismatches:
+        return 0
+    ids = sorted(m['student_id'] for m in mismatches)
+    balances = dict(
+        db.session.query(StudentInfo.id, StudentInfo.balance)
+        .filter(StudentInfo.id.in_(ids)).order_by(StudentInfo.id).with_for_update()
+    )
+    ledgers = dict(
+        db.session.query(Transaction.student_id, func.sum(Transaction.amount))
+        .filter(Transaction.student_id.in_(ids)).group_by(Transaction.student_id)
+    )
+    now = now_myt()
+    rows = []
+    for student_id in ids:
+        if student_id not in balances:
+            continue
+        balance = int(balances[student_id] or 0) * 100
+        ledger = _cents(ledgers.get(student_id))
+        if balance == ledger:
+            continue
+        rows.append({
+            'student_id': student_id,
+            'type': ADJUSTMENT_TYPE,
+            'amount': Decimal(balance - ledger) / 100,
+            'description': f"Balance reconciliation: ledger RM{Decimal(ledger) / 100:.2f}, balance RM{Decimal(balance) / 100:.2f}",
+            'transaction_time': now,
+        })
+    if rows:
+        db.session.execute(insert(Transaction), rows)
+    return len(rows)
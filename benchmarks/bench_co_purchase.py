@@ -0,0 +1,102 @@
+"""
+Benchmark for the co-purchase (bought together) job.
+Seeds several years of paid checkout baskets into a scratch database and reports
+the wall time of a full rebuild, an incremental run over one new day, and the
+top-pairs query.
+
+Usage:
+    python benchmarks/bench_co_purchase.py
+    BENCH_DATABASE_URL=postgresql://... python benchmarks/bench_co_purchase.py
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+YEARS = 3
+MENU_ITEMS = 60
+STUDENTS = 1500
+TICKETS_PER_DAY = 600
+
+# Point the app at a scratch database before it is imported
+_scratch_dir = tempfile.mkdtemp(prefix='mymurid_bench_')
+os.environ['FLASK_ENV'] = 'testing'
+os.environ['TEST_DATABASE_URL'] = os.environ.get('BENCH_DATABASE_URL') or f"sqlite:///{_scratch_dir}/bench.db"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert  # noqa: E402
+
+from app import app  # noqa: E402
+from co_purchase import top_pairs, update_co_purchases  # noqa: E402
+from models import db, MenuItem, Order, PickupTicket, StudentInfo  # noqa: E402
+from tz_utils import now_myt  # noqa: E402
+
+
+def _insert_days(rng, first_ticket, days):
+    """Bulk-insert TICKETS_PER_DAY tickets of 1-4 lines for each of days; returns the next ticket id"""
+    ticket_id = first_ticket
+    for day in days:
+        created = (now_myt() - timedelta(days=day)).replace(tzinfo=None, hour=12)
+        tickets, orders = [], []
+        for number in range(1, TICKETS_PER_DAY + 1):
+            tickets.append({
+                'id': ticket_id, 'student_id': rng.randint(1, STUDENTS), 'pickup_date': created.date(),
+                'pickup_number': number, 'status': 'completed', 'created_at': created,
+            })
+            # A main, and sometimes a drink or a side that goes with it
+            main = rng.randint(1, MENU_ITEMS // 2)
+            lines = [main] + [MENU_ITEMS // 2 + main % 10 + 1] * (rng.random() < 0.4) \
+                + [rng.randint(1, MENU_ITEMS) for _ in range(rng.randint(0, 2))]
+            orders.extend(
+                {'ticket_id': ticket_id, 'menu_item_id': item_id, 'quantity': 1, 'payment_status': 'paid', 'status': 'completed'}
+                for item_id in lines
+            )
+            ticket_id += 1
+        db.session.execute(insert(PickupTicket), tickets)
+        db.session.execute(insert(Order), orders)
+    db.session.commit()
+    return ticket_id
+
+
+def seed():
+    """Bulk-insert students, the menu and YEARS of school-day baskets"""
+    rng = random.Random(42)
+    db.drop_all()
+    db.create_all()
+
+    db.session.execute(insert(StudentInfo), [
+        {'id': i, 'name': f'Student {i}', 'ic_number': f'S{i:06d}', 'role': 'student', 'pin_hash': 'x', 'balance': 0}
+        for i in range(1, STUDENTS + 1)
+    ])
+    db.session.execute(insert(MenuItem), [
+        {'id': i, 'name': f'Item {i}', 'price': 2 + i % 6, 'category': 'Food', 'is_available': True}
+        for i in range(1, MENU_ITEMS + 1)
+    ])
+    school_days = [back for back in range(2, YEARS * 365) if (now_myt() - timedelta(days=back)).weekday() < 5]
+    return rng, _insert_days(rng, 1, school_days), len(school_days)
+
+
+def main():
+    with app.app_context():
+        print(f"Seeding {YEARS} years of checkout baskets for {MENU_ITEMS} items...")
+        rng, next_ticket, days = seed()
+        print(f"{next_ticket - 1} tickets over {days} school days")
+
+        started = time.perf_counter()
+        baskets = update_co_purchases(reset=True)
+        print(f"{'update_co_purchases(reset=True)':<32} {(time.perf_counter() - started) * 1000:9.1f} ms  ({baskets} baskets)")
+
+        _insert_days(rng, next_ticket, [1])
+        started = time.perf_counter()
+        baskets = update_co_purchases()
+        print(f"{'update_co_purchases() one day':<32} {(time.perf_counter() - started) * 1000:9.1f} ms  ({baskets} baskets)")
+
+        started = time.perf_counter()
+        pairs = top_pairs()
+        print(f"{'top_pairs()':<32} {(time.perf_counter() - started) * 1000:9.1f} ms  ({len(pairs)} pairs)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark for tomorrow's demand forecast.
+Seeds several years of school-day sales_daily rows for a full menu into a scratch
+database and reports the wall time of one forecast computation.
+
+Usage:
+    python benchmarks/bench_demand_forecast.py
+    BENCH_DATABASE_URL=postgresql://... python benchmarks/bench_demand_forecast.py
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+YEARS = 3
+MENU_ITEMS = 60
+
+# Point the app at a scratch database before it is imported
+_scratch_dir = tempfile.mkdtemp(prefix='mymurid_bench_')
+os.environ['FLASK_ENV'] = 'testing'
+os.environ['TEST_DATABASE_URL'] = os.environ.get('BENCH_DATABASE_URL') or f"sqlite:///{_scratch_dir}/bench.db"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert  # noqa: E402
+
+from app import app  # noqa: E402
+from demand_forecast import forecast_tomorrow  # noqa: E402
+from models import db, MenuItem, SalesDaily  # noqa: E402
+from tz_utils import now_myt  # noqa: E402
+
+
+def seed():
+    """Bulk-insert menu items and one sales_daily row per item per weekday"""
+    rng = random.Random(42)
+    db.drop_all()
+    db.create_all()
+
+    db.session.execute(insert(MenuItem), [
+        {'id': i, 'name': f'Item {i}', 'price': 2 + i % 6, 'category': 'Food', 'is_available': True}
+        for i in range(1, MENU_ITEMS + 1)
+    ])
+    today = now_myt().date()
+    rows = []
+    for back in range(YEARS * 365):
+        day = today - timedelta(days=back)
+        if day.weekday() >= 5:
+            continue
+        for item_id in range(1, MENU_ITEMS + 1):
+            quantity = max(0, int(rng.gauss(5 + item_id % 20 + day.weekday(), 3)))
+            rows.append({
+                'sale_date': day, 'menu_item_id': item_id, 'quantity': quantity,
+                'revenue': quantity * (2 + item_id % 6), 'order_count': quantity,
+            })
+    db.session.execute(insert(SalesDaily), rows)
+    db.session.commit()
+    return len(rows)
+
+
+def main():
+    with app.app_context():
+        print(f"Seeding {YEARS} years of daily sales for {MENU_ITEMS} items...")
+        rows = seed()
+        print(f"{rows} sales_daily rows")
+
+        best = None
+        for _ in range(3):
+            db.session.expire_all()
+            started = time.perf_counter()
+            forecast = forecast_tomorrow()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"{'forecast_tomorrow()':<32} {best * 1000:9.1f} ms  ({len(forecast['items'])} items)")
+
+
+if __name__ == '__main__':
+    main()
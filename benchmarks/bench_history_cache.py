@@ -0,0 +1,97 @@
+"""
+Benchmark for the columnar order history cache.
+Seeds half a year of paid orders into a scratch database and reports the wall
+time of the first export_history(), a nightly append of one more day, and
+rebuild_favourites() reading every order from the database versus from the
+memory-mapped cache.
+
+Usage:
+    python benchmarks/bench_history_cache.py
+    BENCH_DATABASE_URL=postgresql://... python benchmarks/bench_history_cache.py
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+STUDENTS = 2000
+ITEMS = 40
+DAYS = 180
+ORDERS_PER_DAY = 2500
+
+# Point the app and the cache at scratch locations before they are imported
+_scratch_dir = tempfile.mkdtemp(prefix='mymurid_bench_')
+os.environ['FLASK_ENV'] = 'testing'
+os.environ['TEST_DATABASE_URL'] = os.environ.get('BENCH_DATABASE_URL') or f"sqlite:///{_scratch_dir}/bench.db"
+os.environ['HISTORY_CACHE_DIR'] = os.path.join(_scratch_dir, 'history_cache')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert  # noqa: E402
+
+from app import app  # noqa: E402
+from favourites import rebuild_favourites  # noqa: E402
+from history_cache import HISTORY_CACHE_DIR, export_history  # noqa: E402
+from models import db, MenuItem, Order, StudentInfo  # noqa: E402
+from tz_utils import now_myt  # noqa: E402
+
+
+def _orders(day, rng):
+    rows = []
+    for _ in range(ORDERS_PER_DAY):
+        at = datetime.combine(day, datetime.min.time()) + timedelta(hours=7, minutes=rng.randint(0, 360))
+        quantity = rng.randint(1, 3)
+        rows.append({'student_id': rng.randint(1, STUDENTS), 'menu_item_id': rng.randint(1, ITEMS),
+                     'quantity': quantity, 'total_price': 2.5 * quantity, 'payment_status': 'paid',
+                     'status': 'completed', 'order_time': at, 'paid_at': at})
+    return rows
+
+
+def seed():
+    """Bulk-insert students, menu items and DAYS of paid orders ending two days ago"""
+    rng = random.Random(11)
+    db.drop_all()
+    db.create_all()
+    db.session.execute(insert(StudentInfo), [
+        {'id': i, 'name': f'Student {i}', 'ic_number': f'S{i:06d}', 'role': 'student', 'pin_hash': 'x', 'balance': 0}
+        for i in range(1, STUDENTS + 1)
+    ])
+    db.session.execute(insert(MenuItem), [
+        {'id': i, 'name': f'Item {i}', 'price': 2.5, 'category': 'Food', 'is_available': True}
+        for i in range(1, ITEMS + 1)
+    ])
+    today = now_myt().date()
+    for back in range(DAYS + 2, 2, -1):
+        db.session.execute(insert(Order), _orders(today - timedelta(days=back), rng))
+    db.session.commit()
+    return rng, today
+
+
+def _timed(label, fn):
+    started = time.perf_counter()
+    result = fn()
+    print(f"{label:<36} {(time.perf_counter() - started) * 1000:9.1f} ms  ({result})")
+    return result
+
+
+def main():
+    with app.app_context():
+        print(f"Seeding {DAYS} days x {ORDERS_PER_DAY} paid orders...")
+        rng, today = seed()
+
+        _timed('rebuild_favourites() from database', rebuild_favourites)
+        db.session.rollback()
+        _timed('first export_history()', lambda: export_history('orders', until=today - timedelta(days=2)))
+
+        db.session.execute(insert(Order), _orders(today - timedelta(days=2), rng))
+        db.session.commit()
+        _timed('nightly export_history()', lambda: export_history('orders', until=today - timedelta(days=1)))
+        _timed('rebuild_favourites() from cache', rebuild_favourites)
+        db.session.rollback()
+    shutil.rmtree(HISTORY_CACHE_DIR, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
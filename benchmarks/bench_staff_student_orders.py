@@ -0,0 +1,103 @@
+"""
+Benchmark for the staff student-orders summaries.
+Seeds 2,000 students and 100,000 paid orders into a scratch database and times
+the main view, a search and a full (unpaginated) listing.
+
+Usage:
+    python benchmarks/bench_staff_student_orders.py
+    BENCH_DATABASE_URL=postgresql://... python benchmarks/bench_staff_student_orders.py
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+STUDENTS = 2000
+ORDERS = 100_000
+MENU_ITEMS = 25
+
+# Point the app at a scratch database before it is imported
+_scratch_dir = tempfile.mkdtemp(prefix='mymurid_bench_')
+os.environ['FLASK_ENV'] = 'testing'
+os.environ['TEST_DATABASE_URL'] = os.environ.get('BENCH_DATABASE_URL') or f"sqlite:///{_scratch_dir}/bench.db"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event, insert  # noqa: E402
+
+from app import app, _get_staff_student_paid_summaries  # noqa: E402
+from models import db, StudentInfo, MenuItem, Order  # noqa: E402
+from tz_utils import now_myt  # noqa: E402
+
+
+def seed():
+    """Bulk-insert students, menu items and paid orders"""
+    rng = random.Random(42)
+    db.drop_all()
+    db.create_all()
+
+    db.session.execute(insert(MenuItem), [
+        {'id': i, 'name': f'Item {i}', 'price': 2 + i % 6, 'category': 'Food', 'is_available': True}
+        for i in range(1, MENU_ITEMS + 1)
+    ])
+    db.session.execute(insert(StudentInfo), [
+        {'id': i, 'name': f'Student {i:04d}', 'ic_number': f'{i:06d}', 'pin_hash': 'x',
+         'role': 'student', 'balance': 100}
+        for i in range(1, STUDENTS + 1)
+    ])
+    start = now_myt() - timedelta(days=180)
+    rows = []
+    for i in range(ORDERS):
+        # Skew orders so roughly a quarter of the school never buys anything
+        student_id = rng.randint(1, int(STUDENTS * 0.75))
+        item_id = rng.randint(1, MENU_ITEMS)
+        qty = rng.randint(1, 3)
+        rows.append({
+            'student_id': student_id,
+            'menu_item_id': item_id,
+            'quantity': qty,
+            'total_price': qty * (2 + item_id % 6),
+            'status': 'completed',
+            'payment_status': 'paid',
+            'order_time': start + timedelta(minutes=i),
+        })
+    db.session.execute(insert(Order), rows)
+    db.session.commit()
+
+
+def timed(label, fn, repeat=5):
+    """Run fn a few times and print the best wall time and statement count"""
+    statements = []
+
+    def count(*_args, **_kwargs):
+        statements.append(1)
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    best = None
+    try:
+        for _ in range(repeat):
+            statements.clear()
+            db.session.expunge_all()
+            started = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    print(f"{label:<40} {best * 1000:9.1f} ms  {len(statements):6d} queries")
+
+
+def main():
+    with app.app_context():
+        print(f"Seeding {STUDENTS} students and {ORDERS} orders...")
+        seed()
+        per_page = app.config['STUDENTS_PER_PAGE']
+        timed('main view, first page', lambda: _get_staff_student_paid_summaries('', 1, per_page))
+        timed('main view, page 30', lambda: _get_staff_student_paid_summaries('', 30, per_page))
+        timed('search "Student 01"', lambda: _get_staff_student_paid_summaries('Student 01', 1, per_page))
+        timed('main view, unpaginated', lambda: _get_staff_student_paid_summaries(''), repeat=1)
+
+
+if __name__ == '__main__':
+    main()
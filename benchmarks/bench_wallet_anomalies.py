@@ -0,0 +1,99 @@
+"""
+Benchmark for the nightly wallet anomaly scoring.
+Seeds five weeks of ledger activity for a whole school into a scratch database,
+with a few students given a spending burst, repeated refunds, many top-ups or
+late-night orders, and reports the wall time of detect_anomalies() and which
+planted students it flagged.
+
+Usage:
+    python benchmarks/bench_wallet_anomalies.py
+    BENCH_DATABASE_URL=postgresql://... python benchmarks/bench_wallet_anomalies.py
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+STUDENTS = 3000
+DAYS = 35
+
+# Point the app at a scratch database before it is imported
+_scratch_dir = tempfile.mkdtemp(prefix='mymurid_bench_')
+os.environ['FLASK_ENV'] = 'testing'
+os.environ['TEST_DATABASE_URL'] = os.environ.get('BENCH_DATABASE_URL') or f"sqlite:///{_scratch_dir}/bench.db"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert  # noqa: E402
+
+from app import app  # noqa: E402
+from models import db, StudentInfo, WalletAnomaly  # noqa: E402
+from transactions import Transaction  # noqa: E402
+from tz_utils import now_myt  # noqa: E402
+from wallet_anomalies import detect_anomalies  # noqa: E402
+
+PLANTED = {'burst': range(1, 6), 'refunds': range(6, 11), 'topups': range(11, 16), 'night': range(16, 21)}
+
+
+def _at(day, hour, rng):
+    return datetime.combine(day, datetime.min.time()) + timedelta(hours=hour, minutes=rng.randint(0, 59))
+
+
+def seed():
+    """Bulk-insert students and DAYS of payments and weekly top-ups, plus the planted anomalies"""
+    rng = random.Random(7)
+    db.drop_all()
+    db.create_all()
+    db.session.execute(insert(StudentInfo), [
+        {'id': i, 'name': f'Student {i}', 'ic_number': f'S{i:06d}', 'role': 'student', 'pin_hash': 'x', 'balance': 0}
+        for i in range(1, STUDENTS + 1)
+    ])
+    today = now_myt().date()
+    rows = []
+    for back in range(1, DAYS + 1):
+        day = today - timedelta(days=back)
+        if day.weekday() >= 5:
+            continue
+        recent = back <= 7
+        for student in range(1, STUDENTS + 1):
+            payments = rng.choice((0, 1, 1, 2))
+            if recent and student in PLANTED['burst']:
+                payments = 6
+            for _ in range(payments):
+                hour = 22 if recent and student in PLANTED['night'] else rng.choice((7, 10, 13))
+                rows.append({'student_id': student, 'type': 'Payment', 'amount': -rng.randint(2, 7),
+                             'description': 'Payment', 'transaction_time': _at(day, hour, rng)})
+            if recent and student in PLANTED['refunds']:
+                rows.append({'student_id': student, 'type': 'Refund', 'amount': rng.randint(2, 7),
+                             'description': 'Refund', 'transaction_time': _at(day, 11, rng)})
+            if day.weekday() == (student % 5) or (recent and student in PLANTED['topups']):
+                rows.append({'student_id': student, 'type': 'Top-up', 'amount': rng.choice((10, 20, 30)),
+                             'description': 'Top-up', 'transaction_time': _at(day, 20, rng)})
+    for i in range(0, len(rows), 10000):
+        db.session.execute(insert(Transaction), rows[i:i + 10000])
+    db.session.commit()
+    return len(rows)
+
+
+def main():
+    with app.app_context():
+        print(f"Seeding {DAYS} days of wallet activity for {STUDENTS} students...")
+        print(f"{seed()} ledger rows")
+
+        started = time.perf_counter()
+        result = detect_anomalies(now_myt().date() - timedelta(days=1))
+        db.session.commit()
+        print(f"{'detect_anomalies()':<32} {(time.perf_counter() - started) * 1000:9.1f} ms  "
+              f"({result['students']} students, {result['flagged']} flagged)")
+
+        flagged = {a.student_id: a.reasons for a in WalletAnomaly.query}
+        for kind, students in PLANTED.items():
+            caught = [s for s in students if s in flagged]
+            print(f"  planted {kind:<8} {len(caught)}/{len(students)} flagged")
+        others = [s for s in flagged if not any(s in students for students in PLANTED.values())]
+        print(f"  other students flagged: {len(others)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+"""
+Per-student spending rollup for parents' spending timelines.
+
+student_item_daily keeps quantity, amount spent and order count per student,
+MYT day and menu item; student_topup_daily keeps the top-ups credited per
+student and day. Checkout and deleting/refunding a paid order update the first
+(next to sales_daily), every "Top-up" ledger entry updates the second, and
+rollup_child_spending() recomputes a date range from orders and the ledger.
+
+spending_timeline() builds a child's daily or weekly buckets, top items and
+top-up history from these rows alone, so a parent's request reads at most a
+few hundred rows however long the child has been ordering.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from sqlalchemy import delete, func, insert, select
+
+from db_utils import increment_counters
+from models import db, MenuItem, Order, StudentItemDaily, StudentTopupDaily
+from transactions import Transaction
+from tz_utils import now_myt
+
+TIMELINE_BUCKETS = ('day', 'week')
+TOP_ITEMS_LIMIT = 5
+
+
+def _sale_date(order):
+    return (order.paid_at or order.order_time).date()
+
+
+def record_child_spending(orders, sign=1):
+    """Add paid orders to the per-student rollup, or subtract them with sign=-1"""
+    totals = defaultdict(lambda: [0, Decimal('0'), 0])
+    for order in orders:
+        if not order.student_id or not order.menu_item_id or (order.paid_at or order.order_time) is None:
+            continue
+        entry = totals[(order.student_id, _sale_date(order), order.menu_item_id)]
+        entry[0] += sign * (order.quantity or 0)
+        entry[1] += sign * Decimal(order.total_price or 0)
+        entry[2] += sign
+    increment_counters(
+        StudentItemDaily,
+        ('student_id', 'sale_date', 'menu_item_id'),
+        [
+            {'student_id': student_id, 'sale_date': day, 'menu_item_id': item_id,
+             'quantity': quantity, 'spent': spent, 'order_count': count}
+            for (student_id, day, item_id), (quantity, spent, count) in totals.items()
+        ],
+        ('quantity', 'spent', 'order_count'),
+    )
+
+
+def record_topup(student_id, amount, when=None):
+    """Add one top-up credited to a student (at when, MYT, default now)"""
+    day = (when or now_myt()).date()
+    increment_counters(
+        StudentTopupDaily,
+        ('student_id', 'topup_date'),
+        [{'student_id': student_id, 'topup_date': day, 'amount': Decimal(amount), 'topup_count': 1}],
+        ('amount', 'topup_count'),
+    )
+
+
+def rollup_child_spending(start=None, end=None):
+    """Recompute both per-student rollups for start..end (inclusive dates, open-ended if None).
+
+    Returns the number of rollup rows written.
+    """
+    paid_at = func.coalesce(Order.paid_at, Order.order_time)
+    sale_date = func.date(paid_at)
+    orders = (
+        select(
+            Order.student_id,
+            sale_date,
+            Order.menu_item_id,
+            func.coalesce(func.sum(Order.quantity), 0),
+            func.coalesce(func.sum(Order.total_price), 0),
+            func.count(Order.id),
+        )
+        .where(Order.payment_status == 'paid', Order.menu_item_id.isnot(None), Order.student_id.isnot(None))
+        .group_by(Order.student_id, sale_date, Order.menu_item_id)
+    )
+    topup_date = func.date(Transaction.transaction_time)
+    topups = (
+        select(Transaction.student_id, topup_date, func.sum(Transaction.amount), func.count(Transaction.id))
+        .where(Transaction.type == 'Top-up', Transaction.student_id.isnot(None))
+        .group_by(Transaction.student_id, topup_date)
+    )
+    existing_items = delete(StudentItemDaily)
+    existing_topups = delete(StudentTopupDaily)
+    if start is not None:
+        orders = orders.where(paid_at >= start)
+        topups = topups.where(Transaction.transaction_time >= start)
+        existing_items = existing_items.where(StudentItemDaily.sale_date >= start)
+        existing_topups = existing_topups.where(StudentTopupDaily.topup_date >= start)
+    if end is not None:
+        orders = orders.where(sale_date <= end)
+        topups = topups.where(topup_date <= end)
+        existing_items = existing_items.where(StudentItemDaily.sale_date <= end)
+        existing_topups = existing_topups.where(StudentTopupDaily.topup_date <= end)
+
+    db.session.execute(existing_items)
+    db.session.execute(existing_topups)
+    written = db.session.execute(
+        insert(StudentItemDaily).from_select(
+            ['student_id', 'sale_date', 'menu_item_id', 'quantity', 'spent', 'order_count'], orders
+        )
+    ).rowcount
+    written += db.session.execute(
+        insert(StudentTopupDaily).from_select(['student_id', 'topup_date', 'amount', 'topup_count'], topups)
+    ).rowcount
+    return written
+
+
+def _bucket_start(day, bucket):
+    return day - timedelta(days=day.weekday()) if bucket == 'week' else day
+
+
+def spending_timeline(student_id, start, end, bucket='day'):
+    """A student's spending and top-ups over start..end (inclusive dates) in day or week buckets.
+
+    Weeks start on Monday; the first and last week are clipped to the range.
+    Raises ValueError for an unknown bucket.
+    """
+    if bucket not in TIMELINE_BUCKETS:
+        raise ValueError(f"bucket must be one of: {', '.join(TIMELINE_BUCKETS)}")
+    step = timedelta(days=7 if bucket == 'week' else 1)
+    buckets = {}
+    first = _bucket_start(start, bucket)
+    while first <= end:
+        buckets[first] = {
+            'start': max(first, start), 'end': min(first + step - timedelta(days=1), end),
+            'spent': Decimal('0'), 'quantity': 0, 'order_count': 0, 'topped_up': Decimal('0'), 'topup_count': 0,
+        }
+        first += step
+
+    items = defaultdict(lambda: {'quantity': 0, 'spent': Decimal('0')})
+    for day, item_id, quantity, spent, count in db.session.query(
+        StudentItemDaily.sale_date, StudentItemDaily.menu_item_id,
+        StudentItemDaily.quantity, StudentItemDaily.spent, StudentItemDaily.order_count,
+    ).filter(
+        StudentItemDaily.student_id == student_id,
+        StudentItemDaily.sale_date >= start,
+        StudentItemDaily.sale_date <= end,
+    ):
+        entry = buckets[_bucket_start(day, bucket)]
+        entry['spent'] += Decimal(spent)
+        entry['quantity'] += quantity
+        entry['order_count'] += count
+        items[item_id]['quantity'] += quantity
+        items[item_id]['spent'] += Decimal(spent)
+
+    topups = []
+    for day, amount, count in db.session.query(
+        StudentTopupDaily.topup_date, StudentTopupDaily.amount, StudentTopupDaily.topup_count,
+    ).filter(
+        StudentTopupDaily.student_id == student_id,
+        StudentTopupDaily.topup_date >= start,
+        StudentTopupDaily.topup_date <= end,
+        StudentTopupDaily.topup_count > 0,
+    ).order_by(StudentTopupDaily.topup_date.desc()):
+        entry = buckets[_bucket_start(day, bucket)]
+        entry['topped_up'] += Decimal(amount)
+        entry['topup_count'] += count
+        topups.append({'date': day, 'amount': Decimal(amount), 'count': count})
+
+    ranked = sorted(
+        ((item_id, totals) for item_id, totals in items.items() if totals['quantity'] > 0),
+        key=lambda pair: (-pair[1]['spent'], -pair[1]['quantity'], pair[0]),
+    )[:TOP_ITEMS_LIMIT]
+    names = dict(
+        db.session.query(MenuItem.id, MenuItem.name).filter(MenuItem.id.in_([item_id for item_id, _ in ranked]))
+    ) if ranked else {}
+    series = list(buckets.values())
+    return {
+        'bucket': bucket,
+        'totals': {
+            'spent': sum((b['spent'] for b in series), Decimal('0')),
+            'quantity': sum(b['quantity'] for b in series),
+            'order_count': sum(b['order_count'] for b in series),
+            'topped_up': sum((b['topped_up'] for b in series), Decimal('0')),
+            'topup_count': sum(b['topup_count'] for b in series),
+        },
+        'buckets': series,
+        'top_items': [
+            {'menu_item_id': item_id, 'name': names.get(item_id, 'Removed item'), **totals}
+            for item_id, totals in ranked
+        ],
+        'topups': topups,
+    }
@@ -0,0 +1,62 @@
+"""
+Script to run the end-of-day settlement close
+Freezes a daily_settlement row for every finished MYT day that is not closed
+yet (all of them up to yesterday by default). The first run starts at the last
+balance reconcile, or yesterday; pass --start to backfill older days. Safe to
+re-run; an interrupted run resumes from the last closed day:
+
+    python close_day.py
+    python close_day.py 2026-10-01
+    python close_day.py --start 2026-09-01
+"""
+import argparse
+import os
+import sys
+from datetime import date
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db
+from settlement import close_days
+
+def parse_args():
+    """Command line: last day to close and an optional first day to backfill from"""
+    parser = argparse.ArgumentParser(description="Close finished days into daily_settlement")
+    parser.add_argument('until', nargs='?', help="Last day to close, YYYY-MM-DD (default yesterday)")
+    parser.add_argument('--start', help="Backfill from this day, YYYY-MM-DD")
+    return parser.parse_args()
+
+def main():
+    """Close pending days, one committed day at a time"""
+    args = parse_args()
+    try:
+        until = date.fromisoformat(args.until) if args.until else None
+        start = date.fromisoformat(args.start) if args.start else None
+    except ValueError:
+        print("❌ Invalid date, expected YYYY-MM-DD")
+        sys.exit(1)
+
+    print("=" * 60)
+    print("🔒 End-of-day settlement close")
+    print("=" * 60)
+
+    with app.app_context():
+        try:
+            closed = close_days(until, start)
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Close failed: {str(e)}")
+            print("Days closed before the failure are kept; re-run to resume.")
+            sys.exit(1)
+        if closed:
+            print(f"✅ Closed {len(closed)} day(s): {closed[0]} to {closed[-1]}.")
+        else:
+            print("✅ Nothing to close.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Market-basket analytics: which menu items are bought together.
+
+Every pickup ticket is one basket. Orders paid before checkouts issued
+tickets have no ticket_id; the first run (and every rebuild) counts each
+student's ticketless paid orders on one MYT day as one basket instead, so the
+counts cover the whole order history. update_co_purchases() reads the (ticket,
+item) pairs of tickets newer than its watermark into NumPy arrays, builds the
+0/1 basket x item matrix B a chunk of tickets at a time and adds B.T @ B, the
+item x item co-occurrence counts, onto co_purchase. Only tickets created more
+than TICKET_SETTLE ago are read, so a checkout still committing is never
+skipped past. Refunds after a basket has been counted are not subtracted;
+rebuild (reset=True) to recount from scratch.
+
+top_pairs() derives support, confidence and lift for every pair from the
+stored counts.
+"""
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy import delete, func
+
+from db_utils import increment_counters
+from models import db, CoPurchase, CoPurchaseState, MenuItem, Order, PickupTicket
+from tz_utils import now_myt
+
+# Tickets per B.T @ B product; keeps the dense chunk small and float32 counts exact
+TICKET_CHUNK = 20000
+# Tickets younger than this may still have uncommitted neighbours
+TICKET_SETTLE = timedelta(minutes=2)
+PAIR_SORT_KEYS = ('lift', 'confidence', 'support', 'baskets')
+
+
+def _state():
+    state = db.session.get(CoPurchaseState, 1)
+    if state is None:
+        state = CoPurchaseState(id=1, last_ticket_id=0, baskets=0)
+        db.session.add(state)
+    return state
+
+
+def co_occurrence(ticket_ids, item_ids):
+    """(items, counts[items, items], baskets) from parallel arrays of basket lines"""
+    items = np.unique(item_ids)
+    item_idx = np.searchsorted(items, item_ids)
+    # One int64 key per (ticket, item); a single sort dedupes lines and groups them by ticket
+    keys = np.sort(ticket_ids.astype(np.int64) * len(items) + item_idx)
+    keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+    ticket_of, item_idx = np.divmod(keys, len(items))
+    ticket_idx = np.concatenate(([0], np.cumsum(ticket_of[1:] != ticket_of[:-1])))
+    baskets = int(ticket_idx[-1]) + 1
+    counts = np.zeros((len(items), len(items)), dtype=np.int64)
+
+    # Each chunk of tickets is a contiguous slice of the sorted keys
+    bounds = np.searchsorted(ticket_idx, np.arange(0, baskets + TICKET_CHUNK, TICKET_CHUNK))
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        if lo == hi:
+            continue
+        rows = ticket_idx[lo:hi] - ticket_idx[lo]
+        basket = np.zeros((rows[-1] + 1, len(items)), dtype=np.float32)
+        basket[rows, item_idx[lo:hi]] = 1
+        counts += (basket.T @ basket).astype(np.int64)
+    return items, counts, baskets
+
+
+def _ticketless_baskets():
+    """(basket ids, item ids) of paid orders without a ticket, one basket per student and MYT day
+
+    Basket ids are negative so they never collide with ticket ids.
+    """
+    sale_day = func.date(func.coalesce(Order.paid_at, Order.order_time))
+    rows = db.session.query(Order.student_id, sale_day, Order.menu_item_id).filter(
+        Order.ticket_id.is_(None),
+        Order.payment_status == 'paid',
+        Order.student_id.isnot(None),
+        Order.menu_item_id.isnot(None),
+    ).yield_per(50000)
+    basket_ids, item_ids = [], []
+    for student_id, day, item_id in rows:
+        day = date.fromisoformat(day) if isinstance(day, str) else day
+        # Day ordinals stay below 10 ** 6, so (student, day) packs into one id
+        basket_ids.append(-(student_id * 10 ** 6 + day.toordinal()))
+        item_ids.append(item_id)
+    return basket_ids, item_ids
+
+
+def update_co_purchases(reset=False):
+    """Count baskets from tickets newer than the watermark; returns the number of new baskets
+
+    The first run, and reset=True, also count the ticketless orders from before tickets.
+    """
+    if reset:
+        db.session.execute(delete(CoPurchase))
+        db.session.execute(delete(CoPurchaseState))
+    state = _state()
+    first_run = not state.last_ticket_id and not state.baskets
+
+    rows = db.session.query(Order.ticket_id, Order.menu_item_id) \
+        .join(PickupTicket, PickupTicket.id == Order.ticket_id) \
+        .filter(
+            Order.ticket_id > state.last_ticket_id,
+            PickupTicket.created_at < now_myt().replace(tzinfo=None) - TICKET_SETTLE,
+            Order.payment_status == 'paid',
+            Order.menu_item_id.isnot(None),
+        ).yield_per(50000)
+    ticket_ids, item_ids = [], []
+    for ticket_id, item_id in rows:
+        ticket_ids.append(ticket_id)
+        item_ids.append(item_id)
+    last_ticket_id = max(ticket_ids, default=state.last_ticket_id)
+    if first_run:
+        legacy_baskets, legacy_items = _ticketless_baskets()
+        ticket_ids += legacy_baskets
+        item_ids += legacy_items
+    if not ticket_ids:
+        db.session.commit()
+        return 0
+
+    items, counts, baskets = co_occurrence(
+        np.array(ticket_ids, dtype=np.int64), np.array(item_ids, dtype=np.int64)
+    )
+    a_idx, b_idx = np.nonzero(np.triu(counts))
+    increment_counters(CoPurchase, ('item_a', 'item_b'), [
+        {'item_a': int(items[a]), 'item_b': int(items[b]), 'baskets': int(counts[a, b])}
+        for a, b in zip(a_idx, b_idx)
+    ], ('baskets',))
+
+    state.last_ticket_id = last_ticket_id
+    state.baskets += baskets
+    state.updated_at = now_myt()
+    db.session.commit()
+    return baskets
+
+
+def top_pairs(limit=20, sort='lift', min_baskets=5):
+    """Best item pairs with support, confidence (both directions) and lift"""
+    state = db.session.get(CoPurchaseState, 1)
+    if state is None or not state.baskets:
+        return []
+    rows = db.session.query(CoPurchase.item_a, CoPurchase.item_b, CoPurchase.baskets).all()
+    if not rows:
+        return []
+    a, b, n_ab = (np.array(col, dtype=np.int64) for col in zip(*rows))
+
+    single = a == b
+    item_counts = dict(zip(a[single].tolist(), n_ab[single].tolist()))
+    keep = ~single & (n_ab >= min_baskets)
+    a, b, n_ab = a[keep], b[keep], n_ab[keep]
+    if not len(a):
+        return []
+
+    n_a = np.array([item_counts.get(i, 0) for i in a.tolist()], dtype=np.float64)
+    n_b = np.array([item_counts.get(i, 0) for i in b.tolist()], dtype=np.float64)
+    total = float(state.baskets)
+    metrics = {
+        'baskets': n_ab.astype(np.float64),
+        'support': n_ab / total,
+        'confidence': n_ab / np.maximum(n_a, n_b),  # the weaker of the two directions
+        'lift': n_ab * total / (n_a * n_b),
+    }
+    order = np.argsort(-metrics[sort], kind='stable')[:limit]
+
+    names = dict(db.session.query(MenuItem.id, MenuItem.name).filter(
+        MenuItem.id.in_(set(a[order].tolist()) | set(b[order].tolist()))
+    ).all())
+    return [
+        {
+            'item_a': {'id': int(a[i]), 'name': names.get(int(a[i]))},
+            'item_b': {'id': int(b[i]), 'name': names.get(int(b[i]))},
+            'baskets': int(n_ab[i]),
+            'support': round(float(metrics['support'][i]), 4),
+            'confidence_a_to_b': round(float(n_ab[i] / n_a[i]), 4),
+            'confidence_b_to_a': round(float(n_ab[i] / n_b[i]), 4),
+            'lift': round(float(metrics['lift'][i]), 3),
+        }
+        for i in order
+    ]
@@ -11,6 +11,10 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_RECORD_QUERIES = True
     
+    # Optional read replica for analytics, exports and reports (see db_routing.py)
+    REPLICA_DATABASE_URL = os.environ.get('REPLICA_DATABASE_URL')
+    SQLALCHEMY_BINDS = {'replica': REPLICA_DATABASE_URL} if REPLICA_DATABASE_URL else {}
+    
     # Security settings
     WTF_CSRF_TIME_LIMIT = 3600  # 1 hour
     PERMANENT_SESSION_LIFETIME = timedelta(hours=2)
@@ -25,6 +29,9 @@ class Config:
     # Pagination
     STUDENTS_PER_PAGE = 20
     ORDERS_PER_PAGE = 50
+    # Incremental student-order refreshes re-send changes this recent, so a
+    # slower checkout that commits after a newer one is not missed
+    ORDERS_CURSOR_OVERLAP_SECONDS = 30
     
     # Logging
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
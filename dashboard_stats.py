@@ -0,0 +1,54 @@
+"""
+Admin and staff dashboard statistics.
+
+Every figure comes from one SELECT of scalar subqueries over tables that do not
+grow with the order history: revenue and paid-order counts from the sales_daily
+rollup, active orders from the pending rows of kitchen_queue (served by its
+partial index), plus the student and feedback counts. The result is shared by
+all dashboard loads for DASHBOARD_STATS_TTL seconds, and only one request per
+worker recomputes it when it expires.
+"""
+import threading
+import time
+
+from sqlalchemy import func, select
+
+from models import db, Feedback, KitchenQueueEntry, SalesDaily, StudentInfo
+
+# Seconds a computed set of statistics is served before it is recomputed
+DASHBOARD_STATS_TTL = 15
+
+_refresh_lock = threading.Lock()
+_cache = {'expires': 0.0, 'stats': None}
+
+
+def _compute():
+    row = db.session.execute(select(
+        select(func.count(StudentInfo.id)).scalar_subquery(),
+        select(func.count(KitchenQueueEntry.order_id))
+        .where(KitchenQueueEntry.status == 'pending').scalar_subquery(),
+        select(func.coalesce(func.sum(SalesDaily.revenue), 0)).scalar_subquery(),
+        select(func.coalesce(func.sum(SalesDaily.order_count), 0)).scalar_subquery(),
+        select(func.count(Feedback.id)).scalar_subquery(),
+    )).one()
+    total_students, active_orders, total_revenue, paid_orders, pending_feedback = row
+    return {
+        'total_students': total_students,
+        'active_orders': active_orders,
+        'total_revenue': float(total_revenue),
+        'paid_orders': int(paid_orders),
+        'pending_feedback': pending_feedback,
+    }
+
+
+def dashboard_stats():
+    """{'total_students', 'active_orders', 'total_revenue', 'paid_orders', 'pending_feedback'}"""
+    if _cache['expires'] > time.monotonic():
+        return _cache['stats']
+    with _refresh_lock:
+        # Another request may have refreshed the stats while this one waited
+        if _cache['expires'] <= time.monotonic():
+            _cache['stats'] = _compute()
+            _cache['expires'] = time.monotonic() + DASHBOARD_STATS_TTL
+        return _cache['stats']
+
@@ -0,0 +1,130 @@
+"""
+Read-replica routing.
+
+When REPLICA_DATABASE_URL is set it becomes the 'replica' bind, and routes or
+jobs that opt in with @replica_reads / use_replica() send their plain SELECTs
+there instead of to the primary. Everything else (flushes, INSERT/UPDATE/DELETE,
+raw SQL, and every query of a request that has written) stays on the primary.
+
+The replica is only used while its replication lag is under
+REPLICA_MAX_LAG_SECONDS (checked at most every REPLICA_LAG_CHECK_SECONDS) and
+it is reachable. After a request writes, the same browser session reads from
+the primary for READ_YOUR_WRITES_SECONDS, and a request can ask for the primary
+explicitly with an X-Read-Primary: 1 header. Locally, any second database
+(another PostgreSQL database or an SQLite file) can stand in as the replica.
+"""
+import os
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, g, has_app_context, has_request_context, request, session as flask_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Select, text
+from sqlalchemy.sql.dml import UpdateBase
+
+REPLICA_BIND = 'replica'
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', 10))
+REPLICA_LAG_CHECK_SECONDS = 5
+READ_YOUR_WRITES_SECONDS = 10
+
+_WROTE = 'routing_wrote'
+_lag_lock = threading.Lock()
+_lag_state = {'checked': 0.0, 'usable': False}
+
+
+def replica_lag_seconds(engine):
+    """Replication delay of the replica (0 for a primary or a non-PostgreSQL stand-in)"""
+    with engine.connect() as conn:
+        if engine.dialect.name != 'postgresql':
+            conn.execute(text("SELECT 1"))
+            return 0.0
+        in_recovery, lag = conn.execute(text("""
+            SELECT pg_is_in_recovery(),
+                   CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+                   END
+        """)).one()
+    return float(lag) if in_recovery else 0.0
+
+
+def replica_usable(engine, logger=None):
+    """Whether the replica is reachable and caught up; re-checked every few seconds"""
+    now = time.monotonic()
+    if now - _lag_state['checked'] < REPLICA_LAG_CHECK_SECONDS:
+        return _lag_state['usable']
+    # One thread checks; the others keep using the previous answer meanwhile
+    if not _lag_lock.acquire(blocking=False):
+        return _lag_state['usable']
+    try:
+        try:
+            lag = replica_lag_seconds(engine)
+            usable = lag <= REPLICA_MAX_LAG_SECONDS
+            if not usable and logger:
+                logger.warning(f"Replica lag {lag:.1f}s over {REPLICA_MAX_LAG_SECONDS}s, reading from primary")
+        except Exception as e:
+            usable = False
+            if logger:
+                logger.warning(f"Replica unavailable, reading from primary: {str(e)}")
+        _lag_state['usable'] = usable
+        _lag_state['checked'] = time.monotonic()
+        return usable
+    finally:
+        _lag_lock.release()
+
+
+def _replica_requested():
+    return has_app_context() and g.get('db_use_replica', False)
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that may send reads to the replica bind"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if self._flushing or isinstance(clause, UpdateBase):
+                self.info[_WROTE] = True
+            elif isinstance(clause, Select) and _replica_requested() and not self.info.get(_WROTE):
+                engine = self._db.engines.get(REPLICA_BIND)
+                if engine is not None and replica_usable(engine, g.get('db_logger')):
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def use_replica(logger=None):
+    """Send this app context's reads (request or job) to the replica when it is usable"""
+    g.db_use_replica = True
+    g.db_logger = logger
+
+
+def use_primary():
+    """Send this app context's reads back to the primary"""
+    g.db_use_replica = False
+
+
+def _read_primary_requested():
+    if request.headers.get('X-Read-Primary') == '1':
+        return True
+    return flask_session.get('read_primary_until', 0) > time.time()
+
+
+def replica_reads(view):
+    """Route decorator: read from the replica unless this user has just written"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not _read_primary_requested():
+            use_replica(current_app.logger)
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def init_routing(app, db):
+    """Remember writes per browser session so the next reads see them (read-your-writes)"""
+    if REPLICA_BIND not in app.config.get('SQLALCHEMY_BINDS', {}):
+        return
+
+    @app.after_request
+    def _remember_writes(response):
+        if has_request_context() and db.session.info.get(_WROTE):
+            flask_session['read_primary_until'] = time.time() + READ_YOUR_WRITES_SECONDS
+        return response
@@ -0,0 +1,78 @@
+"""
+Database helpers shared by the counter/rollup tables.
+"""
+from models import db
+
+# Rows per multi-row INSERT, well under SQLite's bound-parameter limit
+INSERT_CHUNK_ROWS = 500
+
+
+def _upsert_insert(session=None):
+    """The dialect's INSERT construct supporting ON CONFLICT, or None if unsupported"""
+    dialect = (session or db.session).get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    return None
+
+
+def _in_key_order(rows, key_columns):
+    """rows sorted by their key, so concurrent writers lock shared rows in the same order"""
+    # (is None, value) so a missing key sorts last instead of failing to compare
+    return sorted(rows, key=lambda row: tuple((row[col] is None, row[col]) for col in key_columns))
+
+
+def increment_counters(model, key_columns, rows, counter_columns):
+    """Add each row's counter values onto the matching row of model, inserting it if missing.
+
+    rows are dicts holding the key_columns and counter_columns. PostgreSQL and SQLite use
+    a single INSERT ... ON CONFLICT DO UPDATE, so concurrent writers never lose updates;
+    other databases fall back to read-modify-write through the session. Rows are written
+    in key order, so two transactions touching the same keys cannot deadlock.
+    """
+    if not rows:
+        return
+    rows = _in_key_order(rows, key_columns)
+    insert = _upsert_insert()
+    if insert is not None:
+        stmt = insert(model).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(key_columns),
+            set_={col: getattr(model, col) + stmt.excluded[col] for col in counter_columns},
+        )
+        db.session.execute(stmt)
+        return
+
+    for row in rows:
+        existing = db.session.get(model, tuple(row[col] for col in key_columns))
+        if existing is None:
+            db.session.add(model(**row))
+        else:
+            for col in counter_columns:
+                setattr(existing, col, getattr(existing, col) + row[col])
+
+
+def insert_missing(model, key_columns, rows, session=None):
+    """Insert rows, skipping any whose key already exists (e.g. written by a concurrent request)
+
+    session defaults to the request's db.session.
+    """
+    if not rows:
+        return
+    session = session or db.session
+    rows = _in_key_order(rows, key_columns)
+    insert = _upsert_insert(session)
+    if insert is not None:
+        for i in range(0, len(rows), INSERT_CHUNK_ROWS):
+            session.execute(
+                insert(model).values(rows[i:i + INSERT_CHUNK_ROWS])
+                .on_conflict_do_nothing(index_elements=list(key_columns))
+            )
+        return
+
+    for row in rows:
+        if session.get(model, tuple(row[col] for col in key_columns)) is None:
+            session.add(model(**row))
@@ -0,0 +1,139 @@
+"""
+Per-item demand forecast for tomorrow's prep.
+
+Daily paid quantities come from the sales_daily rollup as one items x days
+NumPy matrix. Days the canteen sold nothing at all (weekends, holidays) are
+dropped, then for tomorrow's weekday every item's level and spread are the
+exponentially weighted mean and standard deviation of its sales on that same
+weekday, computed for all items at once with a single weighted matrix product.
+Recent student votes nudge the level up or down, and the band is the level
++/- BAND_Z standard deviations. Results only change once a day has closed, so
+they are cached per MYT day.
+"""
+import threading
+from datetime import timedelta
+
+import numpy as np
+from sqlalchemy import func
+
+from models import db, MenuItem, SalesDaily, Vote
+from tz_utils import now_myt
+
+# How far back sales are read; older weeks carry negligible weight anyway
+HISTORY_DAYS = 2 * 365
+# Smoothing factor: weight of the most recent same-weekday observation
+SMOOTHING_ALPHA = 0.25
+# z-score of the confidence band (90% two-sided, assuming roughly normal errors)
+BAND_Z = 1.645
+# Votes in this window count towards popularity
+VOTE_WINDOW_DAYS = 14
+# How strongly popularity moves the forecast, and the bounds of that adjustment
+VOTE_WEIGHT = 0.1
+VOTE_FACTOR_RANGE = (0.85, 1.2)
+
+_cache_lock = threading.Lock()
+_cache = {'day': None, 'forecast': None}
+
+
+def load_sales_matrix(item_ids, start, end):
+    """(quantities[items, days], dates) of paid quantities for start..end inclusive"""
+    days = (end - start).days + 1
+    dates = np.array([start + timedelta(days=i) for i in range(days)])
+    matrix = np.zeros((len(item_ids), days), dtype=np.float64)
+    if not item_ids:
+        return matrix, dates
+
+    row_of = {item_id: i for i, item_id in enumerate(item_ids)}
+    rows = db.session.query(
+        SalesDaily.sale_date, SalesDaily.menu_item_id, SalesDaily.quantity
+    ).filter(
+        SalesDaily.sale_date >= start,
+        SalesDaily.sale_date <= end,
+        SalesDaily.menu_item_id.in_(item_ids),
+    ).all()
+    if rows:
+        sale_dates, menu_item_ids, quantities = zip(*rows)
+        matrix[
+            [row_of[i] for i in menu_item_ids],
+            [(d - start).days for d in sale_dates],
+        ] = quantities
+    return matrix, dates
+
+
+def weekday_levels(matrix, dates, weekday, alpha=SMOOTHING_ALPHA):
+    """Exponentially smoothed mean and std per item over the open days falling on weekday.
+
+    Returns (level, std, observations).
+    """
+    weekdays = np.array([d.weekday() for d in dates], dtype=np.int8)
+    open_days = matrix.sum(axis=0) > 0
+    sample = matrix[:, open_days & (weekdays == weekday)]
+    count = sample.shape[1]
+    if count == 0:
+        zeros = np.zeros(matrix.shape[0])
+        return zeros, zeros, 0
+
+    # Oldest column gets alpha * (1 - alpha)^(count - 1), newest gets alpha
+    weights = alpha * (1 - alpha) ** np.arange(count - 1, -1, -1)
+    weights /= weights.sum()
+    level = sample @ weights
+    variance = ((sample - level[:, None]) ** 2) @ weights
+    return level, np.sqrt(variance), count
+
+
+def vote_factors(item_names, since):
+    """Multiplier per item from recent votes relative to the average item's votes"""
+    counts = dict(
+        db.session.query(func.lower(Vote.food_name), func.count(Vote.id))
+        .filter(Vote.timestamp >= since)
+        .group_by(func.lower(Vote.food_name))
+        .all()
+    )
+    votes = np.array([counts.get((name or '').lower(), 0) for name in item_names], dtype=np.float64)
+    if votes.sum() == 0:
+        return np.ones(len(item_names))
+    relative = votes / votes.mean() - 1
+    return np.clip(1 + VOTE_WEIGHT * relative, *VOTE_FACTOR_RANGE)
+
+
+def forecast_tomorrow(today=None):
+    """Expected quantity and 90% band per available menu item for the day after today"""
+    today = today or now_myt().date()
+    target = today + timedelta(days=1)
+    items = MenuItem.query.filter_by(is_available=True).order_by(MenuItem.name).all()
+    item_ids = [item.id for item in items]
+
+    matrix, dates = load_sales_matrix(item_ids, today - timedelta(days=HISTORY_DAYS - 1), today)
+    level, std, observations = weekday_levels(matrix, dates, target.weekday())
+    factors = vote_factors([item.name for item in items], today - timedelta(days=VOTE_WINDOW_DAYS))
+
+    expected = level * factors
+    spread = BAND_Z * std * factors
+    low = np.maximum(expected - spread, 0)
+    high = expected + spread
+
+    return {
+        'date': target.isoformat(),
+        'weekday_observations': observations,
+        'items': [
+            {
+                'menu_item_id': item.id,
+                'name': item.name,
+                'expected': round(float(expected[i]), 1),
+                'low': int(np.floor(low[i])),
+                'high': int(np.ceil(high[i])),
+                'vote_factor': round(float(factors[i]), 2),
+            }
+            for i, item in enumerate(items)
+        ],
+    }
+
+
+def get_forecast():
+    """Tomorrow's forecast, computed at most once per MYT day in this worker"""
+    today = now_myt().date()
+    with _cache_lock:
+        if _cache['day'] != today:
+            _cache['forecast'] = forecast_tomorrow(today)
+            _cache['day'] = today
+        return _cache['forecast']
@@ -0,0 +1,52 @@
+"""
+Script to run the nightly wallet anomaly scoring
+Scores every student's wallet activity over the week ending on the given MYT
+day (yesterday by default) and records flagged students for admin review on
+/admin/wallet-anomalies. Safe to re-run; flags already reviewed are kept:
+
+    python detect_wallet_anomalies.py
+    python detect_wallet_anomalies.py 2026-10-01
+"""
+import os
+import sys
+import time
+from datetime import date
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db
+from wallet_anomalies import detect_anomalies
+
+def main():
+    """Score one day's window in a single transaction"""
+    day = None
+    if len(sys.argv) > 1:
+        try:
+            day = date.fromisoformat(sys.argv[1])
+        except ValueError:
+            print(f"❌ Invalid date '{sys.argv[1]}', expected YYYY-MM-DD")
+            sys.exit(1)
+
+    print("=" * 60)
+    print("🔎 Wallet anomaly scoring")
+    print("=" * 60)
+
+    with app.app_context():
+        started = time.perf_counter()
+        try:
+            result = detect_anomalies(day)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Scoring failed: {str(e)}")
+            sys.exit(1)
+        print(f"✅ Scored {result['students']} student(s) for the week ending {result['day']} "
+              f"in {time.perf_counter() - started:.2f}s; {result['flagged']} flagged for review.")
+
+if __name__ == "__main__":
+    main()
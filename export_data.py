@@ -0,0 +1,71 @@
+"""
+Script to export the transaction ledger, its line items, paid orders or balances to
+CSV or XLSX
+Rows are streamed from the database in batches (from the read replica when
+REPLICA_DATABASE_URL is set), so a full year exports in constant memory.
+Filters match the /transactions page:
+
+    python export_data.py ledger ledger_2026.xlsx --start 2026-01-01 --end 2026-12-31
+    python export_data.py orders orders.csv --student "Ali"
+    python export_data.py ledger topups.csv --type Top-up --direction in
+    python export_data.py lines payment_lines.csv --type Payment --start 2026-10-01
+    python export_data.py balances balances.xlsx
+"""
+import argparse
+import os
+import sys
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app
+from db_routing import use_replica
+from exports import EXPORT_DATASETS, EXPORT_FORMATS, iter_export
+from ledger import parse_ledger_filters
+
+def parse_args():
+    """Command line: dataset, output file and the ledger filters"""
+    parser = argparse.ArgumentParser(description="Export ledger, paid orders or balances")
+    parser.add_argument('dataset', choices=EXPORT_DATASETS)
+    parser.add_argument('output', help="Output file; the format comes from its .csv/.xlsx extension")
+    parser.add_argument('--type', help="Transaction type, e.g. Top-up or Payment (ledger only)")
+    parser.add_argument('--student', help="Student name or IC contains this text")
+    parser.add_argument('--start', help="First day, YYYY-MM-DD")
+    parser.add_argument('--end', help="Last day, YYYY-MM-DD")
+    parser.add_argument('--direction', choices=('in', 'out'), help="Money in or out (ledger only)")
+    return parser.parse_args()
+
+def main():
+    """Stream the export into the output file"""
+    args = parse_args()
+    fmt = os.path.splitext(args.output)[1].lstrip('.').lower()
+    if fmt not in EXPORT_FORMATS:
+        print(f"❌ Output must end in {' or '.join('.' + f for f in EXPORT_FORMATS)}")
+        sys.exit(1)
+    try:
+        filters = parse_ledger_filters(vars(args))
+    except ValueError:
+        print("❌ Invalid date, expected YYYY-MM-DD")
+        sys.exit(1)
+
+    print("=" * 60)
+    print(f"📤 Exporting {args.dataset} to {args.output}")
+    print("=" * 60)
+
+    with app.app_context():
+        use_replica(app.logger)
+        try:
+            with open(args.output, 'wb') as out:
+                for chunk in iter_export(args.dataset, fmt, filters):
+                    out.write(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+            print(f"✅ Export complete ({os.path.getsize(args.output) / 1024:.1f} KiB).")
+        except Exception as e:
+            print(f"❌ Export failed: {str(e)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
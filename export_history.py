@@ -0,0 +1,56 @@
+"""
+Script to append settled order and ledger history to the columnar history cache
+Run nightly; each run exports only the days since the previous one (up to
+HISTORY_SETTLE_DAYS ago) into per-month NumPy column files under
+HISTORY_CACHE_DIR. An interrupted run resumes from the last finished month.
+Use --rebuild after deleting or editing settled orders by hand:
+
+    python export_history.py
+    python export_history.py --dataset ledger
+    python export_history.py --rebuild
+"""
+import argparse
+import os
+import sys
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app
+from db_routing import use_replica
+from history_cache import HISTORY_CACHE_DIR, HISTORY_DATASETS, cached_until, export_history
+
+def parse_args():
+    """Command line: which dataset to export and whether to start over"""
+    parser = argparse.ArgumentParser(description="Append settled history to the columnar history cache")
+    parser.add_argument('--dataset', choices=HISTORY_DATASETS, help="Only this dataset (default: all)")
+    parser.add_argument('--rebuild', action='store_true', help="Discard the cache and export everything again")
+    return parser.parse_args()
+
+def main():
+    """Export each dataset in turn"""
+    args = parse_args()
+    datasets = [args.dataset] if args.dataset else HISTORY_DATASETS
+
+    print("=" * 60)
+    print(f"🗄️ Exporting history to {HISTORY_CACHE_DIR}")
+    print("=" * 60)
+
+    with app.app_context():
+        use_replica(app.logger)
+        for dataset in datasets:
+            try:
+                rows = export_history(dataset, rebuild=args.rebuild)
+            except Exception as e:
+                print(f"❌ {dataset} export failed: {str(e)}")
+                print("Months exported before the failure are kept; re-run to resume.")
+                sys.exit(1)
+            until = cached_until(dataset)
+            print(f"✅ {dataset}: appended {rows} row(s); cached up to {until or 'nothing yet'}.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Streaming CSV and XLSX exports of the transaction ledger and its line items, paid
+orders and balances.
+
+Rows are read with yield_per, which uses a server-side cursor on PostgreSQL, and
+written out in batches as the response body (or CLI output file) is consumed,
+so memory use does not depend on how many rows are exported. XLSX files are
+written with the standard library: the worksheet XML is streamed into a zip
+archive whose output is drained after every batch, so no spreadsheet library or
+temporary file is needed.
+"""
+import csv
+import io
+import re
+import zipfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from sqlalchemy import func
+
+from ledger import filter_ledger, students_matching
+from models import db, MenuItem, Order, StudentInfo
+from transactions import Transaction, TransactionLine
+
+EXPORT_BATCH_ROWS = 1000
+EXPORT_DATASETS = ('ledger', 'lines', 'orders', 'balances')
+EXPORT_FORMATS = ('csv', 'xlsx')
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def _day_bounds(filters):
+    start = datetime.combine(filters['start'], datetime.min.time()) if filters['start'] else None
+    end = datetime.combine(filters['end'] + timedelta(days=1), datetime.min.time()) if filters['end'] else None
+    return start, end
+
+
+def ledger_export(filters):
+    """(header, rows) of the filtered ledger, oldest first"""
+    query = filter_ledger(
+        db.session.query(
+            Transaction.id, Transaction.transaction_time, Transaction.type,
+            StudentInfo.name, StudentInfo.ic_number, Transaction.amount, Transaction.description,
+        ).outerjoin(StudentInfo, Transaction.student_id == StudentInfo.id),
+        filters,
+    ).order_by(Transaction.transaction_time, Transaction.id)
+    header = ['Transaction ID', 'Time', 'Type', 'Student', 'IC Number', 'Amount (RM)', 'Description']
+    return header, query.yield_per(EXPORT_BATCH_ROWS)
+
+
+def lines_export(filters):
+    """(header, rows) of the line items of the filtered ledger, oldest first"""
+    query = filter_ledger(
+        db.session.query(
+            Transaction.id, Transaction.transaction_time, Transaction.type, StudentInfo.name, StudentInfo.ic_number,
+            TransactionLine.kind, TransactionLine.order_id, MenuItem.name,
+            TransactionLine.quantity, TransactionLine.unit_price, TransactionLine.amount,
+        ).join(TransactionLine, TransactionLine.transaction_id == Transaction.id)
+            .outerjoin(StudentInfo, Transaction.student_id == StudentInfo.id)
+            .outerjoin(MenuItem, TransactionLine.menu_item_id == MenuItem.id),
+        filters,
+    ).order_by(Transaction.transaction_time, Transaction.id, TransactionLine.id)
+    header = ['Transaction ID', 'Time', 'Type', 'Student', 'IC Number', 'Line', 'Order ID', 'Item',
+              'Quantity', 'Unit Price (RM)', 'Amount (RM)']
+    return header, query.yield_per(EXPORT_BATCH_ROWS)
+
+
+def orders_export(filters):
+    """(header, rows) of paid orders, filtered by student and paid date, oldest first"""
+    sale_time = func.coalesce(Order.paid_at, Order.order_time)
+    query = db.session.query(
+        Order.id, sale_time, StudentInfo.name, StudentInfo.ic_number, MenuItem.name,
+        Order.quantity, Order.total_price, Order.status,
+    ).join(StudentInfo, Order.student_id == StudentInfo.id) \
+        .outerjoin(MenuItem, Order.menu_item_id == MenuItem.id) \
+        .filter(Order.payment_status == 'paid')
+    if filters['student']:
+        query = query.filter(Order.student_id.in_(students_matching(filters['student'])))
+    start, end = _day_bounds(filters)
+    if start:
+        query = query.filter(sale_time >= start)
+    if end:
+        query = query.filter(sale_time < end)
+    header = ['Order ID', 'Paid At', 'Student', 'IC Number', 'Item', 'Quantity', 'Total (RM)', 'Status']
+    return header, query.order_by(sale_time, Order.id).yield_per(EXPORT_BATCH_ROWS)
+
+
+def balances_export(filters):
+    """(header, rows) of every account's current balance, filtered by student"""
+    query = db.session.query(
+        StudentInfo.id, StudentInfo.name, StudentInfo.ic_number, StudentInfo.role, StudentInfo.balance,
+    )
+    if filters['student']:
+        query = query.filter(StudentInfo.id.in_(students_matching(filters['student'])))
+    header = ['Student ID', 'Name', 'IC Number', 'Role', 'Balance (RM)']
+    return header, query.order_by(StudentInfo.name, StudentInfo.id).yield_per(EXPORT_BATCH_ROWS)
+
+
+EXPORTERS = {
+    'ledger': ledger_export,
+    'lines': lines_export,
+    'orders': orders_export,
+    'balances': balances_export,
+}
+
+
+def _text(value):
+    """Cell text; values a spreadsheet would run as a formula get a leading quote"""
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.isoformat()
+    text = str(value)
+    return "'" + text if text[:1] in ('=', '+', '-', '@') else text
+
+
+def _batches(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= EXPORT_BATCH_ROWS:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_csv(header, rows):
+    """CSV text chunks (UTF-8 BOM first, so Excel reads names correctly), one per batch"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    yield '\ufeff' + buffer.getvalue()
+    for batch in _batches(rows):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(
+            [value if isinstance(value, (int, float, Decimal)) or value is None else _text(value) for value in row]
+            for row in batch
+        )
+        yield buffer.getvalue()
+
+
+# Characters XML 1.0 does not allow, even escaped
+_XML_ILLEGAL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_cell(value):
+    if value is None:
+        return '<c/>'
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        return f'<c><v>{value}</v></c>'
+    text = escape(_XML_ILLEGAL.sub('', _text(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(row):
+    return '<row>' + ''.join(_xlsx_cell(value) for value in row) + '</row>'
+
+
+class _Drain(io.RawIOBase):
+    """Write-only, unseekable sink whose contents are collected and emptied on demand"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_xlsx(header, rows, sheet_name='Export'):
+    """XLSX file bytes, one chunk per batch of rows"""
+    sink = _Drain()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_PARTS.items():
+            archive.writestr(name, content)
+        archive.writestr('xl/workbook.xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{escape(sheet_name[:31])}" sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>'
+        ))
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                + _xlsx_row(header)
+            ).encode('utf-8'))
+            for batch in _batches(rows):
+                sheet.write(''.join(_xlsx_row(row) for row in batch).encode('utf-8'))
+                yield sink.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield sink.drain()
+
+
+def iter_export(dataset, fmt, filters):
+    """Chunks (str for CSV, bytes for XLSX) of one dataset export"""
+    header, rows = EXPORTERS[dataset](filters)
+    if fmt == 'xlsx':
+        return iter_xlsx(header, rows, sheet_name=dataset.title())
+    return iter_csv(header, rows)
+
+
+def export_filename(dataset, fmt, now):
+    return f"{dataset}_{now.strftime('%Y%m%d_%H%M')}.{fmt}"
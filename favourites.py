@@ -0,0 +1,152 @@
+"""
+"Order again" favourites per student.
+
+Each paid order adds 2 ** (days since FAVOURITE_EPOCH / FAVOURITE_HALF_LIFE_DAYS)
+to the student's score for that item. Scaling every order to a fixed epoch
+instead of to "now" keeps the update a plain increment at checkout (and a
+decrement when a paid order is deleted), while ranking a student's scores still
+gives exactly the recency-weighted frequency with that half-life: an order a
+month ago counts half as much as one today. rebuild_favourites() recomputes
+every score from order history (the columnar history cache, less orders deleted
+since, plus the days not exported to it yet).
+"""
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import delete, func, insert, select
+
+from db_utils import increment_counters
+from history_cache import cached_until, iter_partitions
+from models import db, Order, StudentFavourite
+
+FAVOURITE_HALF_LIFE_DAYS = 30
+FAVOURITE_EPOCH = datetime(2026, 1, 1)
+FAVOURITE_LIMIT = 6
+# Subtracting an order's weight back out leaves float rounding behind; a score at
+# or below this fraction of the weight just removed counts as gone
+FAVOURITE_RESIDUE = 1e-9
+
+
+def _paid_time(order):
+    return (order.paid_at or order.order_time).replace(tzinfo=None)
+
+
+def _weights(days):
+    return np.exp2(np.asarray(days, dtype=np.float64) / FAVOURITE_HALF_LIFE_DAYS)
+
+
+def record_favourites(orders, sign=1):
+    """Add paid orders to their students' favourites, or subtract them with sign=-1"""
+    lines = [
+        (order.student_id, order.menu_item_id, (_paid_time(order) - FAVOURITE_EPOCH).total_seconds() / 86400)
+        for order in orders
+        if order.student_id and order.menu_item_id and (order.paid_at or order.order_time) is not None
+    ]
+    if not lines:
+        return
+    scores = {}
+    for (student_id, item_id, _), weight in zip(lines, _weights([line[2] for line in lines])):
+        scores[(student_id, item_id)] = scores.get((student_id, item_id), 0.0) + sign * float(weight)
+    increment_counters(
+        StudentFavourite,
+        ('student_id', 'menu_item_id'),
+        [{'student_id': s, 'menu_item_id': i, 'score': score} for (s, i), score in scores.items()],
+        ('score',),
+    )
+    if sign < 0:
+        # Drop the rows whose last orders were just subtracted (in key order, like the upsert)
+        for (student_id, item_id), score in sorted(scores.items()):
+            db.session.execute(delete(StudentFavourite).where(
+                StudentFavourite.student_id == student_id,
+                StudentFavourite.menu_item_id == item_id,
+                StudentFavourite.score <= -score * FAVOURITE_RESIDUE,
+            ))
+
+
+def _still_paid(order_ids):
+    """Mask of order_ids that are still paid orders (not deleted or refunded since)"""
+    if not len(order_ids):
+        return np.zeros(0, dtype=bool)
+    paid = np.fromiter(
+        db.session.execute(
+            select(Order.id).where(
+                Order.payment_status == 'paid',
+                Order.id.between(int(order_ids.min()), int(order_ids.max())),
+            )
+        ).scalars(),
+        dtype=np.int64,
+    )
+    return np.isin(order_ids, paid)
+
+
+def _paid_order_history():
+    """(student ids, item ids, days since FAVOURITE_EPOCH) of every paid order.
+
+    Days already exported to the history cache are read from its memory-mapped
+    columns, dropping orders deleted or refunded since the export; only the days
+    after it come from the database.
+    """
+    students, items, days = [], [], []
+    since = cached_until('orders')
+    if since:
+        columns = ('order_id', 'time', 'student_id', 'menu_item_id')
+        for _, cached in iter_partitions('orders', columns):
+            known = (cached['student_id'] >= 0) & (cached['menu_item_id'] >= 0) & _still_paid(cached['order_id'])
+            students.append(cached['student_id'][known].astype(np.int64))
+            items.append(cached['menu_item_id'][known].astype(np.int64))
+            days.append((cached['time'][known] - np.datetime64(FAVOURITE_EPOCH, 's')).astype(np.float64) / 86400)
+
+    paid_at = func.coalesce(Order.paid_at, Order.order_time)
+    rows = db.session.query(Order.student_id, Order.menu_item_id, paid_at).filter(
+        Order.payment_status == 'paid',
+        Order.student_id.isnot(None),
+        Order.menu_item_id.isnot(None),
+        paid_at.isnot(None),
+    )
+    if since:
+        rows = rows.filter(paid_at >= datetime.combine(since, datetime.min.time()))
+    recent = rows.all()
+    if recent:
+        student_ids, item_ids, times = zip(*recent)
+        students.append(np.array(student_ids, dtype=np.int64))
+        items.append(np.array(item_ids, dtype=np.int64))
+        days.append(np.array([(t.replace(tzinfo=None) - FAVOURITE_EPOCH).total_seconds() / 86400 for t in times]))
+    if not students:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+    return np.concatenate(students), np.concatenate(items), np.concatenate(days)
+
+
+def rebuild_favourites():
+    """Recompute every student's favourites from paid orders; returns the number of rows written"""
+    students, items, days = _paid_order_history()
+
+    db.session.execute(delete(StudentFavourite))
+    if not len(students):
+        return 0
+    # Sum the weights per (student, item) with one sort of a packed key
+    span = int(items.max()) + 1
+    keys = students * span + items
+    order = np.argsort(keys, kind='stable')
+    keys, weights = keys[order], _weights(days)[order]
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    totals = np.add.reduceat(weights, starts)
+    student_of, item_of = np.divmod(keys[starts], span)
+
+    db.session.execute(insert(StudentFavourite), [
+        {'student_id': int(s), 'menu_item_id': int(i), 'score': float(score)}
+        for s, i, score in zip(student_of, item_of, totals)
+    ])
+    return len(starts)
+
+
+def favourite_item_ids(student_id):
+    """Every item the student has ordered, best first (one primary-key range read).
+
+    A student has at most one row per menu item, so this is never more than the
+    menu; callers drop items that are no longer available before taking the top.
+    """
+    return [
+        item_id for (item_id,) in db.session.query(StudentFavourite.menu_item_id)
+        .filter(StudentFavourite.student_id == student_id, StudentFavourite.score > 0)
+        .order_by(StudentFavourite.score.desc())
+    ]
@@ -0,0 +1,252 @@
+"""
+Columnar order and ledger history cache for offline analytics.
+
+export_history() copies settled history out of the database into one NumPy
+.npy file per column, partitioned by MYT month:
+
+    <HISTORY_CACHE_DIR>/orders/2026-10/{time,order_id,student_id,menu_item_id,quantity,amount_sen}.npy
+    <HISTORY_CACHE_DIR>/ledger/2026-10/{time,transaction_id,student_id,type,amount_sen}.npy
+
+Times are datetime64[s] MYT wall time, money is integer sen, and missing ids
+are -1. Ledger types are small integer codes into the dataset's "types" list.
+Each dataset's state.json records the first day not exported yet and the row
+count of every partition. Each night the job exports only the days since then,
+so only the open month's partitions are rewritten. Files are written to a
+temporary name and renamed into place, and readers only trust the row counts
+in state.json, so an interrupted export is resumed by the next run.
+
+A day is exported once it is HISTORY_SETTLE_DAYS old, after late refunds and
+corrections have landed. Orders deleted after that point stay in the cache
+until it is rebuilt (export_history(dataset, rebuild=True)), so readers that
+must match the live data check order_id against the database. Readers combine
+the cache with a database query for the days after cached_until().
+
+load_partition() and iter_partitions() return memory-mapped arrays
+(mmap_mode='r'): nothing is read from disk until a scan touches it, and
+processes reading the same month share the page cache.
+"""
+import json
+import os
+import shutil
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from sqlalchemy import BigInteger, cast, func
+
+from models import db, Order
+from transactions import Transaction
+from tz_utils import now_myt
+
+HISTORY_CACHE_DIR = os.environ.get('HISTORY_CACHE_DIR') or \
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'history_cache')
+HISTORY_SETTLE_DAYS = 2
+EXPORT_BATCH_ROWS = 50000
+
+COLUMNS = {
+    'orders': {
+        'time': 'datetime64[s]', 'order_id': np.int64, 'student_id': np.int32,
+        'menu_item_id': np.int32, 'quantity': np.int32, 'amount_sen': np.int64,
+    },
+    'ledger': {
+        'time': 'datetime64[s]', 'transaction_id': np.int64, 'student_id': np.int32,
+        'type': np.int16, 'amount_sen': np.int64,
+    },
+}
+HISTORY_DATASETS = tuple(COLUMNS)
+
+
+def _dataset_dir(dataset):
+    if dataset not in COLUMNS:
+        raise ValueError(f"dataset must be one of: {', '.join(HISTORY_DATASETS)}")
+    return os.path.join(HISTORY_CACHE_DIR, dataset)
+
+
+def _month(day):
+    return day.strftime('%Y-%m')
+
+
+def _next_month(day):
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def read_state(dataset):
+    """The dataset's state.json ({'exported_until', 'partitions', 'types'}), empty if never exported"""
+    try:
+        with open(os.path.join(_dataset_dir(dataset), 'state.json')) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'exported_until': None, 'partitions': {}, 'types': []}
+
+
+def _write_state(dataset, state):
+    path = os.path.join(_dataset_dir(dataset), 'state.json')
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def cached_until(dataset):
+    """First day not in the cache (rows before it are cached), or None if nothing is"""
+    value = read_state(dataset)['exported_until']
+    return date.fromisoformat(value) if value else None
+
+
+def _source(dataset, start, end):
+    """Query of a dataset's rows with time in [start, end), in export column order"""
+    if dataset == 'orders':
+        when = func.coalesce(Order.paid_at, Order.order_time)
+        return db.session.query(
+            when, Order.id, Order.student_id, Order.menu_item_id, Order.quantity,
+            cast(func.round(Order.total_price * 100), BigInteger),
+        ).filter(
+            Order.payment_status == 'paid', when >= start, when < end,
+        ).order_by(when, Order.id)
+    return db.session.query(
+        Transaction.transaction_time, Transaction.id, Transaction.student_id, Transaction.type,
+        cast(func.round(Transaction.amount * 100), BigInteger),
+    ).filter(
+        Transaction.transaction_time >= start, Transaction.transaction_time < end,
+    ).order_by(Transaction.transaction_time, Transaction.id)
+
+
+def _first_time(dataset):
+    if dataset == 'orders':
+        return db.session.query(func.min(func.coalesce(Order.paid_at, Order.order_time))) \
+            .filter(Order.payment_status == 'paid').scalar()
+    return db.session.query(func.min(Transaction.transaction_time)).scalar()
+
+
+def _batched(query):
+    batch = []
+    for row in query.yield_per(EXPORT_BATCH_ROWS):
+        batch.append(row)
+        if len(batch) >= EXPORT_BATCH_ROWS:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _to_columns(dataset, rows, types):
+    """{column: array} for one batch of _source() rows; new ledger types are appended to types"""
+    names = list(COLUMNS[dataset])
+    values = list(zip(*rows))
+    columns = {
+        'time': np.array([t.replace(tzinfo=None) for t in values[0]], dtype='datetime64[s]'),
+    }
+    for name, column in zip(names[1:], values[1:]):
+        if name == 'type':
+            for value in sorted(set(column) - set(types)):
+                types.append(value)
+            code = {value: i for i, value in enumerate(types)}
+            column = [code[value] for value in column]
+        columns[name] = np.array([-1 if v is None else v for v in column], dtype=COLUMNS[dataset][name])
+    return columns
+
+
+def _append_partition(dataset, month, batch, rows):
+    """Append batch to a month's column files that currently hold rows trusted rows"""
+    folder = os.path.join(_dataset_dir(dataset), month)
+    os.makedirs(folder, exist_ok=True)
+    for name, values in batch.items():
+        path = os.path.join(folder, f'{name}.npy')
+        if rows:
+            values = np.concatenate([np.load(path, mmap_mode='r')[:rows], values])
+        with open(path + '.tmp', 'wb') as f:
+            np.save(f, values)
+        os.replace(path + '.tmp', path)
+
+
+def export_history(dataset, until=None, rebuild=False):
+    """Export the dataset's days from the last export up to (excluding) until.
+
+    until defaults to HISTORY_SETTLE_DAYS before today; rebuild=True discards the cache
+    and exports everything again. Returns the number of rows appended.
+    """
+    folder = _dataset_dir(dataset)
+    if rebuild:
+        shutil.rmtree(folder, ignore_errors=True)
+    os.makedirs(folder, exist_ok=True)
+    state = read_state(dataset)
+    until = until or now_myt().date() - timedelta(days=HISTORY_SETTLE_DAYS)
+
+    if state['exported_until']:
+        start = date.fromisoformat(state['exported_until'])
+    else:
+        first = _first_time(dataset)
+        if first is None:
+            return 0
+        start = first.date()
+
+    appended = 0
+    month_start = start
+    while month_start < until:
+        month_end = min(_next_month(month_start), until)
+        month = _month(month_start)
+        # One month at a time, so memory stays bounded and progress is saved as we go
+        batches = []
+        for rows in _batched(_source(dataset, datetime.combine(month_start, datetime.min.time()),
+                                     datetime.combine(month_end, datetime.min.time()))):
+            batches.append(_to_columns(dataset, rows, state['types']))
+        if batches:
+            batch = {name: np.concatenate([b[name] for b in batches]) for name in COLUMNS[dataset]}
+            _append_partition(dataset, month, batch, state['partitions'].get(month, 0))
+            state['partitions'][month] = state['partitions'].get(month, 0) + len(batch['time'])
+            appended += len(batch['time'])
+        state['exported_until'] = month_end.isoformat()
+        _write_state(dataset, state)
+        month_start = month_end
+    return appended
+
+
+def load_partition(dataset, month, columns=None, state=None):
+    """{column: read-only memory-mapped array} for one month ('YYYY-MM') of the cache"""
+    state = state or read_state(dataset)
+    rows = state['partitions'].get(month, 0)
+    folder = os.path.join(_dataset_dir(dataset), month)
+    return {
+        name: np.load(os.path.join(folder, f'{name}.npy'), mmap_mode='r')[:rows]
+        for name in (columns or COLUMNS[dataset])
+    }
+
+
+def iter_partitions(dataset, columns=None, start=None, end=None):
+    """(month, {column: memory-mapped array}) for the cached months overlapping [start, end), oldest first"""
+    state = read_state(dataset)
+    first = _month(start) if start else None
+    last = _month(end - timedelta(days=1)) if end else None
+    for month in sorted(state['partitions']):
+        if (first and month < first) or (last and month > last):
+            continue
+        yield month, load_partition(dataset, month, columns, state)
+
+
+def load_history(dataset, columns=None, start=None, end=None):
+    """{column: array} of cached rows with time in [start, end) (dates; open-ended if None)
+
+    A single month read without a date filter stays memory-mapped; otherwise the
+    selected rows are copied into one array per column.
+    """
+    columns = list(columns or COLUMNS[dataset])
+    wanted = columns if 'time' in columns or not (start or end) else columns + ['time']
+    parts = []
+    for _, part in iter_partitions(dataset, wanted, start, end):
+        if start or end:
+            keep = np.ones(len(part['time']), dtype=bool)
+            if start:
+                keep &= part['time'] >= np.datetime64(start, 's')
+            if end:
+                keep &= part['time'] < np.datetime64(end, 's')
+            part = {name: values[keep] for name, values in part.items()}
+        parts.append(part)
+    if len(parts) == 1:
+        return {name: parts[0][name] for name in columns}
+    return {
+        name: np.concatenate([part[name] for part in parts]) if parts else np.zeros(0, dtype=COLUMNS[dataset][name])
+        for name in columns
+    }
+
+
+def ledger_types():
+    """Ledger type names by code"""
+    return read_state('ledger')['types']
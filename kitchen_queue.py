@@ -0,0 +1,127 @@
+"""
+Kitchen read model.
+
+kitchen_queue holds one row per paid order with every column the kitchen
+boards display (student name and IC, item name and image, pickup number,
+stall), so board reads are single-table index scans with no joins. The
+checkout, start, completion and refund write paths update it inside their own
+transactions; rebuild_kitchen_queue() recreates it from the order tables.
+"""
+from sqlalchemy import delete, func, insert, select, update
+
+from models import db, Order, StudentInfo, MenuItem, PickupTicket, KitchenQueueEntry
+
+
+def project_paid_orders(student, orders):
+    """Add freshly paid orders of one checkout to the kitchen queue"""
+    db.session.flush()  # Assign order ids
+    rows = []
+    for order in orders:
+        item = order.item
+        if item is None:
+            continue
+        ticket = order.ticket
+        rows.append({
+            'order_id': order.id,
+            'student_id': student.id,
+            'student_name': student.name,
+            'ic_number': student.ic_number,
+            'menu_item_id': item.id,
+            'item_name': item.name,
+            'image_path': item.image_path,
+            'quantity': order.quantity,
+            'total_price': order.total_price,
+            'status': order.status or 'pending',
+            'order_time': order.order_time,
+            'started_at': order.started_at,
+            'ticket_id': ticket.id if ticket else None,
+            'pickup_date': ticket.pickup_date if ticket else None,
+            'pickup_number': ticket.pickup_number if ticket else None,
+            'stall_id': order.stall_id,
+        })
+    if rows:
+        db.session.execute(insert(KitchenQueueEntry), rows)
+
+
+def _update_orders(order_ids, **values):
+    order_ids = [oid for oid in order_ids if oid]
+    if order_ids:
+        db.session.execute(
+            update(KitchenQueueEntry)
+            .where(KitchenQueueEntry.order_id.in_(order_ids))
+            .values(**values)
+        )
+
+
+def mark_started(order_ids, started_at):
+    """Record that the kitchen started these orders"""
+    _update_orders(order_ids, started_at=started_at)
+
+
+def mark_completed(order_ids):
+    """Record that these orders were handed over"""
+    _update_orders(order_ids, status='completed')
+
+
+def remove_orders(order_ids):
+    """Drop deleted/refunded orders from the kitchen queue"""
+    order_ids = [oid for oid in order_ids if oid]
+    if order_ids:
+        db.session.execute(
+            delete(KitchenQueueEntry).where(KitchenQueueEntry.order_id.in_(order_ids))
+        )
+
+
+def refresh_menu_item(item):
+    """Copy a renamed or re-imaged menu item into its queued orders"""
+    db.session.execute(
+        update(KitchenQueueEntry)
+        .where(KitchenQueueEntry.menu_item_id == item.id)
+        .values(item_name=item.name, image_path=item.image_path)
+    )
+
+
+def refresh_student(student):
+    """Copy changed student details into their queued orders"""
+    db.session.execute(
+        update(KitchenQueueEntry)
+        .where(KitchenQueueEntry.student_id == student.id)
+        .values(student_name=student.name, ic_number=student.ic_number)
+    )
+
+
+def rebuild_kitchen_queue():
+    """Recreate the whole kitchen queue from paid orders; returns the number of rows"""
+    source = (
+        select(
+            Order.id,
+            Order.student_id,
+            StudentInfo.name,
+            StudentInfo.ic_number,
+            Order.menu_item_id,
+            MenuItem.name,
+            MenuItem.image_path,
+            Order.quantity,
+            Order.total_price,
+            func.coalesce(Order.status, 'pending'),
+            Order.order_time,
+            Order.started_at,
+            Order.ticket_id,
+            PickupTicket.pickup_date,
+            PickupTicket.pickup_number,
+            Order.stall_id,
+        )
+        .select_from(Order)
+        .join(StudentInfo, StudentInfo.id == Order.student_id)
+        .join(MenuItem, MenuItem.id == Order.menu_item_id)
+        .outerjoin(PickupTicket, PickupTicket.id == Order.ticket_id)
+        .where(Order.payment_status == 'paid')
+    )
+    columns = [
+        'order_id', 'student_id', 'student_name', 'ic_number', 'menu_item_id', 'item_name',
+        'image_path', 'quantity', 'total_price', 'status', 'order_time', 'started_at',
+        'ticket_id', 'pickup_date', 'pickup_number', 'stall_id',
+    ]
+    db.session.execute(delete(KitchenQueueEntry))
+    db.session.execute(insert(KitchenQueueEntry).from_select(columns, source))
+    return db.session.query(KitchenQueueEntry).count()
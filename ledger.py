@@ -0,0 +1,140 @@
+"""
+Transaction ledger queries for the staff/admin /transactions page.
+
+Pages are read newest first with keyset pagination on (transaction_time, id):
+the cursor is the last row shown, so every page is an index range scan no
+matter how deep into the ledger it is. Totals for the whole filtered set come
+from one aggregate with SUM(...) FILTER (WHERE ...). Student filters resolve
+to a student_id subquery so neither query has to join student_info. Item-level
+figures aggregate the transaction_line rows of the filtered transactions.
+"""
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import func, or_, tuple_
+
+from models import db, MenuItem, StudentInfo
+from transactions import Transaction, TransactionLine
+
+LEDGER_PAGE_SIZE = 50
+LEDGER_DIRECTIONS = ('in', 'out')
+
+
+def parse_ledger_filters(args):
+    """Filter dict from request args: type, student (name or IC), start/end (YYYY-MM-DD), direction"""
+    filters = {
+        'type': (args.get('type') or '').strip(),
+        'student': (args.get('student') or '').strip(),
+        'start': None,
+        'end': None,
+        'direction': (args.get('direction') or '').strip(),
+    }
+    for key in ('start', 'end'):
+        value = (args.get(key) or '').strip()
+        if value:
+            filters[key] = date.fromisoformat(value)  # ValueError on bad input
+    if filters['direction'] not in LEDGER_DIRECTIONS:
+        filters['direction'] = ''
+    return filters
+
+
+def students_matching(term):
+    """Subquery of student ids whose name or IC contains term"""
+    pattern = f"%{term}%"
+    return db.session.query(StudentInfo.id).filter(or_(
+        StudentInfo.name.ilike(pattern),
+        StudentInfo.ic_number.ilike(pattern),
+    ))
+
+
+def filter_ledger(query, filters):
+    """Apply parse_ledger_filters() output to a query over Transaction"""
+    if filters['type']:
+        query = query.filter(Transaction.type == filters['type'])
+    if filters['student']:
+        query = query.filter(Transaction.student_id.in_(students_matching(filters['student'])))
+    if filters['start']:
+        query = query.filter(Transaction.transaction_time >= datetime.combine(filters['start'], datetime.min.time()))
+    if filters['end']:
+        query = query.filter(Transaction.transaction_time < datetime.combine(filters['end'] + timedelta(days=1), datetime.min.time()))
+    if filters['direction'] == 'in':
+        query = query.filter(Transaction.amount > 0)
+    elif filters['direction'] == 'out':
+        query = query.filter(Transaction.amount < 0)
+    return query
+
+
+def encode_cursor(txn):
+    return f"{txn.transaction_time.isoformat()}_{txn.id}"
+
+
+def decode_cursor(cursor):
+    """(transaction_time, id) of a cursor, or None for the first page"""
+    if not cursor:
+        return None
+    time_part, _, id_part = cursor.rpartition('_')
+    return datetime.fromisoformat(time_part), int(id_part)  # ValueError on bad input
+
+
+def ledger_page(filters, cursor=None, limit=LEDGER_PAGE_SIZE):
+    """(rows, next_cursor): up to limit (Transaction, StudentInfo|None) rows older than cursor"""
+    query = filter_ledger(db.session.query(Transaction), filters)
+    after = decode_cursor(cursor)
+    if after:
+        query = query.filter(tuple_(Transaction.transaction_time, Transaction.id) < after)
+    txns = query.order_by(
+        Transaction.transaction_time.desc(), Transaction.id.desc()
+    ).limit(limit + 1).all()
+
+    next_cursor = encode_cursor(txns[limit - 1]) if len(txns) > limit else None
+    txns = txns[:limit]
+    student_ids = {t.student_id for t in txns if t.student_id}
+    students = {
+        s.id: s for s in StudentInfo.query.filter(StudentInfo.id.in_(student_ids))
+    } if student_ids else {}
+    return [(t, students.get(t.student_id)) for t in txns], next_cursor
+
+
+def ledger_totals(filters):
+    """{'total_in', 'total_out', 'count'} over the whole filtered ledger in one aggregate"""
+    total_in, total_out, count = filter_ledger(db.session.query(
+        func.coalesce(func.sum(Transaction.amount).filter(Transaction.amount > 0), 0),
+        func.coalesce(func.sum(-Transaction.amount).filter(Transaction.amount < 0), 0),
+        func.count(Transaction.id),
+    ), filters).one()
+    return {'total_in': total_in, 'total_out': total_out, 'count': count}
+
+
+def ledger_types():
+    """Distinct transaction types for the filter menu (served by the type index)"""
+    return [t for (t,) in db.session.query(Transaction.type).distinct().order_by(Transaction.type)]
+
+
+def item_totals(filters):
+    """Quantity and amount paid and refunded per menu item over the filtered ledger, best sellers first"""
+    paid = TransactionLine.kind == 'item'
+    refunded = TransactionLine.kind == 'refund'
+    rows = filter_ledger(db.session.query(
+        TransactionLine.menu_item_id,
+        func.coalesce(func.sum(TransactionLine.quantity).filter(paid), 0),
+        func.coalesce(func.sum(-TransactionLine.amount).filter(paid), 0),
+        func.coalesce(func.sum(TransactionLine.quantity).filter(refunded), 0),
+        func.coalesce(func.sum(TransactionLine.amount).filter(refunded), 0),
+    ).join(Transaction, Transaction.id == TransactionLine.transaction_id)
+        .filter(TransactionLine.menu_item_id.isnot(None)), filters) \
+        .group_by(TransactionLine.menu_item_id).all()
+    names = dict(
+        db.session.query(MenuItem.id, MenuItem.name).filter(MenuItem.id.in_([row[0] for row in rows]))
+    ) if rows else {}
+    totals = [
+        {
+            'menu_item_id': item_id,
+            'name': names.get(item_id, 'Removed item'),
+            'quantity': int(quantity),
+            'amount': amount,
+            'refunded_quantity': int(refunded_quantity),
+            'refunded_amount': refunded_amount,
+            'net_amount': amount - refunded_amount,
+        }
+        for item_id, quantity, amount, refunded_quantity, refunded_amount in rows
+    ]
+    return sorted(totals, key=lambda row: (-row['net_amount'], row['name']))
@@ -0,0 +1,43 @@
+"""add orders_version change cursor to student_info (idempotent)
+
+Revision ID: 3b7e1c9a4d20
+Revises: fd8bf217d324
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b7e1c9a4d20'
+down_revision = 'fd8bf217d324'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        CREATE SEQUENCE IF NOT EXISTS student_orders_version_seq;
+    """)
+    op.execute("""
+        ALTER TABLE student_info
+        ADD COLUMN IF NOT EXISTS orders_version BIGINT NOT NULL DEFAULT 0;
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_student_info_orders_version
+            ON student_info (orders_version);
+    """)
+
+
+def downgrade():
+    op.execute("""
+        DROP INDEX IF EXISTS ix_student_info_orders_version;
+    """)
+    op.execute("""
+        ALTER TABLE student_info
+        DROP COLUMN IF EXISTS orders_version;
+    """)
+    op.execute("""
+        DROP SEQUENCE IF EXISTS student_orders_version_seq;
+    """)
@@ -0,0 +1,68 @@
+"""add pickup_ticket and kitchen_throughput tables, order.ticket_id (idempotent)
+
+Revision ID: 6c2f8e1d5a47
+Revises: 3b7e1c9a4d20
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6c2f8e1d5a47'
+down_revision = '3b7e1c9a4d20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS pickup_ticket (
+            id SERIAL PRIMARY KEY,
+            student_id INTEGER NOT NULL REFERENCES student_info (id),
+            pickup_date DATE NOT NULL,
+            pickup_number INTEGER NOT NULL,
+            status VARCHAR(20) DEFAULT 'pending',
+            created_at TIMESTAMP WITHOUT TIME ZONE,
+            completed_at TIMESTAMP WITHOUT TIME ZONE,
+            CONSTRAINT uq_pickup_ticket_day_number UNIQUE (pickup_date, pickup_number)
+        );
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_pickup_ticket_student_id ON pickup_ticket (student_id);
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_pickup_ticket_status ON pickup_ticket (status);
+    """)
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS kitchen_throughput (
+            menu_item_id INTEGER PRIMARY KEY REFERENCES menu_item (id),
+            seconds_per_unit DOUBLE PRECISION NOT NULL,
+            samples INTEGER DEFAULT 0,
+            updated_at TIMESTAMP WITHOUT TIME ZONE
+        );
+    """)
+    op.execute("""
+        ALTER TABLE "order"
+        ADD COLUMN IF NOT EXISTS ticket_id INTEGER REFERENCES pickup_ticket (id);
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_order_ticket_id ON "order" (ticket_id);
+    """)
+
+
+def downgrade():
+    op.execute("""
+        DROP INDEX IF EXISTS ix_order_ticket_id;
+    """)
+    op.execute("""
+        ALTER TABLE "order"
+        DROP COLUMN IF EXISTS ticket_id;
+    """)
+    op.execute("""
+        DROP TABLE IF EXISTS kitchen_throughput;
+    """)
+    op.execute("""
+        DROP TABLE IF EXISTS pickup_ticket;
+    """)
@@ -0,0 +1,68 @@
+"""add stall table, menu_item.stall_id and order.stall_id with per-stall queue index (idempotent)
+
+Revision ID: 8a4d2c6b1e93
+Revises: 6c2f8e1d5a47
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a4d2c6b1e93'
+down_revision = '6c2f8e1d5a47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS stall (
+            id SERIAL PRIMARY KEY,
+            name VARCHAR(100) NOT NULL UNIQUE,
+            description TEXT,
+            is_active BOOLEAN DEFAULT TRUE,
+            display_order INTEGER DEFAULT 0,
+            created_at TIMESTAMP WITHOUT TIME ZONE
+        );
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_stall_is_active ON stall (is_active);
+    """)
+    op.execute("""
+        ALTER TABLE menu_item
+        ADD COLUMN IF NOT EXISTS stall_id INTEGER REFERENCES stall (id);
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_menu_item_stall_id ON menu_item (stall_id);
+    """)
+    op.execute("""
+        ALTER TABLE "order"
+        ADD COLUMN IF NOT EXISTS stall_id INTEGER REFERENCES stall (id);
+    """)
+    # Only the live queue is indexed, so the index stays small however much history piles up
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_order_stall_queue ON "order" (stall_id, order_time)
+        WHERE payment_status = 'paid' AND status = 'pending';
+    """)
+
+
+def downgrade():
+    op.execute("""
+        DROP INDEX IF EXISTS ix_order_stall_queue;
+    """)
+    op.execute("""
+        ALTER TABLE "order"
+        DROP COLUMN IF EXISTS stall_id;
+    """)
+    op.execute("""
+        DROP INDEX IF EXISTS ix_menu_item_stall_id;
+    """)
+    op.execute("""
+        ALTER TABLE menu_item
+        DROP COLUMN IF EXISTS stall_id;
+    """)
+    op.execute("""
+        DROP TABLE IF EXISTS stall;
+    """)
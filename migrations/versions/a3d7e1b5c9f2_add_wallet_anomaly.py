@@ -0,0 +1,55 @@
+"""add wallet_anomaly review table (idempotent)
+
+Revision ID: a3d7e1b5c9f2
+Revises: f8c2d6a0e4b9
+Create Date: 2026-10-20 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3d7e1b5c9f2'
+down_revision = 'f8c2d6a0e4b9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS wallet_anomaly (
+            id SERIAL PRIMARY KEY,
+            student_id INTEGER NOT NULL REFERENCES student_info (id),
+            detected_on DATE NOT NULL,
+            score DOUBLE PRECISION NOT NULL,
+            reasons TEXT,
+            spend_per_day DOUBLE PRECISION NOT NULL DEFAULT 0,
+            spend_jump DOUBLE PRECISION NOT NULL DEFAULT 0,
+            refund_ratio DOUBLE PRECISION NOT NULL DEFAULT 0,
+            topups INTEGER NOT NULL DEFAULT 0,
+            largest_topup DOUBLE PRECISION NOT NULL DEFAULT 0,
+            off_hours_share DOUBLE PRECISION NOT NULL DEFAULT 0,
+            status VARCHAR(20) NOT NULL DEFAULT 'open',
+            review_note TEXT,
+            reviewed_by INTEGER REFERENCES student_info (id),
+            reviewed_at TIMESTAMP WITHOUT TIME ZONE,
+            created_at TIMESTAMP WITHOUT TIME ZONE,
+            CONSTRAINT uq_wallet_anomaly_student_day UNIQUE (student_id, detected_on)
+        );
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_wallet_anomaly_student_id ON wallet_anomaly (student_id);
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_wallet_anomaly_detected_on ON wallet_anomaly (detected_on);
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_wallet_anomaly_status ON wallet_anomaly (status);
+    """)
+
+
+def downgrade():
+    op.execute("""
+        DROP TABLE IF EXISTS wallet_anomaly;
+    """)
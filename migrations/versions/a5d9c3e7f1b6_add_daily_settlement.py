@@ -0,0 +1,52 @@
+"""add daily_settlement end-of-day snapshots and payment time indexes (idempotent)
+
+Revision ID: a5d9c3e7f1b6
+Revises: f3c7a1d9b2e4
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a5d9c3e7f1b6'
+down_revision = 'f3c7a1d9b2e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS daily_settlement (
+            settle_date DATE PRIMARY KEY,
+            sales_revenue NUMERIC(12, 2) NOT NULL DEFAULT 0,
+            sales_orders INTEGER NOT NULL DEFAULT 0,
+            sales_quantity BIGINT NOT NULL DEFAULT 0,
+            cash_topups NUMERIC(12, 2) NOT NULL DEFAULT 0,
+            qr_topups NUMERIC(12, 2) NOT NULL DEFAULT 0,
+            refunds NUMERIC(12, 2) NOT NULL DEFAULT 0,
+            outstanding_balance NUMERIC(14, 2) NOT NULL DEFAULT 0,
+            pending_payments INTEGER NOT NULL DEFAULT 0,
+            pending_amount NUMERIC(12, 2) NOT NULL DEFAULT 0,
+            closed_at TIMESTAMP WITHOUT TIME ZONE NOT NULL
+        );
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_payment_created_at ON payment (created_at);
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_payment_completed_at ON payment (completed_at);
+    """)
+
+
+def downgrade():
+    op.execute("""
+        DROP INDEX IF EXISTS ix_payment_completed_at;
+    """)
+    op.execute("""
+        DROP INDEX IF EXISTS ix_payment_created_at;
+    """)
+    op.execute("""
+        DROP TABLE IF EXISTS daily_settlement;
+    """)
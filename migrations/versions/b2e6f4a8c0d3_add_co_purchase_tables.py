@@ -0,0 +1,44 @@
+"""add co_purchase item pair counts and co_purchase_state (idempotent)
+
+Revision ID: b2e6f4a8c0d3
+Revises: a5d9c3e7f1b6
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2e6f4a8c0d3'
+down_revision = 'a5d9c3e7f1b6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS co_purchase (
+            item_a INTEGER NOT NULL,
+            item_b INTEGER NOT NULL,
+            baskets BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (item_a, item_b)
+        );
+    """)
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS co_purchase_state (
+            id INTEGER PRIMARY KEY,
+            last_ticket_id INTEGER NOT NULL DEFAULT 0,
+            baskets BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP WITHOUT TIME ZONE
+        );
+    """)
+
+
+def downgrade():
+    op.execute("""
+        DROP TABLE IF EXISTS co_purchase_state;
+    """)
+    op.execute("""
+        DROP TABLE IF EXISTS co_purchase;
+    """)
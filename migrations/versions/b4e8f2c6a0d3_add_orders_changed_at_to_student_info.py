@@ -0,0 +1,37 @@
+"""add orders_changed_at to student_info for the change-cursor overlap (idempotent)
+
+Revision ID: b4e8f2c6a0d3
+Revises: a3d7e1b5c9f2
+Create Date: 2026-10-21 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4e8f2c6a0d3'
+down_revision = 'a3d7e1b5c9f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        ALTER TABLE student_info
+        ADD COLUMN IF NOT EXISTS orders_changed_at TIMESTAMP WITHOUT TIME ZONE;
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_student_info_orders_changed_at
+            ON student_info (orders_changed_at);
+    """)
+
+
+def downgrade():
+    op.execute("""
+        DROP INDEX IF EXISTS ix_student_info_orders_changed_at;
+    """)
+    op.execute("""
+        ALTER TABLE student_info
+        DROP COLUMN IF EXISTS orders_changed_at;
+    """)
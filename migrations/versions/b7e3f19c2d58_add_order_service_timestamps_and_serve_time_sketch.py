@@ -0,0 +1,53 @@
+"""add order paid_at/started_at/completed_at and serve_time_sketch table (idempotent)
+
+Revision ID: b7e3f19c2d58
+Revises: 8a4d2c6b1e93
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e3f19c2d58'
+down_revision = '8a4d2c6b1e93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        ALTER TABLE "order"
+        ADD COLUMN IF NOT EXISTS paid_at TIMESTAMP WITHOUT TIME ZONE,
+        ADD COLUMN IF NOT EXISTS started_at TIMESTAMP WITHOUT TIME ZONE,
+        ADD COLUMN IF NOT EXISTS completed_at TIMESTAMP WITHOUT TIME ZONE;
+    """)
+    # Checkouts that already have a pickup ticket were paid when the ticket was issued
+    op.execute("""
+        UPDATE "order" o
+        SET paid_at = t.created_at
+        FROM pickup_ticket t
+        WHERE o.ticket_id = t.id AND o.paid_at IS NULL;
+    """)
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS serve_time_sketch (
+            dimension VARCHAR(10) NOT NULL,
+            key INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            count BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimension, key, bucket)
+        );
+    """)
+
+
+def downgrade():
+    op.execute("""
+        DROP TABLE IF EXISTS serve_time_sketch;
+    """)
+    op.execute("""
+        ALTER TABLE "order"
+        DROP COLUMN IF EXISTS completed_at,
+        DROP COLUMN IF EXISTS started_at,
+        DROP COLUMN IF EXISTS paid_at;
+    """)
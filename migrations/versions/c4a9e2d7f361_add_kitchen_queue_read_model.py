@@ -0,0 +1,82 @@
+"""add kitchen_queue read model and populate it from paid orders (idempotent)
+
+Revision ID: c4a9e2d7f361
+Revises: b7e3f19c2d58
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4a9e2d7f361'
+down_revision = 'b7e3f19c2d58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS kitchen_queue (
+            order_id INTEGER PRIMARY KEY,
+            student_id INTEGER NOT NULL,
+            student_name VARCHAR(100),
+            ic_number VARCHAR(50),
+            menu_item_id INTEGER,
+            item_name VARCHAR(100),
+            image_path VARCHAR(100),
+            quantity INTEGER,
+            total_price NUMERIC(10, 2),
+            status VARCHAR(20) NOT NULL DEFAULT 'pending',
+            order_time TIMESTAMP WITHOUT TIME ZONE,
+            started_at TIMESTAMP WITHOUT TIME ZONE,
+            ticket_id INTEGER,
+            pickup_date DATE,
+            pickup_number INTEGER,
+            stall_id INTEGER
+        );
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_kitchen_queue_student_id ON kitchen_queue (student_id);
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_kitchen_queue_menu_item_id ON kitchen_queue (menu_item_id);
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_kitchen_queue_status_order_time ON kitchen_queue (status, order_time);
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_kitchen_queue_stall_pending ON kitchen_queue (stall_id, order_time)
+        WHERE status = 'pending';
+    """)
+    op.execute("""
+        INSERT INTO kitchen_queue (
+            order_id, student_id, student_name, ic_number, menu_item_id, item_name,
+            image_path, quantity, total_price, status, order_time, started_at,
+            ticket_id, pickup_date, pickup_number, stall_id
+        )
+        SELECT o.id, o.student_id, s.name, s.ic_number, o.menu_item_id, m.name,
+               m.image_path, o.quantity, o.total_price, COALESCE(o.status, 'pending'),
+               o.order_time, o.started_at, o.ticket_id, t.pickup_date, t.pickup_number, o.stall_id
+        FROM "order" o
+        JOIN student_info s ON s.id = o.student_id
+        JOIN menu_item m ON m.id = o.menu_item_id
+        LEFT JOIN pickup_ticket t ON t.id = o.ticket_id
+        WHERE o.payment_status = 'paid'
+        ON CONFLICT (order_id) DO NOTHING;
+    """)
+    # Stall queues now read kitchen_queue, so the order-side queue index is unused
+    op.execute("""
+        DROP INDEX IF EXISTS ix_order_stall_queue;
+    """)
+
+
+def downgrade():
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_order_stall_queue ON "order" (stall_id, order_time)
+        WHERE payment_status = 'paid' AND status = 'pending';
+    """)
+    op.execute("""
+        DROP TABLE IF EXISTS kitchen_queue;
+    """)
@@ -0,0 +1,33 @@
+"""add student_favourite order-again scores (idempotent)
+
+Revision ID: c4f8a2d6e0b7
+Revises: b2e6f4a8c0d3
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4f8a2d6e0b7'
+down_revision = 'b2e6f4a8c0d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS student_favourite (
+            student_id INTEGER NOT NULL,
+            menu_item_id INTEGER NOT NULL,
+            score DOUBLE PRECISION NOT NULL DEFAULT 0,
+            PRIMARY KEY (student_id, menu_item_id)
+        );
+    """)
+
+
+def downgrade():
+    op.execute("""
+        DROP TABLE IF EXISTS student_favourite;
+    """)
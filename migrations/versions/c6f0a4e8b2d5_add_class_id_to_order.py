@@ -0,0 +1,40 @@
+"""add the student's class at payment to order (idempotent)
+
+Revision ID: c6f0a4e8b2d5
+Revises: b4e8f2c6a0d3
+Create Date: 2026-10-21 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6f0a4e8b2d5'
+down_revision = 'b4e8f2c6a0d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        ALTER TABLE "order"
+        ADD COLUMN IF NOT EXISTS class_id INTEGER REFERENCES school_class (id);
+    """)
+    # Orders paid before this column existed were rolled up under the student's current class
+    op.execute("""
+        UPDATE "order" o
+        SET class_id = s.class_id
+        FROM student_info s
+        WHERE s.id = o.student_id
+          AND o.payment_status = 'paid'
+          AND o.class_id IS NULL
+          AND s.class_id IS NOT NULL;
+    """)
+
+
+def downgrade():
+    op.execute("""
+        ALTER TABLE "order"
+        DROP COLUMN IF EXISTS class_id;
+    """)
@@ -0,0 +1,45 @@
+"""add sales_daily rollup and backfill it from paid orders (idempotent)
+
+Revision ID: d2f6a8b4c9e1
+Revises: c4a9e2d7f361
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2f6a8b4c9e1'
+down_revision = 'c4a9e2d7f361'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS sales_daily (
+            sale_date DATE NOT NULL,
+            menu_item_id INTEGER NOT NULL,
+            quantity BIGINT NOT NULL DEFAULT 0,
+            revenue NUMERIC(12, 2) NOT NULL DEFAULT 0,
+            order_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (sale_date, menu_item_id)
+        );
+    """)
+    op.execute("""
+        INSERT INTO sales_daily (sale_date, menu_item_id, quantity, revenue, order_count)
+        SELECT DATE(COALESCE(paid_at, order_time)), menu_item_id,
+               COALESCE(SUM(quantity), 0), COALESCE(SUM(total_price), 0), COUNT(id)
+        FROM "order"
+        WHERE payment_status = 'paid' AND menu_item_id IS NOT NULL
+          AND COALESCE(paid_at, order_time) IS NOT NULL
+        GROUP BY DATE(COALESCE(paid_at, order_time)), menu_item_id
+        ON CONFLICT (sale_date, menu_item_id) DO NOTHING;
+    """)
+
+
+def downgrade():
+    op.execute("""
+        DROP TABLE IF EXISTS sales_daily;
+    """)
@@ -0,0 +1,75 @@
+"""add grade/school_class, student class_id and spending_daily rollup (idempotent)
+
+Revision ID: d5a9b3e7c1f4
+Revises: c4f8a2d6e0b7
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5a9b3e7c1f4'
+down_revision = 'c4f8a2d6e0b7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS grade (
+            id SERIAL PRIMARY KEY,
+            name VARCHAR(50) NOT NULL UNIQUE,
+            display_order INTEGER DEFAULT 0,
+            created_at TIMESTAMP WITHOUT TIME ZONE
+        );
+    """)
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS school_class (
+            id SERIAL PRIMARY KEY,
+            grade_id INTEGER NOT NULL REFERENCES grade (id),
+            name VARCHAR(50) NOT NULL,
+            created_at TIMESTAMP WITHOUT TIME ZONE,
+            CONSTRAINT uq_school_class_grade_name UNIQUE (grade_id, name)
+        );
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_school_class_grade_id ON school_class (grade_id);
+    """)
+    op.execute("""
+        ALTER TABLE student_info ADD COLUMN IF NOT EXISTS class_id INTEGER REFERENCES school_class (id);
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_student_info_class_id ON student_info (class_id);
+    """)
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS spending_daily (
+            sale_date DATE NOT NULL,
+            dimension VARCHAR(10) NOT NULL,
+            key INTEGER NOT NULL,
+            revenue NUMERIC(12, 2) NOT NULL DEFAULT 0,
+            quantity BIGINT NOT NULL DEFAULT 0,
+            order_count INTEGER NOT NULL DEFAULT 0,
+            buyers INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (sale_date, dimension, key)
+        );
+    """)
+
+
+def downgrade():
+    op.execute("""
+        DROP TABLE IF EXISTS spending_daily;
+    """)
+    op.execute("""
+        DROP INDEX IF EXISTS ix_student_info_class_id;
+    """)
+    op.execute("""
+        ALTER TABLE student_info DROP COLUMN IF EXISTS class_id;
+    """)
+    op.execute("""
+        DROP TABLE IF EXISTS school_class;
+    """)
+    op.execute("""
+        DROP TABLE IF EXISTS grade;
+    """)
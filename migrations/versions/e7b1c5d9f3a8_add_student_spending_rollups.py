@@ -0,0 +1,48 @@
+"""add student_item_daily and student_topup_daily rollups (idempotent)
+
+Revision ID: e7b1c5d9f3a8
+Revises: d5a9b3e7c1f4
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b1c5d9f3a8'
+down_revision = 'd5a9b3e7c1f4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS student_item_daily (
+            student_id INTEGER NOT NULL,
+            sale_date DATE NOT NULL,
+            menu_item_id INTEGER NOT NULL,
+            quantity BIGINT NOT NULL DEFAULT 0,
+            spent NUMERIC(12, 2) NOT NULL DEFAULT 0,
+            order_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (student_id, sale_date, menu_item_id)
+        );
+    """)
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS student_topup_daily (
+            student_id INTEGER NOT NULL,
+            topup_date DATE NOT NULL,
+            amount NUMERIC(12, 2) NOT NULL DEFAULT 0,
+            topup_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (student_id, topup_date)
+        );
+    """)
+
+
+def downgrade():
+    op.execute("""
+        DROP TABLE IF EXISTS student_topup_daily;
+    """)
+    op.execute("""
+        DROP TABLE IF EXISTS student_item_daily;
+    """)
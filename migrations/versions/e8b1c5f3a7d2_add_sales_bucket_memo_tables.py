@@ -0,0 +1,46 @@
+"""add sales_bucket and sales_bucket_period memo tables for time-bucketed analytics (idempotent)
+
+Revision ID: e8b1c5f3a7d2
+Revises: d2f6a8b4c9e1
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8b1c5f3a7d2'
+down_revision = 'd2f6a8b4c9e1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS sales_bucket (
+            bucket_size VARCHAR(8) NOT NULL,
+            bucket_start TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            menu_item_id INTEGER NOT NULL,
+            quantity BIGINT NOT NULL DEFAULT 0,
+            revenue NUMERIC(12, 2) NOT NULL DEFAULT 0,
+            order_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (bucket_size, bucket_start, menu_item_id)
+        );
+    """)
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS sales_bucket_period (
+            bucket_size VARCHAR(8) NOT NULL,
+            bucket_start TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            PRIMARY KEY (bucket_size, bucket_start)
+        );
+    """)
+
+
+def downgrade():
+    op.execute("""
+        DROP TABLE IF EXISTS sales_bucket_period;
+    """)
+    op.execute("""
+        DROP TABLE IF EXISTS sales_bucket;
+    """)
@@ -0,0 +1,47 @@
+"""add keyset indexes for the transaction ledger (idempotent)
+
+Revision ID: f3c7a1d9b2e4
+Revises: e8b1c5f3a7d2
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c7a1d9b2e4'
+down_revision = 'e8b1c5f3a7d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_transaction_time_id ON transaction (transaction_time, id);
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_transaction_type_time_id ON transaction (type, transaction_time, id);
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_transaction_student_time_id ON transaction (student_id, transaction_time, id);
+    """)
+    # Covered by the leading column of ix_transaction_student_time_id
+    op.execute("""
+        DROP INDEX IF EXISTS ix_transaction_student_id;
+    """)
+
+
+def downgrade():
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_transaction_student_id ON transaction (student_id);
+    """)
+    op.execute("""
+        DROP INDEX IF EXISTS ix_transaction_student_time_id;
+    """)
+    op.execute("""
+        DROP INDEX IF EXISTS ix_transaction_type_time_id;
+    """)
+    op.execute("""
+        DROP INDEX IF EXISTS ix_transaction_time_id;
+    """)
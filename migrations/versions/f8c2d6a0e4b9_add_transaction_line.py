@@ -0,0 +1,46 @@
+"""add transaction_line item-level ledger rows (idempotent)
+
+Revision ID: f8c2d6a0e4b9
+Revises: e7b1c5d9f3a8
+Create Date: 2026-10-19 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f8c2d6a0e4b9'
+down_revision = 'e7b1c5d9f3a8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS transaction_line (
+            id SERIAL PRIMARY KEY,
+            transaction_id INTEGER NOT NULL REFERENCES transaction (id),
+            kind VARCHAR(20) NOT NULL,
+            order_id INTEGER,
+            menu_item_id INTEGER,
+            quantity INTEGER NOT NULL DEFAULT 1,
+            unit_price NUMERIC(10, 2) NOT NULL,
+            amount NUMERIC(10, 2) NOT NULL
+        );
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_transaction_line_transaction_id ON transaction_line (transaction_id);
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_transaction_line_order_id ON transaction_line (order_id);
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_transaction_line_item_transaction ON transaction_line (menu_item_id, transaction_id);
+    """)
+
+
+def downgrade():
+    op.execute("""
+        DROP TABLE IF EXISTS transaction_line;
+    """)
@@ -3,12 +3,30 @@ from flask_login import UserMixin
 from datetime import datetime, timezone, timedelta
 from werkzeug.security import generate_password_hash, check_password_hash
 from tz_utils import now_myt
+from db_routing import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 # Constants for foreign key references
 STUDENT_INFO_ID = 'student_info.id'
 
+# Global counter behind StudentInfo.orders_version (PostgreSQL only; see next_orders_version)
+orders_version_seq = db.Sequence('student_orders_version_seq', metadata=db.metadata)
+
+
+def next_orders_version():
+    """Return the next change-cursor value for StudentInfo.orders_version.
+
+    Values are drawn at write time, not commit time, so a lower value can become
+    visible after a higher one (and the SQLite fallback can hand out the same value
+    twice); readers re-scan recent changes by orders_changed_at to cover this.
+    """
+    if db.session.get_bind().dialect.supports_sequences:
+        return db.session.scalar(db.select(orders_version_seq.next_value()))
+    # Databases without sequences (e.g. SQLite in development) fall back to max + 1
+    current = db.session.query(db.func.max(StudentInfo.orders_version)).scalar()
+    return (current or 0) + 1
+
 class StudentInfo(db.Model, UserMixin):
     __tablename__ = 'student_info'
     id = db.Column(db.Integer, primary_key=True)
@@ -21,6 +39,15 @@ class StudentInfo(db.Model, UserMixin):
     frozen = db.Column(db.Boolean, default=False)
     total_points = db.Column(db.Integer, default=0)  # Total points earned
     available_points = db.Column(db.Integer, default=0)  # Points available for redemption
+    orders_version = db.Column(db.BigInteger, default=0, nullable=False, index=True)  # Bumped when paid orders or balance change
+    orders_changed_at = db.Column(db.DateTime, index=True)  # When orders_version was last bumped (MYT)
+    class_id = db.Column(db.Integer, db.ForeignKey('school_class.id'), index=True)
+    school_class = db.relationship('SchoolClass', backref='students')
+    
+    def bump_orders_version(self):
+        """Mark this student's paid orders/balance as changed for incremental refreshes"""
+        self.orders_version = next_orders_version()
+        self.orders_changed_at = now_myt().replace(tzinfo=None)
     
     def set_pin(self, pin):
         """Hash and store PIN"""
@@ -52,6 +79,34 @@ class StudentInfo(db.Model, UserMixin):
         """Legacy setter for backward compatibility"""
         self.set_pin(value)
 
+class Stall(db.Model):
+    """A kitchen counter (rice, noodles, drinks...) with its own order queue"""
+    __tablename__ = 'stall'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False, unique=True)
+    description = db.Column(db.Text)
+    is_active = db.Column(db.Boolean, default=True, index=True)
+    display_order = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=now_myt)
+
+class Grade(db.Model):
+    """A school year (Tahun 1-6, Form 1-5...) grouping classes"""
+    __tablename__ = 'grade'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), nullable=False, unique=True)
+    display_order = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=now_myt)
+
+class SchoolClass(db.Model):
+    """A class within a grade; students belong to at most one"""
+    __tablename__ = 'school_class'
+    __table_args__ = (db.UniqueConstraint('grade_id', 'name', name='uq_school_class_grade_name'),)
+    id = db.Column(db.Integer, primary_key=True)
+    grade_id = db.Column(db.Integer, db.ForeignKey('grade.id'), nullable=False, index=True)
+    name = db.Column(db.String(50), nullable=False)
+    created_at = db.Column(db.DateTime, default=now_myt)
+    grade = db.relationship('Grade', backref='classes')
+
 class MenuItem(db.Model):
     __tablename__ = 'menu_item'
     id = db.Column(db.Integer, primary_key=True)
@@ -62,6 +117,8 @@ class MenuItem(db.Model):
     image_path = db.Column(db.String(100))
     is_available = db.Column(db.Boolean, default=True, index=True)
     created_at = db.Column(db.DateTime, default=now_myt)
+    stall_id = db.Column(db.Integer, db.ForeignKey('stall.id'), index=True)
+    stall = db.relationship('Stall', backref='menu_items')
 
 
 class Order(db.Model):
@@ -76,7 +133,189 @@ class Order(db.Model):
     item = db.relationship('MenuItem', backref='orders', foreign_keys=[menu_item_id])
     order_time = db.Column(db.DateTime, default=now_myt, index=True)
     payment_status = db.Column(db.String(20), default='unpaid', index=True)
+    ticket_id = db.Column(db.Integer, db.ForeignKey('pickup_ticket.id'), index=True)  # Set when the checkout is paid
+    stall_id = db.Column(db.Integer, db.ForeignKey('stall.id'))  # Stall queue the paid order was routed to
+    class_id = db.Column(db.Integer, db.ForeignKey('school_class.id'))  # Student's class when paid (spending rollup)
+    paid_at = db.Column(db.DateTime)  # Service-level timestamps (MYT), set by checkout and the kitchen
+    started_at = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime)
+    ticket = db.relationship('PickupTicket', backref='orders')
+
+
+class PickupTicket(db.Model):
+    """One paid checkout, identified to the student by a short daily pickup number"""
+    __tablename__ = 'pickup_ticket'
+    __table_args__ = (db.UniqueConstraint('pickup_date', 'pickup_number', name='uq_pickup_ticket_day_number'),)
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey(STUDENT_INFO_ID), nullable=False, index=True)
+    pickup_date = db.Column(db.Date, nullable=False)  # MYT calendar day the number belongs to
+    pickup_number = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20), default='pending', index=True)  # pending, completed, cancelled
+    created_at = db.Column(db.DateTime, default=now_myt)
+    completed_at = db.Column(db.DateTime)
+    student = db.relationship('StudentInfo', backref='pickup_tickets')
+
+
+class KitchenThroughput(db.Model):
+    """Exponentially weighted kitchen service time per menu item, used for queue ETAs"""
+    __tablename__ = 'kitchen_throughput'
+    menu_item_id = db.Column(db.Integer, db.ForeignKey('menu_item.id'), primary_key=True)
+    seconds_per_unit = db.Column(db.Float, nullable=False)
+    samples = db.Column(db.Integer, default=0)
+    updated_at = db.Column(db.DateTime, default=now_myt)
+
+class KitchenQueueEntry(db.Model):
+    """Denormalized read model of paid orders for the kitchen boards (see kitchen_queue.py)"""
+    __tablename__ = 'kitchen_queue'
+    __table_args__ = (
+        db.Index(
+            'ix_kitchen_queue_stall_pending', 'stall_id', 'order_time',
+            postgresql_where=db.text("status = 'pending'"),
+            sqlite_where=db.text("status = 'pending'"),
+        ),
+        db.Index('ix_kitchen_queue_status_order_time', 'status', 'order_time'),
+    )
+    order_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    student_id = db.Column(db.Integer, nullable=False, index=True)
+    student_name = db.Column(db.String(100))
+    ic_number = db.Column(db.String(50))
+    menu_item_id = db.Column(db.Integer, index=True)
+    item_name = db.Column(db.String(100))
+    image_path = db.Column(db.String(100))
+    quantity = db.Column(db.Integer)
+    total_price = db.Column(db.Numeric(10, 2))
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    order_time = db.Column(db.DateTime)
+    started_at = db.Column(db.DateTime)
+    ticket_id = db.Column(db.Integer)
+    pickup_date = db.Column(db.Date)
+    pickup_number = db.Column(db.Integer)
+    stall_id = db.Column(db.Integer)
+
+class ServeTimeSketch(db.Model):
+    """Log-bucketed time-to-serve counts (paid -> completed) per menu item or MYT hour of day"""
+    __tablename__ = 'serve_time_sketch'
+    dimension = db.Column(db.String(10), primary_key=True)  # 'item' or 'hour'
+    key = db.Column(db.Integer, primary_key=True)  # menu_item_id, or hour 0-23
+    bucket = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.BigInteger, nullable=False, default=0)
+
+class SalesDaily(db.Model):
+    """Paid sales per MYT day and menu item, maintained at checkout/refund (see sales_rollup.py)"""
+    __tablename__ = 'sales_daily'
+    sale_date = db.Column(db.Date, primary_key=True)
+    menu_item_id = db.Column(db.Integer, primary_key=True)
+    quantity = db.Column(db.BigInteger, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+
+class SpendingDaily(db.Model):
+    """Paid spending per MYT day for the whole school, each grade and each class (see spending_rollup.py)"""
+    __tablename__ = 'spending_daily'
+    sale_date = db.Column(db.Date, primary_key=True)
+    dimension = db.Column(db.String(10), primary_key=True)  # 'school', 'grade' or 'class'
+    key = db.Column(db.Integer, primary_key=True)  # grade/class id; 0 for the school or students without one
+    revenue = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    quantity = db.Column(db.BigInteger, nullable=False, default=0)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    buyers = db.Column(db.Integer, nullable=False, default=0)  # Students with a paid order that day
+
+class StudentItemDaily(db.Model):
+    """Paid orders per student, MYT day and menu item, for parents' spending timelines (see child_spending.py)"""
+    __tablename__ = 'student_item_daily'
+    student_id = db.Column(db.Integer, primary_key=True)
+    sale_date = db.Column(db.Date, primary_key=True)
+    menu_item_id = db.Column(db.Integer, primary_key=True)
+    quantity = db.Column(db.BigInteger, nullable=False, default=0)
+    spent = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+
+class StudentTopupDaily(db.Model):
+    """Top-ups credited per student and MYT day (see child_spending.py)"""
+    __tablename__ = 'student_topup_daily'
+    student_id = db.Column(db.Integer, primary_key=True)
+    topup_date = db.Column(db.Date, primary_key=True)
+    amount = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    topup_count = db.Column(db.Integer, nullable=False, default=0)
+
+class SalesBucket(db.Model):
+    """Memoized paid sales per closed time bucket and menu item (see sales_analytics.py)"""
+    __tablename__ = 'sales_bucket'
+    bucket_size = db.Column(db.String(8), primary_key=True)  # '15min', 'hour', 'day' or 'week'
+    bucket_start = db.Column(db.DateTime, primary_key=True)  # MYT wall time
+    menu_item_id = db.Column(db.Integer, primary_key=True)
+    quantity = db.Column(db.BigInteger, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+
+class SalesBucketPeriod(db.Model):
+    """Marks a closed bucket whose SalesBucket rows are complete (including buckets with no sales)"""
+    __tablename__ = 'sales_bucket_period'
+    bucket_size = db.Column(db.String(8), primary_key=True)
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+
+class CoPurchase(db.Model):
+    """Checkout baskets containing both items (item_a <= item_b; the diagonal counts single items)"""
+    __tablename__ = 'co_purchase'
+    item_a = db.Column(db.Integer, primary_key=True)
+    item_b = db.Column(db.Integer, primary_key=True)
+    baskets = db.Column(db.BigInteger, nullable=False, default=0)
+
+class CoPurchaseState(db.Model):
+    """Progress of the incremental co-purchase job (single row, see co_purchase.py)"""
+    __tablename__ = 'co_purchase_state'
+    id = db.Column(db.Integer, primary_key=True)
+    last_ticket_id = db.Column(db.Integer, nullable=False, default=0)
+    baskets = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=now_myt)
+
+class StudentFavourite(db.Model):
+    """Recency-weighted order frequency per student and menu item (see favourites.py)"""
+    __tablename__ = 'student_favourite'
+    student_id = db.Column(db.Integer, primary_key=True)
+    menu_item_id = db.Column(db.Integer, primary_key=True)
+    score = db.Column(db.Float, nullable=False, default=0)  # Scaled to FAVOURITE_EPOCH, only comparable per student
+
+class DailySettlement(db.Model):
+    """Frozen end-of-day close for one MYT day; written once, never updated (see settlement.py)"""
+    __tablename__ = 'daily_settlement'
+    settle_date = db.Column(db.Date, primary_key=True)
+    sales_revenue = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    sales_orders = db.Column(db.Integer, nullable=False, default=0)
+    sales_quantity = db.Column(db.BigInteger, nullable=False, default=0)
+    cash_topups = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    qr_topups = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    refunds = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    outstanding_balance = db.Column(db.Numeric(14, 2), nullable=False, default=0)  # Sum of all balances at close
+    pending_payments = db.Column(db.Integer, nullable=False, default=0)  # QR payments still pending at close
+    pending_amount = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    closed_at = db.Column(db.DateTime, nullable=False, default=now_myt)
     
+class WalletAnomaly(db.Model):
+    """A student flagged by the nightly wallet activity scoring, awaiting admin review (see wallet_anomalies.py)"""
+    __tablename__ = 'wallet_anomaly'
+    __table_args__ = (db.UniqueConstraint('student_id', 'detected_on', name='uq_wallet_anomaly_student_day'),)
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey(STUDENT_INFO_ID), nullable=False, index=True)
+    detected_on = db.Column(db.Date, nullable=False, index=True)  # Last MYT day of the scored window
+    score = db.Column(db.Float, nullable=False)  # Highest robust z-score among the features
+    reasons = db.Column(db.Text)  # e.g. "Spending burst (z 6.2), Refunds (z 4.1)"
+    # Feature vector over the scored window
+    spend_per_day = db.Column(db.Float, nullable=False, default=0)
+    spend_jump = db.Column(db.Float, nullable=False, default=0)  # log ratio of recent to usual daily spend
+    refund_ratio = db.Column(db.Float, nullable=False, default=0)
+    topups = db.Column(db.Integer, nullable=False, default=0)
+    largest_topup = db.Column(db.Float, nullable=False, default=0)
+    off_hours_share = db.Column(db.Float, nullable=False, default=0)
+    status = db.Column(db.String(20), nullable=False, default='open', index=True)  # open, reviewed, dismissed
+    review_note = db.Column(db.Text)
+    reviewed_by = db.Column(db.Integer, db.ForeignKey(STUDENT_INFO_ID))
+    reviewed_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=now_myt)
+
+    student = db.relationship('StudentInfo', foreign_keys=[student_id])
+    reviewer = db.relationship('StudentInfo', foreign_keys=[reviewed_by])
+
 class Feedback(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     timestamp = db.Column(db.DateTime, default=now_myt)
@@ -158,8 +397,8 @@ class Payment(db.Model):
     transaction_id = db.Column(db.String(100), unique=True)
     status = db.Column(db.String(20), default='pending')  # pending, completed, failed
     bank_reference = db.Column(db.String(100))
-    created_at = db.Column(db.DateTime, default=now_myt)
-    completed_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=now_myt, index=True)
+    completed_at = db.Column(db.DateTime, index=True)
     
     parent = db.relationship('Parent', backref='payments')
     student = db.relationship('StudentInfo', backref='payments')
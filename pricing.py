@@ -0,0 +1,226 @@
+"""
+Menu pricing what-if simulator.
+
+Daily quantity and revenue per available item come from the sales_daily rollup
+as items x days NumPy matrices, so a day's realised price is revenue / quantity.
+Each item's price elasticity is the slope of log(quantity) on log(price) over
+its selling days. Quantity is taken relative to that day's volume of the items
+whose price held steady, so busy or quiet days, term breaks and menu-wide price
+changes do not read as (or hide) an item's own price effect. Items whose price
+never moved (or moved on too few days) get the median elasticity of the items
+that could be fitted.
+
+simulate() projects daily volume and revenue as baseline * (price / current) **
+elasticity for a whole batch of candidate price vectors in one array
+expression. Fits only change when a day closes or the menu changes, so they are
+cached per MYT day and menu.
+"""
+import threading
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+import numpy as np
+
+from models import db, MenuItem, SalesDaily
+from tz_utils import now_myt
+
+# Sales history the elasticities are fitted on
+PRICING_HISTORY_DAYS = 2 * 365
+# Baseline volume: average over this many most recent trading days
+BASELINE_DAYS = 20
+# An item is fitted only with enough selling days and enough price movement
+MIN_FIT_DAYS = 20
+MIN_LOG_PRICE_STD = 0.02
+# Plausible range for a canteen item; also the fallback when nothing can be fitted
+ELASTICITY_RANGE = (-4.0, -0.1)
+DEFAULT_ELASTICITY = -1.0
+MAX_CANDIDATES = 200
+
+_cache_lock = threading.Lock()
+_cache = {'key': None, 'model': None}
+
+
+def load_price_history(item_ids, start, end):
+    """(quantity[items, days], revenue[items, days]) of paid sales for start..end inclusive"""
+    days = (end - start).days + 1
+    quantity = np.zeros((len(item_ids), days), dtype=np.float64)
+    revenue = np.zeros((len(item_ids), days), dtype=np.float64)
+    if not item_ids:
+        return quantity, revenue
+
+    row_of = {item_id: i for i, item_id in enumerate(item_ids)}
+    rows = db.session.query(
+        SalesDaily.sale_date, SalesDaily.menu_item_id, SalesDaily.quantity, SalesDaily.revenue
+    ).filter(
+        SalesDaily.sale_date >= start,
+        SalesDaily.sale_date <= end,
+        SalesDaily.menu_item_id.in_(item_ids),
+    ).all()
+    if rows:
+        sale_dates, menu_item_ids, quantities, revenues = zip(*rows)
+        cells = ([row_of[i] for i in menu_item_ids], [(d - start).days for d in sale_dates])
+        quantity[cells] = quantities
+        revenue[cells] = np.array(revenues, dtype=np.float64)
+    return quantity, revenue
+
+
+def fit_elasticities(quantity, revenue):
+    """Per-item (elasticity, fitted, observations) from daily quantity/revenue matrices"""
+    sold = (quantity > 0) & (revenue > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_price = np.where(sold, np.log(revenue / quantity), 0.0)
+    count = np.maximum(sold.sum(axis=1), 1)
+    x = np.where(sold, log_price - (log_price.sum(axis=1) / count)[:, None], 0.0)
+    varied = (sold.sum(axis=1) >= MIN_FIT_DAYS) & (np.sqrt((x * x).sum(axis=1) / count) >= MIN_LOG_PRICE_STD)
+
+    # Day effects (attendance, events) come from the items whose price held steady,
+    # so a menu-wide price change is not mistaken for a quiet day
+    reference = quantity[~varied].sum(axis=0)
+    if (reference > 0).sum() >= MIN_FIT_DAYS:
+        usable = sold & (reference > 0)
+        control = np.log(np.where(reference > 0, reference, 1.0))
+    else:
+        usable = sold
+        control = np.zeros(quantity.shape[1])
+    observations = usable.sum(axis=1)
+
+    count = np.maximum(observations, 1)
+    with np.errstate(divide='ignore'):
+        log_share = np.where(usable, np.log(np.where(usable, quantity, 1.0)) - control, 0.0)
+    log_price = np.where(usable, log_price, 0.0)
+    x = np.where(usable, log_price - (log_price.sum(axis=1) / count)[:, None], 0.0)
+    y = np.where(usable, log_share - (log_share.sum(axis=1) / count)[:, None], 0.0)
+    sxx = (x * x).sum(axis=1)
+    sxy = (x * y).sum(axis=1)
+
+    fitted = varied & (observations >= MIN_FIT_DAYS) & (np.sqrt(sxx / count) >= MIN_LOG_PRICE_STD)
+    slope = np.clip(np.divide(sxy, sxx, out=np.zeros_like(sxx), where=sxx > 0), *ELASTICITY_RANGE)
+    pooled = float(np.median(slope[fitted])) if fitted.any() else DEFAULT_ELASTICITY
+    return np.where(fitted, slope, pooled), fitted, observations
+
+
+def baseline_volume(quantity, days=BASELINE_DAYS):
+    """Average daily quantity per item over the last days the canteen traded"""
+    open_days = np.flatnonzero(quantity.sum(axis=0) > 0)[-days:]
+    if not len(open_days):
+        return np.zeros(quantity.shape[0])
+    return quantity[:, open_days].mean(axis=1)
+
+
+def fit_pricing_model(items, today=None):
+    """Elasticity and baseline per menu item (items: MenuItem rows, in output order)"""
+    today = today or now_myt().date()
+    item_ids = [item.id for item in items]
+    quantity, revenue = load_price_history(item_ids, today - timedelta(days=PRICING_HISTORY_DAYS), today)
+    elasticity, fitted, observations = fit_elasticities(quantity, revenue)
+    return {
+        'item_ids': item_ids,
+        'names': [item.name for item in items],
+        'prices': np.array([float(item.price or 0) for item in items]),
+        'baseline': baseline_volume(quantity),
+        'elasticity': elasticity,
+        'fitted': fitted,
+        'observations': observations,
+    }
+
+
+def get_pricing_model():
+    """The fitted model for the available menu, refitted once per MYT day or menu/price change"""
+    items = MenuItem.query.filter_by(is_available=True).order_by(MenuItem.name).all()
+    today = now_myt().date()
+    key = (today, tuple((item.id, item.price) for item in items))
+    with _cache_lock:
+        if _cache['key'] != key:
+            _cache['model'] = fit_pricing_model(items, today)
+            _cache['key'] = key
+        return _cache['model']
+
+
+def describe_model(model):
+    """JSON-ready per-item view of a pricing model"""
+    return [
+        {
+            'menu_item_id': item_id,
+            'name': model['names'][i],
+            'price': round(float(model['prices'][i]), 2),
+            'baseline_daily_quantity': round(float(model['baseline'][i]), 1),
+            'elasticity': round(float(model['elasticity'][i]), 2),
+            'fitted': bool(model['fitted'][i]),
+            'observations': int(model['observations'][i]),
+        }
+        for i, item_id in enumerate(model['item_ids'])
+    ]
+
+
+def parse_candidates(raw, model):
+    """Price matrix [candidates, items] from [{'label', 'prices': {item_id: price}}]; unset items keep their price.
+
+    Raises ValueError on unknown items, bad prices or too many candidates.
+    """
+    if not isinstance(raw, list) or not raw:
+        raise ValueError("candidates must be a non-empty list")
+    if len(raw) > MAX_CANDIDATES:
+        raise ValueError(f"At most {MAX_CANDIDATES} candidates per request")
+    column_of = {item_id: i for i, item_id in enumerate(model['item_ids'])}
+    prices = np.tile(model['prices'], (len(raw), 1))
+    labels = []
+    for row, candidate in enumerate(raw):
+        changes = candidate.get('prices', {}) if isinstance(candidate, dict) else None
+        if not isinstance(changes, dict):
+            raise ValueError("Each candidate needs a 'prices' object of menu_item_id: price")
+        for item_id, price in changes.items():
+            try:
+                column = column_of[int(item_id)]
+                price = Decimal(str(price))
+            except (KeyError, ValueError, InvalidOperation):
+                raise ValueError(f"Invalid price {price!r} for menu item {item_id}")
+            if not price.is_finite() or price <= 0:
+                raise ValueError(f"Invalid price {price} for menu item {item_id}")
+            prices[row, column] = float(price)
+        labels.append(str(candidate.get('label') or f"Candidate {row + 1}"))
+    return labels, prices
+
+
+def simulate(model, prices):
+    """Projected daily (quantity, revenue) per candidate and item for a [candidates, items] price matrix"""
+    current = model['prices']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(current > 0, prices / current, 1.0)
+    quantity = model['baseline'] * ratio ** model['elasticity']
+    return quantity, quantity * prices
+
+
+def project(model, labels, prices):
+    """JSON-ready projections: baseline totals plus per-candidate totals, deltas and items"""
+    quantity, revenue = simulate(model, prices)
+    base_quantity = float(model['baseline'].sum())
+    base_revenue = float(model['baseline'] @ model['prices'])
+    return {
+        'baseline': {'daily_quantity': round(base_quantity, 1), 'daily_revenue': round(base_revenue, 2)},
+        'candidates': [
+            {
+                'label': label,
+                'daily_quantity': round(float(quantity[c].sum()), 1),
+                'daily_revenue': round(float(revenue[c].sum()), 2),
+                'quantity_change': round(float(quantity[c].sum()) - base_quantity, 1),
+                'revenue_change': round(float(revenue[c].sum()) - base_revenue, 2),
+                'items': [
+                    {
+                        'menu_item_id': item_id,
+                        'price': round(float(prices[c, i]), 2),
+                        'daily_quantity': round(float(quantity[c, i]), 1),
+                        'daily_revenue': round(float(revenue[c, i]), 2),
+                    }
+                    for i, item_id in enumerate(model['item_ids'])
+                ],
+            }
+            for c, label in enumerate(labels)
+        ],
+    }
+
+
+def price_sweep(model, steps=(-0.2, -0.15, -0.1, -0.05, 0.0, 0.05, 0.1, 0.15, 0.2)):
+    """(labels, prices) scaling the whole menu by each step, rounded to 10 sen"""
+    factors = 1 + np.asarray(steps)[:, None]
+    prices = np.maximum(np.round(model['prices'] * factors, 1), 0.1)
+    return [f"{step:+.0%} across the menu" for step in steps], prices
@@ -0,0 +1,305 @@
+"""
+Pickup queue for the canteen kitchen.
+
+Every paid checkout gets a PickupTicket with a short pickup number that restarts
+at 1 each MYT day. Queue positions and ETAs are estimated from recent kitchen
+throughput: each menu item keeps an exponentially weighted seconds-per-unit rate
+that is updated whenever staff mark orders as done.
+
+Paid orders are also routed to the stall that prepares their menu item, so each
+stall screen only reads its own slice of the queue. Queue reads go to the
+kitchen_queue read model (see kitchen_queue.py) rather than joining orders.
+"""
+import threading
+import time
+from datetime import timedelta
+
+from sqlalchemy import func, text
+
+from models import db, Order, PickupTicket, KitchenThroughput, KitchenQueueEntry
+from tz_utils import now_myt, as_myt
+
+# Weight given to the newest completion sample
+EWMA_ALPHA = 0.3
+# Assumed service time for items the kitchen has not completed yet
+DEFAULT_SECONDS_PER_UNIT = 90.0
+# Ignore gaps longer than this (the kitchen was idle, not slow)
+MAX_SAMPLE_SECONDS = 20 * 60
+# How long a computed queue snapshot is served before it is rebuilt
+SNAPSHOT_TTL_SECONDS = 5
+
+_sequence_days = set()
+_snapshot_lock = threading.Lock()
+_snapshot = {'expires': 0.0, 'computed_at': None, 'tickets': {}}
+
+
+def _pickup_sequence_name(day):
+    return f"pickup_number_{day:%Y%m%d}"
+
+
+def _next_pickup_number(day):
+    """Draw the next pickup number for an MYT day.
+
+    On PostgreSQL each day has its own sequence, so concurrent checkouts never wait
+    on each other; the sequence is created (and older days dropped) on an autocommit
+    connection outside the checkout transaction. Other databases fall back to max + 1.
+    """
+    engine = db.session.get_bind()
+    if engine.dialect.name != 'postgresql':
+        current = db.session.query(func.max(PickupTicket.pickup_number)).filter(
+            PickupTicket.pickup_date == day
+        ).scalar()
+        return (current or 0) + 1
+
+    seq_name = _pickup_sequence_name(day)
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        if day not in _sequence_days:
+            try:
+                conn.execute(text(f"CREATE SEQUENCE IF NOT EXISTS {seq_name}"))
+            except Exception:
+                # Another worker created it at the same moment
+                pass
+            stale = conn.execute(text(
+                "SELECT relname FROM pg_class WHERE relkind = 'S' "
+                "AND relname LIKE 'pickup_number_%' AND relname < :oldest"
+            ), {'oldest': _pickup_sequence_name(day - timedelta(days=2))}).scalars().all()
+            for name in stale:
+                conn.execute(text(f"DROP SEQUENCE IF EXISTS {name}"))
+            _sequence_days.add(day)
+        return conn.execute(text(f"SELECT nextval('{seq_name}')")).scalar()
+
+
+def issue_pickup_ticket(student, orders):
+    """Create today's pickup ticket for a paid checkout and attach its orders"""
+    day = now_myt().date()
+    ticket = PickupTicket(
+        student_id=student.id,
+        pickup_date=day,
+        pickup_number=_next_pickup_number(day),
+        status='pending',
+    )
+    db.session.add(ticket)
+    for order in orders:
+        order.ticket = ticket
+    route_to_stalls(orders)
+    invalidate_snapshot()
+    return ticket
+
+
+def route_to_stalls(orders):
+    """Fan paid orders out to the queue of the stall that prepares each item"""
+    for order in orders:
+        order.stall_id = order.item.stall_id if order.item else None
+
+
+def _stall_queue_filter(stall_id):
+    # Matches the partial index ix_kitchen_queue_stall_pending
+    return (
+        KitchenQueueEntry.stall_id == stall_id,
+        KitchenQueueEntry.status == 'pending',
+    )
+
+
+def stall_queue(stall_id):
+    """Pending paid orders for one stall, grouped by pickup ticket in arrival order"""
+    rows = (
+        db.session.query(
+            KitchenQueueEntry.order_id,
+            KitchenQueueEntry.ticket_id,
+            KitchenQueueEntry.quantity,
+            KitchenQueueEntry.order_time,
+            KitchenQueueEntry.started_at,
+            KitchenQueueEntry.pickup_number,
+            KitchenQueueEntry.student_name,
+            KitchenQueueEntry.item_name,
+            KitchenQueueEntry.image_path,
+        )
+        .filter(*_stall_queue_filter(stall_id))
+        .order_by(KitchenQueueEntry.order_time, KitchenQueueEntry.order_id)
+        .all()
+    )
+
+    tickets = {}
+    for (order_id, ticket_id, quantity, order_time, started_at,
+         pickup_number, student_name, item_name, image_path) in rows:
+        key = ticket_id or f"order-{order_id}"
+        entry = tickets.get(key)
+        if entry is None:
+            entry = tickets[key] = {
+                'ticket_id': ticket_id,
+                'pickup_number': pickup_number,
+                'student_name': student_name,
+                'order_time': order_time.isoformat() if order_time else None,
+                'items': [],
+            }
+        entry['items'].append({
+            'order_id': order_id,
+            'name': item_name,
+            'quantity': quantity,
+            'image_path': image_path,
+            'started': started_at is not None,
+        })
+    return list(tickets.values())
+
+
+def stall_queue_fingerprint(stall_id):
+    """Cheap (count, max id, id sum, started) summary of a stall queue; changes whenever it does"""
+    count, max_id, id_sum, started = db.session.query(
+        func.count(KitchenQueueEntry.order_id),
+        func.max(KitchenQueueEntry.order_id),
+        func.sum(KitchenQueueEntry.order_id),
+        func.count(KitchenQueueEntry.started_at),
+    ).filter(*_stall_queue_filter(stall_id)).one()
+    return (count, max_id, id_sum, started)
+
+
+def stall_queue_counts():
+    """{stall_id: pending order count} for every stall with work waiting"""
+    return dict(
+        db.session.query(KitchenQueueEntry.stall_id, func.count(KitchenQueueEntry.order_id))
+        .filter(
+            KitchenQueueEntry.stall_id.isnot(None),
+            KitchenQueueEntry.status == 'pending',
+        )
+        .group_by(KitchenQueueEntry.stall_id)
+        .all()
+    )
+
+
+def record_completions(orders):
+    """Update throughput rates from freshly completed orders and close finished tickets.
+
+    The time since the kitchen's previous completion (or since the ticket was paid,
+    whichever is shorter) is spread over the units completed in this batch, and each
+    completed item's rate moves towards that per-unit sample.
+    """
+    orders = [o for o in orders if o.ticket_id]
+    if not orders:
+        return
+    now = now_myt()
+
+    last_completion = as_myt(db.session.query(func.max(KitchenThroughput.updated_at)).scalar())
+    paid_at = min(as_myt(o.ticket.created_at) for o in orders)
+    started = max(t for t in (last_completion, paid_at) if t is not None)
+    gap = (now - started).total_seconds()
+    units = sum(o.quantity or 0 for o in orders)
+
+    if units > 0 and 0 < gap <= MAX_SAMPLE_SECONDS:
+        sample = gap / units
+        item_ids = {o.menu_item_id for o in orders}
+        rates = {
+            r.menu_item_id: r
+            for r in KitchenThroughput.query.filter(KitchenThroughput.menu_item_id.in_(item_ids))
+        }
+        for item_id in item_ids:
+            rate = rates.get(item_id)
+            if rate is None:
+                db.session.add(KitchenThroughput(
+                    menu_item_id=item_id, seconds_per_unit=sample, samples=1, updated_at=now
+                ))
+            else:
+                rate.seconds_per_unit = EWMA_ALPHA * sample + (1 - EWMA_ALPHA) * rate.seconds_per_unit
+                rate.samples = (rate.samples or 0) + 1
+                rate.updated_at = now
+
+    close_finished_tickets({o.ticket_id for o in orders})
+
+
+def close_finished_tickets(ticket_ids):
+    """Close tickets once none of their paid orders are still pending.
+
+    A ticket whose orders were all deleted/refunded is cancelled rather than completed.
+    """
+    ticket_ids = {tid for tid in ticket_ids if tid}
+    if not ticket_ids:
+        return
+    db.session.flush()
+    remaining = {}
+    for tid, status in db.session.query(Order.ticket_id, Order.status).filter(
+        Order.ticket_id.in_(ticket_ids),
+        Order.payment_status == 'paid',
+    ).distinct():
+        remaining.setdefault(tid, set()).add(status)
+    now = now_myt()
+    for ticket in PickupTicket.query.filter(
+        PickupTicket.id.in_(ticket_ids),
+        PickupTicket.status == 'pending',
+    ):
+        statuses = remaining.get(ticket.id, set())
+        if 'pending' in statuses:
+            continue
+        ticket.status = 'completed' if statuses else 'cancelled'
+        ticket.completed_at = now
+    invalidate_snapshot()
+
+
+def invalidate_snapshot():
+    """Force the next ETA lookup in this worker to rebuild the queue snapshot"""
+    _snapshot['expires'] = 0.0
+
+
+def _build_snapshot():
+    """Walk today's pending queue in pickup order, accumulating estimated work"""
+    today = now_myt().date()
+    rates = dict(db.session.query(KitchenThroughput.menu_item_id, KitchenThroughput.seconds_per_unit))
+    rows = (
+        db.session.query(
+            KitchenQueueEntry.ticket_id,
+            KitchenQueueEntry.pickup_number,
+            KitchenQueueEntry.menu_item_id,
+            func.sum(KitchenQueueEntry.quantity),
+        )
+        .filter(
+            KitchenQueueEntry.pickup_date == today,
+            KitchenQueueEntry.status == 'pending',
+        )
+        .group_by(
+            KitchenQueueEntry.ticket_id,
+            KitchenQueueEntry.pickup_number,
+            KitchenQueueEntry.menu_item_id,
+        )
+        .order_by(KitchenQueueEntry.pickup_number)
+        .all()
+    )
+
+    tickets = {}
+    work_ahead = 0.0
+    for ticket_id, pickup_number, menu_item_id, quantity in rows:
+        work_ahead += (quantity or 0) * rates.get(menu_item_id, DEFAULT_SECONDS_PER_UNIT)
+        entry = tickets.get(ticket_id)
+        if entry is None:
+            entry = tickets[ticket_id] = {'pickup_number': pickup_number, 'position': len(tickets) + 1}
+        entry['eta_seconds'] = int(round(work_ahead))
+    return tickets
+
+
+def get_queue_snapshot():
+    """Return (computed_at, {ticket_id: {pickup_number, position, eta_seconds}}), cached briefly"""
+    with _snapshot_lock:
+        if time.monotonic() >= _snapshot['expires']:
+            _snapshot['tickets'] = _build_snapshot()
+            _snapshot['computed_at'] = now_myt()
+            _snapshot['expires'] = time.monotonic() + SNAPSHOT_TTL_SECONDS
+        return _snapshot['computed_at'], _snapshot['tickets']
+
+
+def ticket_status(ticket):
+    """Queue position and ETA for one ticket, as a JSON-ready dict"""
+    data = {
+        'ticket_id': ticket.id,
+        'pickup_number': ticket.pickup_number,
+        'pickup_date': ticket.pickup_date.isoformat(),
+        'status': ticket.status,
+        'position': None,
+        'eta_seconds': 0,
+        'eta': None,
+    }
+    if ticket.status != 'pending':
+        return data
+    computed_at, tickets = get_queue_snapshot()
+    entry = tickets.get(ticket.id)
+    if entry:
+        data['position'] = entry['position']
+        data['eta_seconds'] = entry['eta_seconds']
+        data['eta'] = (computed_at + timedelta(seconds=entry['eta_seconds'])).isoformat()
+    return data
@@ -0,0 +1,38 @@
+"""
+Script to rebuild every student's "order again" favourites from paid orders
+Checkout keeps them up to date; run this once after deploying, or whenever the
+scores may have drifted (e.g. after editing orders by hand):
+
+    python rebuild_favourites.py
+"""
+import os
+import sys
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db
+from favourites import rebuild_favourites
+
+def main():
+    """Recompute all favourites in a single transaction"""
+    print("=" * 60)
+    print("⭐ Rebuilding order-again favourites")
+    print("=" * 60)
+
+    with app.app_context():
+        try:
+            rows = rebuild_favourites()
+            db.session.commit()
+            print(f"✅ Wrote {rows} student/item row(s).")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Rebuild failed: {str(e)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Script to rebuild the kitchen_queue read model from the order tables
+Run this after bulk edits made outside the app (SQL, restores) or if the kitchen
+boards ever disagree with the orders:
+
+    python rebuild_kitchen_queue.py
+"""
+import os
+import sys
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db
+from kitchen_queue import rebuild_kitchen_queue
+
+def main():
+    """Rebuild the kitchen queue in a single transaction"""
+    print("=" * 60)
+    print("🍳 Rebuilding kitchen queue")
+    print("=" * 60)
+
+    with app.app_context():
+        try:
+            count = rebuild_kitchen_queue()
+            db.session.commit()
+            print(f"✅ Kitchen queue rebuilt with {count} paid order(s).")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Rebuild failed: {str(e)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
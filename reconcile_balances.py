@@ -0,0 +1,58 @@
+"""
+Script to reconcile every account balance against its transaction ledger
+Reports each account whose balance differs from the sum of its ledger rows.
+With --fix, writes one Adjustment ledger row per mismatch. Safe to run nightly:
+
+    python reconcile_balances.py
+    python reconcile_balances.py --fix
+"""
+import os
+import sys
+import time
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db
+from balance_reconciliation import reconcile_balances, write_adjustments
+
+def main():
+    """Report mismatches and optionally correct the ledger in a single transaction"""
+    fix = '--fix' in sys.argv[1:]
+
+    print("=" * 60)
+    print("🧮 Reconciling balances against the ledger")
+    print("=" * 60)
+
+    with app.app_context():
+        started = time.perf_counter()
+        mismatches, orphan_total = reconcile_balances()
+        elapsed = time.perf_counter() - started
+
+        for m in mismatches:
+            print(f"⚠️  #{m['student_id']} {m['name']}: balance RM{m['balance']:.2f}, "
+                  f"ledger RM{m['ledger']:.2f}, delta RM{m['delta']:+.2f}")
+        if orphan_total:
+            print(f"ℹ️  RM{orphan_total:.2f} of ledger rows belong to deleted accounts")
+        print(f"{len(mismatches)} mismatch(es) found in {elapsed:.2f}s.")
+
+        if fix and mismatches:
+            try:
+                written = write_adjustments(mismatches)
+                db.session.commit()
+                print(f"✅ Wrote {written} adjustment row(s).")
+            except Exception as e:
+                db.session.rollback()
+                print(f"❌ Writing adjustments failed: {str(e)}")
+                sys.exit(1)
+        elif mismatches:
+            print("Run with --fix to write adjustment rows.")
+        else:
+            print("✅ All balances match the ledger.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Script to backfill or re-roll the sales_daily, spending_daily and per-student
+(student_item_daily/student_topup_daily) rollups from paid orders and top-ups
+(spending by the class each order was paid in). Recomputes every day by
+default, or only the given MYT date range, and drops the memoized time buckets
+for that range so they are recomputed on next use:
+
+    python rollup_sales.py
+    python rollup_sales.py 2026-01-01 2026-01-31
+"""
+import os
+import sys
+from datetime import date
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db
+from sales_rollup import rollup_sales
+from spending_rollup import rollup_spending
+from child_spending import rollup_child_spending
+from sales_analytics import clear_sales_buckets
+
+def parse_date(value):
+    """Parse a YYYY-MM-DD argument"""
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        print(f"❌ Invalid date '{value}', expected YYYY-MM-DD")
+        sys.exit(1)
+
+def main():
+    """Re-roll the requested range in a single transaction"""
+    start = parse_date(sys.argv[1]) if len(sys.argv) > 1 else None
+    end = parse_date(sys.argv[2]) if len(sys.argv) > 2 else start
+
+    print("=" * 60)
+    print("📊 Rolling up daily sales")
+    print("=" * 60)
+    if start:
+        print(f"Range: {start} to {end}")
+    else:
+        print("Range: all days")
+
+    with app.app_context():
+        try:
+            rows = rollup_sales(start, end)
+            spending_rows = rollup_spending(start, end)
+            student_rows = rollup_child_spending(start, end)
+            clear_sales_buckets(start, end)
+            db.session.commit()
+            print(f"✅ Wrote {rows} day/item row(s).")
+            print(f"✅ Wrote {spending_rows} school/grade/class day row(s).")
+            print(f"✅ Wrote {student_rows} per-student day row(s).")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Rollup failed: {str(e)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+Lunch-rush capacity simulator.
+
+load_rush_profile() reads the tickets paid during the break window over recent
+days: when each student started ordering (their first order of the ticket),
+how many lines the basket had, and how many seconds of cooking it needs at
+each stall (units x that item's seconds_per_unit from KitchenThroughput).
+
+simulate_break() replays one break as a discrete-event run through three
+first-come first-served stages: a kiosk to place the order, a payment counter,
+and a cook at every stall the basket needs (the ticket is ready when its last
+stall finishes). Each run draws a historical day's ticket count and samples
+arrival times and baskets from the pooled history; service times are
+lognormal around their means. run_scenarios() runs thousands of breaks per
+staffing configuration across a process pool and merges the per-worker
+histograms of waits and sampled queue lengths into percentiles.
+"""
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, time, timedelta
+
+import numpy as np
+from sqlalchemy import func
+
+from models import db, KitchenThroughput, MenuItem, Order, PickupTicket, Stall
+from queue_service import DEFAULT_SECONDS_PER_UNIT
+from tz_utils import now_myt
+
+RUSH_HISTORY_DAYS = 60
+RUSH_WINDOW_MINUTES = 30
+# Mean service times for the stages the database has no timings for
+KIOSK_SECONDS = 30.0
+KIOSK_SECONDS_PER_LINE = 10.0
+PAYMENT_SECONDS = 20.0
+# Spread of every service time around its mean (coefficient of variation)
+SERVICE_CV = 0.35
+# Queue lengths are sampled this often during a run
+QUEUE_SAMPLE_SECONDS = 15
+# Histogram resolution used to merge results across runs and workers
+WAIT_BIN_SECONDS = 5
+MAX_WAIT_SECONDS = 3 * 3600
+MAX_QUEUE = 1000
+# Runs handed to a worker at a time
+RUNS_PER_TASK = 50
+NO_STALL = 'Unassigned'
+PERCENTILES = (50, 90, 99)
+
+
+def busiest_window(days=RUSH_HISTORY_DAYS, minutes=RUSH_WINDOW_MINUTES):
+    """(start, end) times of day of the busiest stretch of paid tickets over recent days"""
+    since = now_myt().replace(tzinfo=None) - timedelta(days=days)
+    paid_at = [t for (t,) in db.session.query(PickupTicket.created_at).filter(PickupTicket.created_at >= since)]
+    if not paid_at:
+        return None
+    per_minute = np.bincount([t.hour * 60 + t.minute for t in paid_at], minlength=24 * 60)
+    totals = np.convolve(per_minute, np.ones(minutes, dtype=np.int64), mode='valid')
+    first = int(np.argmax(totals))
+    start = datetime.combine(date.min, time()) + timedelta(minutes=first)
+    return start.time(), (start + timedelta(minutes=minutes)).time()
+
+
+def load_rush_profile(start, end, days=RUSH_HISTORY_DAYS):
+    """Arrivals and baskets of tickets paid between start and end (times of day) over recent days"""
+    since = now_myt().replace(tzinfo=None).date() - timedelta(days=days)
+    stalls = Stall.query.filter_by(is_active=True).order_by(Stall.display_order, Stall.name).all()
+    station_of = {stall.id: i for i, stall in enumerate(stalls)}
+    stations = [stall.name for stall in stalls] + [NO_STALL]
+    rates = dict(db.session.query(KitchenThroughput.menu_item_id, KitchenThroughput.seconds_per_unit))
+
+    rows = db.session.query(
+        PickupTicket.id, PickupTicket.pickup_date, PickupTicket.created_at,
+        func.min(Order.order_time), Order.menu_item_id, MenuItem.stall_id, func.sum(Order.quantity),
+    ).join(Order, Order.ticket_id == PickupTicket.id) \
+        .outerjoin(MenuItem, MenuItem.id == Order.menu_item_id) \
+        .filter(PickupTicket.pickup_date >= since) \
+        .group_by(PickupTicket.id, PickupTicket.pickup_date, PickupTicket.created_at, Order.menu_item_id, MenuItem.stall_id) \
+        .order_by(PickupTicket.id) \
+        .all()
+
+    tickets = {}
+    window = (datetime.combine(date.min, end) - datetime.combine(date.min, start)).total_seconds()
+    for ticket_id, day, paid_at, first_order, item_id, stall_id, units in rows:
+        arrived = min(t for t in (first_order, paid_at) if t is not None)
+        offset = (arrived - datetime.combine(arrived.date(), start)).total_seconds()
+        if not 0 <= offset < window:
+            continue
+        ticket = tickets.setdefault(ticket_id, {'day': day, 'offset': offset, 'lines': 0,
+                                                'work': np.zeros(len(stations))})
+        ticket['offset'] = min(ticket['offset'], offset)
+        ticket['lines'] += 1
+        ticket['work'][station_of.get(stall_id, len(stations) - 1)] += \
+            (units or 0) * rates.get(item_id, DEFAULT_SECONDS_PER_UNIT)
+
+    values = list(tickets.values())
+    _, day_counts = np.unique([t['day'] for t in values], return_counts=True) if values else (None, np.zeros(0))
+    return {
+        'window_seconds': window,
+        'stations': stations,
+        'day_counts': day_counts.astype(np.int64),
+        'offsets': np.array([t['offset'] for t in values], dtype=np.float64),
+        'lines': np.array([t['lines'] for t in values], dtype=np.float64),
+        'work': np.array([t['work'] for t in values], dtype=np.float64).reshape(len(values), len(stations)),
+    }
+
+
+def _service(rng, means):
+    """Lognormal service times with the given means and SERVICE_CV"""
+    sigma2 = np.log1p(SERVICE_CV ** 2)
+    return rng.lognormal(np.log(np.maximum(means, 1e-9)) - sigma2 / 2, np.sqrt(sigma2))
+
+
+def _fifo(arrivals, service, servers):
+    """Start and finish time of each job at a first-come first-served stage with servers in parallel"""
+    start = np.empty_like(arrivals)
+    free = [0.0] * max(int(servers), 1)
+    for i in np.argsort(arrivals, kind='stable'):
+        start[i] = max(heapq.heappop(free), arrivals[i])
+        heapq.heappush(free, start[i] + service[i])
+    return start, start + service
+
+
+def _queue_lengths(arrivals, starts):
+    """Number waiting (arrived, not yet started) every QUEUE_SAMPLE_SECONDS until the stage's last start"""
+    grid = np.arange(0.0, starts.max() + QUEUE_SAMPLE_SECONDS, QUEUE_SAMPLE_SECONDS)
+    return np.searchsorted(np.sort(arrivals), grid, side='right') - np.searchsorted(np.sort(starts), grid, side='right')
+
+
+def simulate_break(profile, config, rng):
+    """One simulated break: {stage: (waits, sampled queue lengths)} plus 'total' time to pickup"""
+    demand = config.get('demand', 1.0)
+    count = rng.poisson(rng.choice(profile['day_counts']) * demand) if len(profile['day_counts']) else 0
+    if count == 0:
+        return {}
+    picks = rng.integers(0, len(profile['offsets']), count)
+    arrivals = profile['offsets'][picks] + rng.uniform(-30, 30, count)
+    arrivals = np.clip(arrivals, 0, profile['window_seconds'])
+    work = profile['work'][picks]
+
+    kiosk_start, ordered = _fifo(arrivals, _service(rng, KIOSK_SECONDS + KIOSK_SECONDS_PER_LINE * profile['lines'][picks]),
+                                 config['kiosks'])
+    pay_start, paid = _fifo(ordered, _service(rng, np.full(count, PAYMENT_SECONDS)), config['cashiers'])
+    ready = paid.copy()
+    stages = {
+        'kiosk': (kiosk_start - arrivals, (arrivals, kiosk_start)),
+        'payment': (pay_start - ordered, (ordered, pay_start)),
+    }
+    for s, name in enumerate(profile['stations']):
+        jobs = np.flatnonzero(work[:, s] > 0)
+        if not len(jobs):
+            continue
+        cooks = config['cooks'].get(name, config['cooks'].get('*', 1))
+        start, done = _fifo(paid[jobs], _service(rng, work[jobs, s]), cooks)
+        np.maximum.at(ready, jobs, done)
+        stages[f'stall:{name}'] = (start - paid[jobs], (paid[jobs], start))
+    stages['total'] = (ready - arrivals, None)
+    return {
+        stage: (waits, _queue_lengths(*queue) if queue else None)
+        for stage, (waits, queue) in stages.items()
+    }
+
+
+def _empty_histograms():
+    return {'runs': 0, 'stages': {}}
+
+
+def _add_run(histograms, run):
+    histograms['runs'] += 1
+    for stage, (waits, queue) in run.items():
+        entry = histograms['stages'].setdefault(stage, {
+            'wait': np.zeros(MAX_WAIT_SECONDS // WAIT_BIN_SECONDS + 1, dtype=np.int64),
+            'queue': np.zeros(MAX_QUEUE + 1, dtype=np.int64),
+            'max_queue': np.zeros(0, dtype=np.int64),
+        })
+        bins = np.minimum(waits // WAIT_BIN_SECONDS, len(entry['wait']) - 1).astype(np.int64)
+        entry['wait'] += np.bincount(bins, minlength=len(entry['wait']))
+        if queue is not None:
+            entry['queue'] += np.bincount(np.minimum(queue, MAX_QUEUE), minlength=MAX_QUEUE + 1)
+            entry['max_queue'] = np.append(entry['max_queue'], queue.max())
+
+
+def _merge(into, other):
+    into['runs'] += other['runs']
+    for stage, entry in other['stages'].items():
+        if stage not in into['stages']:
+            into['stages'][stage] = entry
+            continue
+        target = into['stages'][stage]
+        target['wait'] += entry['wait']
+        target['queue'] += entry['queue']
+        target['max_queue'] = np.append(target['max_queue'], entry['max_queue'])
+
+
+_worker_profile = None
+
+
+def _init_worker(profile):
+    global _worker_profile
+    _worker_profile = profile
+
+
+def _run_task(config, seeds):
+    """Worker entry point: simulate one break per seed and return the merged histograms"""
+    histograms = _empty_histograms()
+    for seed in seeds:
+        run = simulate_break(_worker_profile, config, np.random.default_rng(seed))
+        if run:
+            _add_run(histograms, run)
+    return histograms
+
+
+def _histogram_percentiles(counts, scale):
+    cumulative = np.cumsum(counts)
+    if not cumulative[-1]:
+        return {p: 0.0 for p in PERCENTILES}
+    return {p: float(np.searchsorted(cumulative, cumulative[-1] * p / 100) * scale) for p in PERCENTILES}
+
+
+def summarize(histograms):
+    """Per-stage wait percentiles (seconds), sampled queue-length percentiles and peak queue"""
+    stages = {}
+    for stage, entry in histograms['stages'].items():
+        summary = {f'wait_p{p}': round(v, 1) for p, v in _histogram_percentiles(entry['wait'], WAIT_BIN_SECONDS).items()}
+        if entry['queue'].any():
+            summary.update({f'queue_p{p}': int(v) for p, v in _histogram_percentiles(entry['queue'], 1).items()})
+            summary['peak_queue_p50'] = int(np.median(entry['max_queue']))
+            summary['peak_queue_max'] = int(entry['max_queue'].max())
+        stages[stage] = summary
+    return {'runs': histograms['runs'], 'stages': stages}
+
+
+def run_scenarios(profile, configs, runs=1000, workers=None, seed=0):
+    """Simulate runs breaks for each staffing config in parallel; returns one summary per config.
+
+    A config is {'kiosks': n, 'cashiers': n, 'cooks': {stall name or '*': n}, 'demand': x}.
+    The same seeds are used for every config, so configurations are compared on the
+    same simulated breaks.
+    """
+    seeds = np.random.SeedSequence(seed).generate_state(runs, dtype=np.uint64).tolist()
+    chunks = [seeds[i:i + RUNS_PER_TASK] for i in range(0, runs, RUNS_PER_TASK)]
+    results = [_empty_histograms() for _ in configs]
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                             initializer=_init_worker, initargs=(profile,)) as pool:
+        futures = [
+            (index, pool.submit(_run_task, config, chunk))
+            for index, config in enumerate(configs)
+            for chunk in chunks
+        ]
+        for index, future in futures:
+            _merge(results[index], future.result())
+    return [{'config': config, **summarize(result)} for config, result in zip(configs, results)]
@@ -0,0 +1,241 @@
+"""
+Time-bucketed sales analytics.
+
+Paid sales are grouped into 15-minute, hourly, daily or weekly buckets of MYT
+wall time (timestamps are stored as MYT, so bucketing needs no conversion) with
+date_trunc on PostgreSQL. A bucket that has closed can no longer change except
+through a refund, so its per-item totals are memoized in sales_bucket the first
+time they are asked for, and only the still-open current bucket is recomputed
+on each request. Deleting a paid order forgets the buckets it fell into.
+
+The memo is written in a short session of its own on the primary, so an
+analytics GET never commits the request's session or counts as a write (which
+would pin the browser to the primary; see db_routing.py).
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import Integer, cast, delete, func, literal_column
+from sqlalchemy.orm import Session
+
+from db_utils import insert_missing
+from models import db, Order, SalesBucket, SalesBucketPeriod
+from tz_utils import now_myt
+
+BUCKET_SIZES = {
+    '15min': timedelta(minutes=15),
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+    'week': timedelta(weeks=1),
+}
+# Largest number of buckets one request may span
+MAX_BUCKETS = 10000
+# A bucket only counts as closed this long after it ends, so checkouts still
+# committing at the boundary are not missed
+CLOSE_GRACE = timedelta(minutes=2)
+
+
+def bucket_floor(value, size):
+    """Start of the bucket containing a (naive MYT) datetime"""
+    if size == '15min':
+        return value.replace(minute=value.minute - value.minute % 15, second=0, microsecond=0)
+    if size == 'hour':
+        return value.replace(minute=0, second=0, microsecond=0)
+    day = value.replace(hour=0, minute=0, second=0, microsecond=0)
+    if size == 'week':
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def bucket_ceil(value, size):
+    """Start of the first bucket at or after a datetime"""
+    floor = bucket_floor(value, size)
+    return floor if floor == value else floor + BUCKET_SIZES[size]
+
+
+def bucket_starts(start, end, size):
+    """Bucket starts from start (aligned) up to, not including, end"""
+    step = BUCKET_SIZES[size]
+    current = start
+    while current < end:
+        yield current
+        current += step
+
+
+def _sale_time():
+    return func.coalesce(Order.paid_at, Order.order_time)
+
+
+def _bucket_expr(size):
+    """SQL expression for the bucket start of an order's sale time"""
+    sale_time = _sale_time()
+    if db.session.get_bind().dialect.name == 'postgresql':
+        if size == '15min':
+            quarter = func.floor(func.extract('minute', sale_time) / 15)
+            return func.date_trunc('hour', sale_time) + quarter * literal_column("interval '15 minutes'")
+        return func.date_trunc(size, sale_time)
+
+    # SQLite (development/testing): same buckets via strftime
+    if size == '15min':
+        minute = func.printf('%02d', cast(func.strftime('%M', sale_time), Integer) // 15 * 15)
+        return func.strftime('%Y-%m-%d %H:', sale_time).op('||')(minute).op('||')(':00')
+    if size == 'hour':
+        return func.strftime('%Y-%m-%d %H:00:00', sale_time)
+    if size == 'week':
+        return func.datetime(func.date(sale_time, 'weekday 0', '-6 days'))
+    return func.datetime(func.date(sale_time))
+
+
+def _as_datetime(value):
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value.replace(tzinfo=None) if value.tzinfo else value
+
+
+def _compute(size, start, end):
+    """[(bucket_start, menu_item_id, quantity, revenue, orders)] straight from paid orders"""
+    bucket = _bucket_expr(size)
+    rows = (
+        db.session.query(
+            bucket,
+            Order.menu_item_id,
+            func.coalesce(func.sum(Order.quantity), 0),
+            func.coalesce(func.sum(Order.total_price), 0),
+            func.count(Order.id),
+        )
+        .filter(
+            Order.payment_status == 'paid',
+            Order.menu_item_id.isnot(None),
+            _sale_time() >= start,
+            _sale_time() < end,
+        )
+        .group_by(bucket, Order.menu_item_id)
+        .all()
+    )
+    return [
+        (_as_datetime(bucket_start), item_id, int(quantity), Decimal(revenue), count)
+        for bucket_start, item_id, quantity, revenue, count in rows
+    ]
+
+
+def _memoize(size, start, end):
+    """Make sure every closed bucket in [start, end) has its totals stored; False if that failed"""
+    done = {
+        _as_datetime(value) for (value,) in db.session.query(SalesBucketPeriod.bucket_start).filter(
+            SalesBucketPeriod.bucket_size == size,
+            SalesBucketPeriod.bucket_start >= start,
+            SalesBucketPeriod.bucket_start < end,
+        )
+    }
+    missing = [b for b in bucket_starts(start, end, size) if b not in done]
+    if not missing:
+        return True
+
+    missing_set = set(missing)
+    rows = _compute(size, missing[0], missing[-1] + BUCKET_SIZES[size])
+    try:
+        with Session(db.engine) as memo, memo.begin():
+            insert_missing(SalesBucket, ('bucket_size', 'bucket_start', 'menu_item_id'), [
+                {'bucket_size': size, 'bucket_start': bucket_start, 'menu_item_id': item_id,
+                 'quantity': quantity, 'revenue': revenue, 'order_count': count}
+                for bucket_start, item_id, quantity, revenue, count in rows
+                if bucket_start in missing_set
+            ], session=memo)
+            insert_missing(SalesBucketPeriod, ('bucket_size', 'bucket_start'), [
+                {'bucket_size': size, 'bucket_start': bucket_start} for bucket_start in missing
+            ], session=memo)
+        return True
+    except Exception:
+        # Memoizing is best effort; the buckets are retried on the next request
+        return False
+
+
+def sales_rows(size, start, end):
+    """[(bucket_start, menu_item_id, quantity, revenue, orders)] for buckets covering start..end.
+
+    The range is widened to whole buckets. Closed buckets come from (and are added
+    to) the memo table; the open bucket is always computed fresh.
+    """
+    start = bucket_floor(start, size)
+    end = bucket_ceil(end, size)
+    if (end - start) / BUCKET_SIZES[size] > MAX_BUCKETS:
+        raise ValueError(f"Range too long for {size} buckets (max {MAX_BUCKETS} buckets)")
+
+    open_from = bucket_floor(now_myt().replace(tzinfo=None) - CLOSE_GRACE, size)
+    closed_end = max(start, min(end, open_from))
+
+    rows = []
+    if start < closed_end and not _memoize(size, start, closed_end):
+        rows.extend(_compute(size, start, closed_end))
+    elif start < closed_end:
+        rows.extend(
+            (_as_datetime(r.bucket_start), r.menu_item_id, r.quantity, Decimal(r.revenue), r.order_count)
+            for r in SalesBucket.query.filter(
+                SalesBucket.bucket_size == size,
+                SalesBucket.bucket_start >= start,
+                SalesBucket.bucket_start < closed_end,
+            )
+        )
+    if closed_end < end:
+        rows.extend(_compute(size, closed_end, end))
+    return rows
+
+
+def forget_sales_buckets(orders):
+    """Drop memoized buckets that contained the given (now deleted/refunded) orders"""
+    keys = defaultdict(set)
+    for order in orders:
+        sale_time = order.paid_at or order.order_time
+        if sale_time is None:
+            continue
+        sale_time = _as_datetime(sale_time)
+        for size in BUCKET_SIZES:
+            keys[size].add(bucket_floor(sale_time, size))
+    for size, starts in keys.items():
+        for model in (SalesBucket, SalesBucketPeriod):
+            db.session.execute(delete(model).where(
+                model.bucket_size == size, model.bucket_start.in_(starts)
+            ))
+
+
+def clear_sales_buckets(start=None, end=None):
+    """Drop memoized buckets overlapping start..end (dates, open-ended if None)"""
+    for model in (SalesBucket, SalesBucketPeriod):
+        stmt = delete(model)
+        if start is not None:
+            # Weekly buckets starting up to 6 days earlier overlap the range
+            stmt = stmt.where(model.bucket_start >= datetime.combine(start, datetime.min.time()) - timedelta(days=6))
+        if end is not None:
+            stmt = stmt.where(model.bucket_start < datetime.combine(end, datetime.min.time()) + timedelta(days=1))
+        db.session.execute(stmt)
+
+
+def sales_series(size, start, end, menu_item_id=None):
+    """Per-bucket totals (every bucket in range, zero-filled) and per-item totals"""
+    rows = sales_rows(size, start, end)
+    if menu_item_id is not None:
+        rows = [row for row in rows if row[1] == menu_item_id]
+
+    buckets = {
+        bucket_start: {'start': bucket_start.isoformat(), 'quantity': 0, 'revenue': 0.0, 'orders': 0}
+        for bucket_start in bucket_starts(bucket_floor(start, size), bucket_ceil(end, size), size)
+    }
+    items = defaultdict(lambda: {'quantity': 0, 'revenue': 0.0, 'orders': 0})
+    for bucket_start, item_id, quantity, revenue, count in rows:
+        for entry in (buckets[bucket_start], items[item_id]):
+            entry['quantity'] += quantity
+            entry['revenue'] += float(revenue)
+            entry['orders'] += count
+    return list(buckets.values()), dict(items)
+
+
+def weekday_hour_heatmap(start, end, metric='quantity'):
+    """7 x 24 grid (Monday first) of quantity, revenue or orders summed over hourly buckets"""
+    grid = [[0] * 24 for _ in range(7)]
+    index = {'quantity': 2, 'revenue': 3, 'orders': 4}[metric]
+    for row in sales_rows('hour', start, end):
+        bucket_start = row[0]
+        value = row[index]
+        grid[bucket_start.weekday()][bucket_start.hour] += float(value) if metric == 'revenue' else value
+    return grid
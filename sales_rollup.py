@@ -0,0 +1,94 @@
+"""
+Daily sales rollup.
+
+sales_daily keeps quantity, revenue and order count of paid orders per MYT day
+and menu item. Checkout adds to it and deleting/refunding a paid order subtracts
+from it, so the analytics pages aggregate days x items rows instead of every
+order ever placed. An order counts towards the day it was paid (its order time
+for orders paid before paid_at was recorded). rollup_sales() recomputes any
+date range from the orders themselves.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from sqlalchemy import delete, func, insert, select
+
+from db_utils import increment_counters
+from models import db, Order, MenuItem, SalesDaily
+
+
+def _sale_date(order):
+    return (order.paid_at or order.order_time).date()
+
+
+def record_sales(orders, sign=1):
+    """Add paid orders to the rollup, or subtract them with sign=-1"""
+    totals = defaultdict(lambda: [0, Decimal('0'), 0])
+    for order in orders:
+        if not order.menu_item_id or (order.paid_at or order.order_time) is None:
+            continue
+        entry = totals[(_sale_date(order), order.menu_item_id)]
+        entry[0] += sign * (order.quantity or 0)
+        entry[1] += sign * Decimal(order.total_price or 0)
+        entry[2] += sign
+    increment_counters(
+        SalesDaily,
+        ('sale_date', 'menu_item_id'),
+        [
+            {'sale_date': day, 'menu_item_id': item_id,
+             'quantity': quantity, 'revenue': revenue, 'order_count': count}
+            for (day, item_id), (quantity, revenue, count) in totals.items()
+        ],
+        ('quantity', 'revenue', 'order_count'),
+    )
+
+
+def rollup_sales(start=None, end=None):
+    """Recompute the rollup from paid orders for start..end (inclusive dates, open-ended if None).
+
+    Returns the number of rollup rows written.
+    """
+    sale_date = func.date(func.coalesce(Order.paid_at, Order.order_time))
+    source = (
+        select(
+            sale_date,
+            Order.menu_item_id,
+            func.coalesce(func.sum(Order.quantity), 0),
+            func.coalesce(func.sum(Order.total_price), 0),
+            func.count(Order.id),
+        )
+        .where(Order.payment_status == 'paid', Order.menu_item_id.isnot(None))
+        .group_by(sale_date, Order.menu_item_id)
+    )
+    existing = delete(SalesDaily)
+    if start is not None:
+        source = source.where(func.coalesce(Order.paid_at, Order.order_time) >= start)
+        existing = existing.where(SalesDaily.sale_date >= start)
+    if end is not None:
+        source = source.where(sale_date <= end)
+        existing = existing.where(SalesDaily.sale_date <= end)
+
+    db.session.execute(existing)
+    result = db.session.execute(
+        insert(SalesDaily).from_select(
+            ['sale_date', 'menu_item_id', 'quantity', 'revenue', 'order_count'], source
+        )
+    )
+    return result.rowcount
+
+
+def sales_by_item(group_by_price=False):
+    """[(item name[, price], quantity, revenue), ...] over all days, best sellers first"""
+    columns = [MenuItem.name]
+    if group_by_price:
+        columns.append(MenuItem.price)
+    quantity = func.sum(SalesDaily.quantity)
+    revenue = func.sum(SalesDaily.revenue)
+    query = (
+        db.session.query(*columns, quantity, revenue)
+        .join(MenuItem, MenuItem.id == SalesDaily.menu_item_id)
+        .filter(SalesDaily.order_count > 0)
+        .group_by(*columns)
+        .order_by((revenue if group_by_price else quantity).desc())
+    )
+    return query.all()
@@ -0,0 +1,110 @@
+"""
+Kitchen time-to-serve percentiles.
+
+Each completed order's time from payment to completion is counted into a
+log-spaced bucket (a DDSketch-style quantile sketch) for its menu item and for
+the MYT hour of day it was paid in. Bucket counts only ever grow, so they are
+updated with a single upsert per completion batch, and p50/p90/p99 are read
+back from a few hundred bucket rows instead of scanning order history. Every
+reported percentile is within RELATIVE_ACCURACY of the true value.
+"""
+import math
+from collections import Counter
+
+from db_utils import increment_counters
+from models import db, ServeTimeSketch, MenuItem
+from tz_utils import as_myt
+
+RELATIVE_ACCURACY = 0.02
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(GAMMA)
+# Times below this are counted in the lowest bucket
+MIN_SECONDS = 1.0
+PERCENTILES = (50, 90, 99)
+
+
+def bucket_for(seconds):
+    """Index of the sketch bucket covering a duration in seconds"""
+    return int(math.ceil(math.log(max(seconds, MIN_SECONDS)) / _LOG_GAMMA))
+
+
+def bucket_value(index):
+    """Representative duration of a bucket (relative error <= RELATIVE_ACCURACY)"""
+    return 2 * GAMMA ** index / (GAMMA + 1)
+
+
+def record_serve_times(orders):
+    """Add freshly completed orders to the item and hour-of-day sketches"""
+    counts = Counter()
+    for order in orders:
+        if order.paid_at is None or order.completed_at is None:
+            continue  # Paid before service timestamps were recorded
+        paid_at = as_myt(order.paid_at)
+        seconds = (as_myt(order.completed_at) - paid_at).total_seconds()
+        bucket = bucket_for(seconds)
+        if order.menu_item_id:
+            counts[('item', order.menu_item_id, bucket)] += 1
+        counts[('hour', paid_at.hour, bucket)] += 1
+    if counts:
+        _increment(counts)
+
+
+def _increment(counts):
+    """Add {(dimension, key, bucket): n} to the sketch table"""
+    increment_counters(
+        ServeTimeSketch,
+        ('dimension', 'key', 'bucket'),
+        [
+            {'dimension': dimension, 'key': key, 'bucket': bucket, 'count': n}
+            for (dimension, key, bucket), n in counts.items()
+        ],
+        ('count',),
+    )
+
+
+def _quantiles(buckets):
+    """{'count', 'p50', 'p90', 'p99'} from [(bucket, count), ...] sorted by bucket"""
+    total = sum(n for _, n in buckets)
+    result = {'count': total}
+    for pct in PERCENTILES:
+        rank = pct / 100 * (total - 1)
+        seen = 0
+        for bucket, n in buckets:
+            seen += n
+            if seen > rank:
+                result[f'p{pct}'] = round(bucket_value(bucket), 1)
+                break
+    return result
+
+
+def serve_time_percentiles(dimension):
+    """{key: {'count', 'p50', 'p90', 'p99'}} for every key of 'item' or 'hour', in seconds"""
+    rows = db.session.query(
+        ServeTimeSketch.key, ServeTimeSketch.bucket, ServeTimeSketch.count
+    ).filter(
+        ServeTimeSketch.dimension == dimension,
+        ServeTimeSketch.count > 0,
+    ).order_by(ServeTimeSketch.key, ServeTimeSketch.bucket).all()
+
+    by_key = {}
+    for key, bucket, n in rows:
+        by_key.setdefault(key, []).append((bucket, n))
+    return {key: _quantiles(buckets) for key, buckets in by_key.items()}
+
+
+def service_time_report():
+    """Per-item and per-hour time-to-serve percentiles, as JSON-ready lists"""
+    items = serve_time_percentiles('item')
+    names = dict(
+        db.session.query(MenuItem.id, MenuItem.name).filter(MenuItem.id.in_(items)).all()
+    ) if items else {}
+    return {
+        'items': [
+            {'menu_item_id': item_id, 'name': names.get(item_id), **stats}
+            for item_id, stats in sorted(items.items(), key=lambda kv: -kv[1]['count'])
+        ],
+        'hours': [
+            {'hour': hour, **stats}
+            for hour, stats in sorted(serve_time_percentiles('hour').items())
+        ],
+    }
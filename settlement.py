@@ -0,0 +1,182 @@
+"""
+End-of-day settlement.
+
+close_days() freezes one daily_settlement row per finished MYT day: sales from
+the sales_daily rollup, cash and QR top-ups and refunds, the total of all
+balances at midnight and the QR payments still pending then. Every figure is a
+range read on an indexed date/time column, so closing a day costs the same
+however much history there is. Rows are inserted with ON CONFLICT DO NOTHING
+and never updated, and each day commits on its own, so the batch can be re-run
+or resumed after a failure at any point.
+
+The balance at midnight is carried forward: the previous day's closing balance
+plus the day's ledger net (Adjustment rows from reconcile_balances.py only
+correct the ledger, so they are left out). Only the very first close is worked
+out backwards, as today's total less the ledger since. Balance changes made
+before every change wrote a ledger row cannot be recovered that way, so by
+default closing starts at the last reconcile (or yesterday) and older days are
+only backfilled on request. QR top-ups are the QR payments completed that day;
+every other top-up is cash.
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import and_, func, or_
+
+from balance_reconciliation import ADJUSTMENT_TYPE
+from db_utils import insert_missing
+from models import db, DailySettlement, Payment, SalesDaily, StudentInfo
+from transactions import Transaction
+from tz_utils import now_myt
+
+SETTLEMENT_FIELDS = (
+    'sales_revenue', 'sales_orders', 'sales_quantity', 'cash_topups', 'qr_topups',
+    'refunds', 'outstanding_balance', 'pending_payments', 'pending_amount',
+)
+
+
+def _day_bounds(day):
+    start = datetime.combine(day, datetime.min.time())
+    return start, start + timedelta(days=1)
+
+
+def _ledger_sum(*conditions):
+    return Decimal(db.session.query(func.coalesce(func.sum(Transaction.amount), 0)).filter(*conditions).scalar())
+
+
+def _balance_change(start, end=None):
+    """Net change to live account balances recorded in the ledger from start to end"""
+    # Ledger rows of deleted accounts are not part of any balance total
+    conditions = [
+        Transaction.transaction_time >= start,
+        Transaction.type != ADJUSTMENT_TYPE,
+        Transaction.student_id.in_(db.session.query(StudentInfo.id)),
+    ]
+    if end is not None:
+        conditions.append(Transaction.transaction_time < end)
+    return _ledger_sum(*conditions)
+
+
+def opening_balance(day):
+    """Total of all balances at the start of day: rolled forward from the last snapshot before it"""
+    start, _ = _day_bounds(day)
+    previous = DailySettlement.query.filter(DailySettlement.settle_date < day) \
+        .order_by(DailySettlement.settle_date.desc()).first()
+    if previous is not None:
+        return Decimal(previous.outstanding_balance) + _balance_change(_day_bounds(previous.settle_date)[1], start)
+    balance_now = db.session.query(func.coalesce(func.sum(StudentInfo.balance), 0)).scalar()
+    return Decimal(balance_now) - _balance_change(start)
+
+
+def compute_day(day, opening=None):
+    """Settlement figures for one MYT day (live; nothing is written)
+
+    opening is the total of all balances at the start of the day, if the caller
+    already knows it (e.g. the previous day's outstanding_balance).
+    """
+    start, end = _day_bounds(day)
+    revenue, orders, quantity = db.session.query(
+        func.coalesce(func.sum(SalesDaily.revenue), 0),
+        func.coalesce(func.sum(SalesDaily.order_count), 0),
+        func.coalesce(func.sum(SalesDaily.quantity), 0),
+    ).filter(SalesDaily.sale_date == day).one()
+
+    in_day = (Transaction.transaction_time >= start, Transaction.transaction_time < end)
+    all_topups = _ledger_sum(Transaction.type == 'Top-up', *in_day)
+    refunds = _ledger_sum(Transaction.type == 'Refund', *in_day)
+    # A completed QR payment credits its whole ringgit (see _credit_qr_payment)
+    qr_topups = sum((Decimal(int(amount)) for (amount,) in db.session.query(Payment.amount).filter(
+        Payment.status == 'completed', Payment.completed_at >= start, Payment.completed_at < end,
+    )), Decimal('0'))
+
+    if opening is None:
+        opening = opening_balance(day)
+
+    pending_count, pending_amount = db.session.query(
+        func.count(Payment.id), func.coalesce(func.sum(Payment.amount), 0)
+    ).filter(
+        Payment.created_at < end,
+        or_(Payment.status == 'pending',
+            and_(Payment.status == 'completed', Payment.completed_at >= end)),
+    ).one()
+
+    return {
+        'settle_date': day,
+        'sales_revenue': Decimal(revenue),
+        'sales_orders': int(orders),
+        'sales_quantity': int(quantity),
+        'cash_topups': all_topups - qr_topups,
+        'qr_topups': qr_topups,
+        'refunds': refunds,
+        'outstanding_balance': Decimal(opening) + _balance_change(start, end),
+        'pending_payments': pending_count,
+        'pending_amount': Decimal(pending_amount),
+    }
+
+
+def _default_start(yesterday):
+    """First day to close when nothing is closed yet: the day of the last reconcile, else yesterday"""
+    reconciled = db.session.query(func.max(Transaction.transaction_time)) \
+        .filter(Transaction.type == ADJUSTMENT_TYPE).scalar()
+    return min(reconciled.date(), yesterday) if reconciled else yesterday
+
+
+def close_days(until=None, start=None):
+    """Close every unclosed day up to until (default yesterday); returns the days closed.
+
+    Resumes after the last closed day. The first run starts at the last reconcile
+    (or yesterday); pass start to backfill older days, whose balances are only as
+    good as the ledger was then. Days that have not finished yet are never closed.
+    """
+    yesterday = now_myt().date() - timedelta(days=1)
+    until = min(until or yesterday, yesterday)
+    if start is None:
+        last = db.session.query(func.max(DailySettlement.settle_date)).scalar()
+        start = last + timedelta(days=1) if last else _default_start(yesterday)
+
+    closed = []
+    opening = None
+    day = start
+    while day <= until:
+        row = compute_day(day, opening)
+        row['closed_at'] = now_myt()
+        insert_missing(DailySettlement, ('settle_date',), [row])
+        db.session.commit()
+        # Carry the frozen figure forward, in case the day was already closed
+        opening = db.session.get(DailySettlement, day).outstanding_balance
+        closed.append(day)
+        day += timedelta(days=1)
+    return closed
+
+
+def _as_dict(snapshot):
+    row = {field: getattr(snapshot, field) for field in SETTLEMENT_FIELDS}
+    row['settle_date'] = snapshot.settle_date
+    return row
+
+
+def settlement_range(start, end):
+    """Per-day figures for start..end (dates, inclusive), oldest first.
+
+    Closed days come from their frozen snapshot; days not closed yet (today, or
+    any gap) are computed live and marked closed=False.
+    """
+    snapshots = {
+        s.settle_date: s for s in DailySettlement.query.filter(
+            DailySettlement.settle_date >= start, DailySettlement.settle_date <= end
+        )
+    }
+    days = []
+    opening = None
+    day = start
+    while day <= end:
+        if day in snapshots:
+            row = _as_dict(snapshots[day])
+            row['closed'] = True
+        else:
+            row = compute_day(day, opening)
+            row['closed'] = False
+        days.append(row)
+        opening = row['outstanding_balance']
+        day += timedelta(days=1)
+    return days
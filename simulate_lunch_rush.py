@@ -0,0 +1,104 @@
+"""
+Script to simulate the lunch rush under different staffing configurations
+Arrivals and baskets are resampled from recent paid tickets in the break window
+(the busiest 30 minutes of the day unless --start/--end are given). Every
+combination of the --kiosks, --cashiers and --cooks values is run on the same
+simulated breaks, spread over all CPU cores:
+
+    python simulate_lunch_rush.py
+    python simulate_lunch_rush.py --start 10:00 --end 10:30 --runs 5000
+    python simulate_lunch_rush.py --kiosks 2,3,4 --cashiers 1,2 --cooks 1,2 --demand 1.2
+    python simulate_lunch_rush.py --cooks 2 --stall-cooks "Noodles=3"
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+from datetime import time as clock_time
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app
+from rush_simulation import RUSH_HISTORY_DAYS, busiest_window, load_rush_profile, run_scenarios
+
+def counts(value):
+    """Comma-separated list of positive integers"""
+    try:
+        values = [int(v) for v in value.split(',')]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected numbers like 1,2,3, got '{value}'")
+    if any(v < 1 for v in values):
+        raise argparse.ArgumentTypeError("counts must be at least 1")
+    return values
+
+def parse_args():
+    """Command line: break window, staffing options and run count"""
+    parser = argparse.ArgumentParser(description="Simulate lunch-rush queues for staffing options")
+    parser.add_argument('--start', type=clock_time.fromisoformat, help="Break start, HH:MM")
+    parser.add_argument('--end', type=clock_time.fromisoformat, help="Break end, HH:MM")
+    parser.add_argument('--days', type=int, default=RUSH_HISTORY_DAYS, help="Days of history to sample from")
+    parser.add_argument('--kiosks', type=counts, default=[2], help="Ordering kiosks to try, e.g. 2,3")
+    parser.add_argument('--cashiers', type=counts, default=[1], help="Payment counters to try, e.g. 1,2")
+    parser.add_argument('--cooks', type=counts, default=[1], help="Cooks per stall to try, e.g. 1,2")
+    parser.add_argument('--stall-cooks', default='', help="Fixed cooks for named stalls, e.g. \"Noodles=3,Drinks=1\"")
+    parser.add_argument('--demand', type=float, default=1.0, help="Scale the number of students, e.g. 1.2")
+    parser.add_argument('--runs', type=int, default=2000, help="Simulated breaks per configuration")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: all cores)")
+    return parser.parse_args()
+
+def main():
+    """Build the profile, run every configuration and print a summary per stage"""
+    args = parse_args()
+    try:
+        fixed = dict((name.strip(), int(n)) for name, n in
+                     (pair.split('=') for pair in args.stall_cooks.split(',') if pair.strip()))
+    except ValueError:
+        print("❌ --stall-cooks must look like \"Noodles=3,Drinks=1\"")
+        sys.exit(1)
+
+    with app.app_context():
+        if args.start and args.end:
+            start, end = args.start, args.end
+        else:
+            window = busiest_window(args.days)
+            if window is None:
+                print(f"❌ No paid tickets in the last {args.days} days to simulate from")
+                sys.exit(1)
+            start, end = window
+        profile = load_rush_profile(start, end, args.days)
+
+    print("=" * 60)
+    print(f"🍱 Simulating the {start:%H:%M}-{end:%H:%M} rush")
+    print("=" * 60)
+    if not len(profile['offsets']):
+        print("❌ No paid tickets in that window to simulate from")
+        sys.exit(1)
+    print(f"{len(profile['offsets'])} tickets over {len(profile['day_counts'])} day(s), "
+          f"{profile['day_counts'].mean():.0f} per break on average")
+
+    configs = [
+        {'kiosks': kiosks, 'cashiers': cashiers, 'cooks': {'*': cooks, **fixed}, 'demand': args.demand}
+        for kiosks, cashiers, cooks in itertools.product(args.kiosks, args.cashiers, args.cooks)
+    ]
+    started = time.perf_counter()
+    results = run_scenarios(profile, configs, runs=args.runs, workers=args.workers)
+    print(f"Ran {args.runs} break(s) x {len(configs)} configuration(s) in {time.perf_counter() - started:.1f}s")
+
+    for result in results:
+        config = result['config']
+        print()
+        print(f"🧑‍🍳 {config['kiosks']} kiosk(s), {config['cashiers']} cashier(s), "
+              f"{config['cooks']['*']} cook(s) per stall" + (f" ({args.stall_cooks})" if fixed else ""))
+        print(f"   {'stage':<24}{'wait p50':>9}{'p90':>8}{'p99':>8}{'queue p90':>11}{'peak':>7}")
+        for stage, s in result['stages'].items():
+            queue = f"{s['queue_p90']:>11}{s['peak_queue_max']:>7}" if 'queue_p90' in s else ""
+            print(f"   {stage:<24}{s['wait_p50']:>8.0f}s{s['wait_p90']:>7.0f}s{s['wait_p99']:>7.0f}s{queue}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+Spending rollup by school, grade and class.
+
+spending_daily keeps revenue, quantity, order count and number of buying
+students per MYT day for the whole school, every grade and every class, and is
+maintained next to sales_daily: checkout adds to it, deleting/refunding a paid
+order subtracts from it. A student counts as a buyer on a day while they have
+at least one paid order that day. Orders count towards the class the student
+was in when they paid, which checkout stamps on the order (order.class_id), so
+moving a student between classes leaves their past spending where it was;
+rollup_spending() recomputes a date range from the orders themselves.
+
+Drill-down pages read a few rows per group and day from this table instead of
+joining orders to students.
+"""
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import delete, func, insert, literal, select
+
+from db_utils import increment_counters
+from models import db, Grade, Order, SchoolClass, SpendingDaily, StudentInfo
+
+SPENDING_LEVELS = ('school', 'grade', 'class')
+# Children of each level in the drill-down
+CHILD_LEVEL = {'school': 'grade', 'grade': 'class'}
+UNASSIGNED = 0
+
+
+def _sale_date(order):
+    return (order.paid_at or order.order_time).date()
+
+
+def _group_keys(class_id, grade_of):
+    class_id = class_id or UNASSIGNED
+    return (('school', 0), ('grade', grade_of.get(class_id, UNASSIGNED)), ('class', class_id))
+
+
+def _paid_orders_by_group(student_id, day, grade_of):
+    """Counter of the student's paid orders on day per (dimension, key) group"""
+    start = datetime.combine(day, datetime.min.time())
+    paid_at = func.coalesce(Order.paid_at, Order.order_time)
+    by_class = db.session.query(Order.class_id, func.count(Order.id)).filter(
+        Order.student_id == student_id,
+        Order.payment_status == 'paid',
+        Order.menu_item_id.isnot(None),
+        paid_at >= start,
+        paid_at < start + timedelta(days=1),
+    ).group_by(Order.class_id)
+    counts = Counter()
+    for class_id, count in by_class:
+        for group in _group_keys(class_id, grade_of):
+            counts[group] += count
+    return counts
+
+
+def record_spending(orders, sign=1):
+    """Add paid orders to the school/grade/class rollup, or subtract them with sign=-1.
+
+    Call after the orders are marked paid (or deleted) in the session. Each order
+    counts towards its class_id, stamped at checkout.
+    """
+    orders = [o for o in orders if o.menu_item_id and (o.paid_at or o.order_time) is not None]
+    if not orders:
+        return
+    grade_of = dict(db.session.query(SchoolClass.id, SchoolClass.grade_id))
+
+    totals = defaultdict(lambda: [Decimal('0'), 0, 0, 0])
+    for order in orders:
+        for dimension, key in _group_keys(order.class_id, grade_of):
+            entry = totals[(_sale_date(order), dimension, key)]
+            entry[0] += sign * Decimal(order.total_price or 0)
+            entry[1] += sign * (order.quantity or 0)
+            entry[2] += sign
+
+    # A student starts (or stops) being a buyer of a group for the day when this
+    # batch is their first (or last) paid order in that group that day
+    batches = defaultdict(Counter)
+    for order in orders:
+        if order.student_id:
+            for group in _group_keys(order.class_id, grade_of):
+                batches[(order.student_id, _sale_date(order))][group] += 1
+    for (student_id, day), in_batch in batches.items():
+        paid = _paid_orders_by_group(student_id, day, grade_of)
+        for (dimension, key), count in in_batch.items():
+            if paid[(dimension, key)] - (count if sign > 0 else 0) == 0:
+                totals[(day, dimension, key)][3] += sign
+
+    increment_counters(
+        SpendingDaily,
+        ('sale_date', 'dimension', 'key'),
+        [
+            {'sale_date': day, 'dimension': dimension, 'key': key,
+             'revenue': revenue, 'quantity': quantity, 'order_count': count, 'buyers': buyers}
+            for (day, dimension, key), (revenue, quantity, count, buyers) in totals.items()
+        ],
+        ('revenue', 'quantity', 'order_count', 'buyers'),
+    )
+
+
+def rollup_spending(start=None, end=None):
+    """Recompute the rollup from paid orders for start..end (inclusive dates, open-ended if None).
+
+    Returns the number of rollup rows written.
+    """
+    paid_at = func.coalesce(Order.paid_at, Order.order_time)
+    sale_date = func.date(paid_at)
+    keys = {
+        'school': literal(0),
+        'grade': func.coalesce(SchoolClass.grade_id, UNASSIGNED),
+        'class': func.coalesce(Order.class_id, UNASSIGNED),
+    }
+    existing = delete(SpendingDaily)
+    if start is not None:
+        existing = existing.where(SpendingDaily.sale_date >= start)
+    if end is not None:
+        existing = existing.where(SpendingDaily.sale_date <= end)
+    db.session.execute(existing)
+
+    written = 0
+    for dimension, key in keys.items():
+        source = (
+            select(
+                sale_date,
+                literal(dimension),
+                key,
+                func.coalesce(func.sum(Order.total_price), 0),
+                func.coalesce(func.sum(Order.quantity), 0),
+                func.count(Order.id),
+                func.count(func.distinct(Order.student_id)),
+            )
+            .select_from(Order)
+            .outerjoin(SchoolClass, SchoolClass.id == Order.class_id)
+            .where(Order.payment_status == 'paid', Order.menu_item_id.isnot(None))
+            .group_by(sale_date, key)
+        )
+        if start is not None:
+            source = source.where(paid_at >= start)
+        if end is not None:
+            source = source.where(sale_date <= end)
+        result = db.session.execute(
+            insert(SpendingDaily).from_select(
+                ['sale_date', 'dimension', 'key', 'revenue', 'quantity', 'order_count', 'buyers'], source
+            )
+        )
+        written += result.rowcount
+    return written
+
+
+def _enrolment(level):
+    """{key: number of students} for the groups of one level"""
+    students = db.session.query(StudentInfo).filter(StudentInfo.role == 'student')
+    if level == 'school':
+        return {0: students.count()}
+    if level == 'class':
+        rows = students.with_entities(func.coalesce(StudentInfo.class_id, UNASSIGNED), func.count(StudentInfo.id)) \
+            .group_by(func.coalesce(StudentInfo.class_id, UNASSIGNED))
+    else:
+        rows = students.outerjoin(SchoolClass, SchoolClass.id == StudentInfo.class_id) \
+            .with_entities(func.coalesce(SchoolClass.grade_id, UNASSIGNED), func.count(StudentInfo.id)) \
+            .group_by(func.coalesce(SchoolClass.grade_id, UNASSIGNED))
+    return dict(rows.all())
+
+
+def _group_names(level):
+    """{key: display name} for one level, in display order"""
+    if level == 'school':
+        return {0: 'Whole school'}
+    if level == 'grade':
+        grades = db.session.query(Grade.id, Grade.name).order_by(Grade.display_order, Grade.name)
+        return {**dict(grades), UNASSIGNED: 'No grade'}
+    classes = db.session.query(SchoolClass.id, SchoolClass.name, Grade.name).join(Grade) \
+        .order_by(Grade.display_order, Grade.name, SchoolClass.name)
+    return {**{class_id: f"{grade} {name}" for class_id, name, grade in classes}, UNASSIGNED: 'No class'}
+
+
+def _totals(level, start, end, keys=None):
+    """{key: totals} summed over start..end for one level"""
+    query = db.session.query(
+        SpendingDaily.key,
+        func.sum(SpendingDaily.revenue), func.sum(SpendingDaily.quantity),
+        func.sum(SpendingDaily.order_count), func.sum(SpendingDaily.buyers),
+    ).filter(
+        SpendingDaily.dimension == level,
+        SpendingDaily.sale_date >= start,
+        SpendingDaily.sale_date <= end,
+    )
+    if keys is not None:
+        query = query.filter(SpendingDaily.key.in_(keys))
+    return {
+        key: {'revenue': Decimal(revenue or 0), 'quantity': int(quantity or 0),
+              'order_count': int(orders or 0), 'buyer_days': int(buyers or 0)}
+        for key, revenue, quantity, orders, buyers in query.group_by(SpendingDaily.key)
+    }
+
+
+def _describe(key, name, totals, enrolled, trading_days):
+    totals = totals or {'revenue': Decimal('0'), 'quantity': 0, 'order_count': 0, 'buyer_days': 0}
+    possible = enrolled * trading_days
+    return {
+        'id': key,
+        'name': name,
+        'enrolled': enrolled,
+        **totals,
+        'revenue_per_student': (totals['revenue'] / enrolled).quantize(Decimal('0.01')) if enrolled else None,
+        'participation': round(totals['buyer_days'] / possible, 3) if possible else None,
+    }
+
+
+def spending_breakdown(level, key, start, end):
+    """Totals for one school/grade/class over start..end, its children and its daily series.
+
+    participation is buyer-days / (enrolled students x trading days). Raises
+    ValueError for an unknown level.
+    """
+    if level not in SPENDING_LEVELS:
+        raise ValueError(f"level must be one of: {', '.join(SPENDING_LEVELS)}")
+    trading_days = db.session.query(func.count(SpendingDaily.sale_date)).filter(
+        SpendingDaily.dimension == 'school', SpendingDaily.key == 0,
+        SpendingDaily.sale_date >= start, SpendingDaily.sale_date <= end,
+        SpendingDaily.order_count > 0,
+    ).scalar()
+
+    names = _group_names(level)
+    group = _describe(key, names.get(key, 'Unknown'), _totals(level, start, end, [key]).get(key),
+                      _enrolment(level).get(key, 0), trading_days)
+
+    children = []
+    child_level = CHILD_LEVEL.get(level)
+    if child_level:
+        if level == 'school':
+            child_keys = None
+        elif key == UNASSIGNED:
+            child_keys = [UNASSIGNED]
+        else:
+            child_keys = [c for (c,) in db.session.query(SchoolClass.id).filter(SchoolClass.grade_id == key)]
+        child_names = _group_names(child_level)
+        child_totals = _totals(child_level, start, end, child_keys)
+        enrolment = _enrolment(child_level)
+        position = {child: i for i, child in enumerate(child_names)}
+        listed = child_keys if child_keys is not None else set(child_names) | set(child_totals)
+        children = [
+            _describe(child, child_names.get(child, 'Unknown'), child_totals.get(child), enrolment.get(child, 0), trading_days)
+            for child in sorted(listed, key=lambda c: position.get(c, len(position)))
+            # Only list the unassigned bucket when someone is in it
+            if child != UNASSIGNED or child in child_totals or enrolment.get(child)
+        ]
+
+    series = [
+        {'date': day, 'revenue': Decimal(revenue), 'order_count': orders, 'buyers': buyers}
+        for day, revenue, orders, buyers in db.session.query(
+            SpendingDaily.sale_date, SpendingDaily.revenue, SpendingDaily.order_count, SpendingDaily.buyers
+        ).filter(
+            SpendingDaily.dimension == level, SpendingDaily.key == key,
+            SpendingDaily.sale_date >= start, SpendingDaily.sale_date <= end,
+        ).order_by(SpendingDaily.sale_date)
+    ]
+    return {
+        'level': level,
+        'child_level': child_level,
+        'trading_days': trading_days,
+        'group': group,
+        'children': children,
+        'series': series,
+    }
@@ -0,0 +1,110 @@
+// Date-range trend chart and hour-by-weekday heatmap for the analytics pages.
+// Expects #sales-range-form (start, end, bucket), #salesTrendChart and #sales-heatmap.
+(function () {
+  const HOURS = Array.from({ length: 24 }, (_, h) => h);
+
+  function isoDate(date) {
+    const offset = date.getTimezoneOffset() * 60000;
+    return new Date(date.getTime() - offset).toISOString().slice(0, 10);
+  }
+
+  function bucketLabel(start, bucket) {
+    const date = new Date(start);
+    if (bucket === 'day' || bucket === 'week') {
+      return date.toLocaleDateString([], { day: 'numeric', month: 'short' });
+    }
+    return date.toLocaleString([], { day: 'numeric', month: 'short', hour: '2-digit', minute: '2-digit' });
+  }
+
+  function formatValue(value, metric) {
+    return metric === 'revenue' ? 'RM ' + value.toFixed(2) : String(value);
+  }
+
+  function renderHeatmap(container, data, metric) {
+    const max = Math.max(1, ...data.grid.flat());
+    const header = HOURS.map(h => `<th class="px-1 py-1 text-xs font-medium text-gray-500">${h}</th>`).join('');
+    const rows = data.grid.map((values, day) => {
+      const cells = values.map((value, hour) => {
+        const alpha = value ? (0.15 + 0.85 * value / max).toFixed(2) : 0;
+        const title = `${data.weekdays[day]} ${hour}:00 - ${formatValue(value, metric)}`;
+        return `<td title="${title}" class="w-6 h-6 border border-white rounded" style="background-color: rgba(16, 185, 129, ${alpha})"></td>`;
+      }).join('');
+      return `<tr><th class="pr-2 text-xs font-medium text-gray-600 text-left">${data.weekdays[day]}</th>${cells}</tr>`;
+    }).join('');
+    container.innerHTML = `
+      <table class="border-separate" style="border-spacing: 2px">
+        <thead><tr><th></th>${header}</tr></thead>
+        <tbody>${rows}</tbody>
+      </table>
+    `;
+  }
+
+  window.initSalesAnalytics = function (options) {
+    const metric = options.metric || 'quantity';
+    const form = document.getElementById('sales-range-form');
+    const heatmap = document.getElementById('sales-heatmap');
+    const error = document.getElementById('sales-range-error');
+    const chartCtx = document.getElementById('salesTrendChart').getContext('2d');
+    let trendChart = null;
+
+    const today = new Date();
+    const weekAgo = new Date(today.getTime() - 6 * 86400000);
+    form.elements.start.value = form.elements.start.value || isoDate(weekAgo);
+    form.elements.end.value = form.elements.end.value || isoDate(today);
+
+    async function load() {
+      const params = new URLSearchParams({
+        start: form.elements.start.value,
+        end: form.elements.end.value,
+      });
+      const salesParams = new URLSearchParams(params);
+      salesParams.set('bucket', form.elements.bucket.value);
+      params.set('metric', metric);
+
+      const [salesResponse, heatmapResponse] = await Promise.all([
+        fetch('/api/analytics/sales?' + salesParams.toString(), { headers: { 'Accept': 'application/json' } }),
+        fetch('/api/analytics/heatmap?' + params.toString(), { headers: { 'Accept': 'application/json' } }),
+      ]);
+      const sales = await salesResponse.json();
+      const heat = await heatmapResponse.json();
+      if (!salesResponse.ok || !heatmapResponse.ok) {
+        error.textContent = sales.error || heat.error || 'Failed to load analytics';
+        error.classList.remove('hidden');
+        return;
+      }
+      error.classList.add('hidden');
+
+      const labels = sales.series.map(entry => bucketLabel(entry.start, sales.bucket));
+      const values = sales.series.map(entry => entry[metric]);
+      if (trendChart) {
+        trendChart.destroy();
+      }
+      trendChart = new Chart(chartCtx, {
+        type: 'bar',
+        data: {
+          labels: labels,
+          datasets: [{
+            label: options.label,
+            data: values,
+            backgroundColor: 'rgba(16, 185, 129, 0.7)',
+            borderColor: 'rgba(5, 150, 105, 1)',
+            borderWidth: 1,
+          }],
+        },
+        options: {
+          responsive: true,
+          maintainAspectRatio: false,
+          plugins: { legend: { display: false } },
+          scales: { y: { beginAtZero: true } },
+        },
+      });
+      renderHeatmap(heatmap, heat, metric);
+    }
+
+    form.addEventListener('submit', function (evt) {
+      evt.preventDefault();
+      load().catch(console.error);
+    });
+    load().catch(console.error);
+  };
+})();
@@ -1,12 +1,22 @@
+from decimal import Decimal
+
 from models import db  # Make sure db is initialized in models.py
-from sqlalchemy import Numeric
+from sqlalchemy import Numeric, insert
 from tz_utils import now_myt
 
+CENT = Decimal('0.01')
+
 class Transaction(db.Model):
     __tablename__ = 'transaction'
+    # Newest-first ledger pages, optionally filtered by type or student (see ledger.py)
+    __table_args__ = (
+        db.Index('ix_transaction_time_id', 'transaction_time', 'id'),
+        db.Index('ix_transaction_type_time_id', 'type', 'transaction_time', 'id'),
+        db.Index('ix_transaction_student_time_id', 'student_id', 'transaction_time', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    student_id = db.Column(db.Integer, db.ForeignKey('student_info.id'), nullable=True, index=True)  # Nullable for system transactions
+    student_id = db.Column(db.Integer, db.ForeignKey('student_info.id'), nullable=True)  # Nullable for system transactions
     type = db.Column(db.String(50), nullable=False)  # e.g. "Top-up", "Payment"
     amount = db.Column(Numeric(10, 2), nullable=False)
     description = db.Column(db.Text)  # e.g. "Student top-up", "Food order - Nasi Lemak"
@@ -17,3 +27,65 @@ class Transaction(db.Model):
 
     def __repr__(self):
         return f"<Transaction {self.type} | RM{self.amount} | {self.transaction_time}>"
+
+
+class TransactionLine(db.Model):
+    """What a ledger entry paid for, refunded or credited: one row per order, top-up or rounding"""
+    __tablename__ = 'transaction_line'
+    # Item-level reports aggregate lines per item over a transaction time range
+    __table_args__ = (
+        db.Index('ix_transaction_line_item_transaction', 'menu_item_id', 'transaction_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    transaction_id = db.Column(db.Integer, db.ForeignKey('transaction.id'), nullable=False, index=True)
+    kind = db.Column(db.String(20), nullable=False)  # "item", "refund", "topup" or "rounding"
+    # Not foreign keys: the line outlives orders deleted after a refund and retired menu items
+    order_id = db.Column(db.Integer, index=True)
+    menu_item_id = db.Column(db.Integer)
+    quantity = db.Column(db.Integer, nullable=False, default=1)
+    unit_price = db.Column(Numeric(10, 2), nullable=False)
+    amount = db.Column(Numeric(10, 2), nullable=False)  # Signed like the transaction's amount
+
+    transaction = db.relationship('Transaction', backref='lines')
+
+    def __repr__(self):
+        return f"<TransactionLine {self.kind} | {self.quantity}x item {self.menu_item_id} | RM{self.amount}>"
+
+
+def order_line(order, amount, kind="item"):
+    """Line dict for one order paid (negative amount) or refunded (positive amount)"""
+    quantity = order.quantity or 0
+    unit_price = Decimal(order.total_price or 0) / quantity if quantity else Decimal(order.total_price or 0)
+    return {
+        'kind': kind,
+        'order_id': order.id,
+        'menu_item_id': order.menu_item_id,
+        'quantity': quantity,
+        'unit_price': unit_price.quantize(CENT),
+        'amount': Decimal(amount).quantize(CENT),
+    }
+
+
+def checkout_lines(orders, charged):
+    """Item lines for a checkout, plus a rounding line when the charge was rounded to whole RM"""
+    lines = [order_line(order, -Decimal(order.total_price or 0)) for order in orders]
+    rounding = -Decimal(charged) - sum((line['amount'] for line in lines), Decimal('0'))
+    if rounding:
+        lines.append({'kind': 'rounding', 'order_id': None, 'menu_item_id': None,
+                      'quantity': 1, 'unit_price': rounding.quantize(CENT), 'amount': rounding.quantize(CENT)})
+    return lines
+
+
+def topup_line(amount):
+    amount = Decimal(amount).quantize(CENT)
+    return {'kind': 'topup', 'order_id': None, 'menu_item_id': None, 'quantity': 1, 'unit_price': amount, 'amount': amount}
+
+
+def add_transaction_lines(transaction, lines):
+    """Write a transaction's lines in one multi-row INSERT (flushes the transaction for its id)"""
+    if not lines:
+        return
+    if transaction.id is None:
+        db.session.flush()
+    db.session.execute(insert(TransactionLine), [{'transaction_id': transaction.id, **line} for line in lines])
@@ -8,3 +8,9 @@ def now_myt():
     """Return the current timezone-aware datetime in GMT+8."""
     return datetime.now(MYT)
 
+
+def as_myt(value):
+    """Attach GMT+8 to a naive datetime read back from the database (stored as MYT wall time)."""
+    if value is None or value.tzinfo is not None:
+        return value
+    return value.replace(tzinfo=MYT)
@@ -0,0 +1,48 @@
+"""
+Script to update the co-purchase (bought together) counts from checkout baskets
+Only tickets newer than the last run are read, so it is cheap to run every few
+minutes. With --rebuild, all counts are dropped and recounted from full history
+(orders from before pickup tickets count as one basket per student and day):
+
+    python update_co_purchases.py
+    python update_co_purchases.py --rebuild
+"""
+import os
+import sys
+import time
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db
+from co_purchase import update_co_purchases, top_pairs
+
+def main():
+    """Count new baskets in a single transaction and show the strongest pairs"""
+    rebuild = '--rebuild' in sys.argv[1:]
+
+    print("=" * 60)
+    print("🛒 Updating co-purchase counts")
+    print("=" * 60)
+
+    with app.app_context():
+        try:
+            started = time.perf_counter()
+            baskets = update_co_purchases(reset=rebuild)
+            elapsed = time.perf_counter() - started
+            print(f"✅ Counted {baskets} new basket(s) in {elapsed:.2f}s.")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Co-purchase update failed: {str(e)}")
+            sys.exit(1)
+
+        for pair in top_pairs(limit=5):
+            print(f"   {pair['item_a']['name']} + {pair['item_b']['name']}: "
+                  f"{pair['baskets']} basket(s), lift {pair['lift']:.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,7 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from app import app, db
 from models import StudentInfo
+from kitchen_queue import refresh_student
 
 def validate_ic_format(value):
     """Validate IC format - allows Unicode characters, symbols, etc."""
@@ -89,6 +90,7 @@ def update_student_ic_pin():
                 return
             
             student.ic_number = new_ic
+            refresh_student(student)
             print(f"✅ IC number updated to '{new_ic}'")
         
         # Update PIN
@@ -244,6 +246,7 @@ def bulk_update_students():
             
             student.ic_number = new_ic
             student.set_pin(new_pin)
+            refresh_student(student)
             success_count += 1
             print(f"✅ Updated student {student_id} ({student.name})")
             
@@ -0,0 +1,191 @@
+"""
+Nightly wallet anomaly scoring.
+
+load_wallet_features() reads the last ANOMALY_WINDOW_DAYS of the ledger (plus
+ANOMALY_BASELINE_DAYS before it for each student's usual spend) with a single
+grouped aggregate, giving one row per student who had any wallet activity in
+the window. score_features() turns those rows into a feature vector per
+student:
+
+    spend_per_day    RM spent per day in the window
+    spend_jump       log ratio of that to the student's own usual daily spend
+    refund_ratio     refunds per payment
+    topups           number of top-ups
+    largest_topup    largest single top-up (RM)
+    off_hours_share  share of payments/refunds outside school hours
+
+and scores every column at once with robust z-scores (distance from the school
+median in units of the median absolute deviation), so a handful of extreme
+students cannot hide themselves by inflating the spread. Each feature has a
+floor on its spread and a minimum amount of evidence (e.g. at least two
+refunds), so quiet features do not flag students for a single event.
+Top-ups are excluded from off-hours activity because parents top up in the
+evening. Students whose highest z-score reaches ANOMALY_Z_THRESHOLD are
+written to wallet_anomaly for an admin to review.
+"""
+import warnings
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from sqlalchemy import func, insert, or_
+
+from models import db, WalletAnomaly
+from transactions import Transaction
+from tz_utils import now_myt
+
+ANOMALY_WINDOW_DAYS = 7
+ANOMALY_BASELINE_DAYS = 28
+ANOMALY_Z_THRESHOLD = 3.5
+# Wallet activity between these MYT hours counts as school hours
+SCHOOL_HOURS = (6, 19)
+MIN_REFUNDS = 2
+MIN_OFF_HOURS = 2
+
+FEATURES = ('spend_per_day', 'spend_jump', 'refund_ratio', 'topups', 'largest_topup', 'off_hours_share')
+FEATURE_LABELS = {
+    'spend_per_day': 'High spending',
+    'spend_jump': 'Spending burst',
+    'refund_ratio': 'Repeated refunds',
+    'topups': 'Frequent top-ups',
+    'largest_topup': 'Large top-up',
+    'off_hours_share': 'Off-hours activity',
+}
+# Smallest spread a feature is scaled by, in its own units
+MIN_SPREAD = np.array([1.0, 0.25, 0.05, 1.0, 10.0, 0.05])
+
+# Modified z-score constants: MAD and mean absolute deviation to standard deviation
+MAD_SCALE = 1.4826
+MEAN_AD_SCALE = 1.2533
+
+
+def load_wallet_features(day, window_days=ANOMALY_WINDOW_DAYS, baseline_days=ANOMALY_BASELINE_DAYS):
+    """(student_ids, raw[students, 8]) ledger aggregates for the window ending on day (inclusive)
+
+    Columns: recent spend, baseline spend, payments, refunds, top-ups, largest top-up,
+    off-hours payments/refunds, all payments/refunds.
+    """
+    end = datetime.combine(day + timedelta(days=1), time())
+    window_start = end - timedelta(days=window_days)
+    recent = Transaction.transaction_time >= window_start
+    payment = Transaction.type == 'Payment'
+    refund = Transaction.type == 'Refund'
+    topup = Transaction.type == 'Top-up'
+    hour = func.extract('hour', Transaction.transaction_time)
+    off_hours = or_(hour < SCHOOL_HOURS[0], hour >= SCHOOL_HOURS[1])
+
+    rows = db.session.query(
+        Transaction.student_id,
+        func.coalesce(func.sum(-Transaction.amount).filter(payment, recent), 0),
+        func.coalesce(func.sum(-Transaction.amount).filter(payment, ~recent), 0),
+        func.count(Transaction.id).filter(payment, recent),
+        func.count(Transaction.id).filter(refund, recent),
+        func.count(Transaction.id).filter(topup, recent),
+        func.coalesce(func.max(Transaction.amount).filter(topup, recent), 0),
+        func.count(Transaction.id).filter(or_(payment, refund), recent, off_hours),
+        func.count(Transaction.id).filter(or_(payment, refund), recent),
+    ).filter(
+        Transaction.student_id.isnot(None),
+        Transaction.transaction_time >= window_start - timedelta(days=baseline_days),
+        Transaction.transaction_time < end,
+    ).group_by(Transaction.student_id) \
+        .having(func.count(Transaction.id).filter(recent) > 0) \
+        .all()
+
+    student_ids = np.array([row[0] for row in rows], dtype=np.int64)
+    raw = np.array([[float(value) for value in row[1:]] for row in rows], dtype=np.float64).reshape(len(rows), 8)
+    return student_ids, raw
+
+
+def build_features(raw, window_days=ANOMALY_WINDOW_DAYS, baseline_days=ANOMALY_BASELINE_DAYS):
+    """(features[students, 6], population[students, 6], evidence[students, 6]) from load_wallet_features() rows
+
+    population marks who a feature's median and spread are taken over; evidence marks
+    who may be scored on it.
+    """
+    spend, usual, payments, refunds, topups, largest, off_hours, activity = raw.T
+    spend_per_day = spend / window_days
+    usual_per_day = usual / baseline_days
+    features = np.column_stack([
+        spend_per_day,
+        np.log1p(spend_per_day) - np.log1p(usual_per_day),
+        refunds / np.maximum(payments, 1),
+        topups,
+        largest,
+        off_hours / np.maximum(activity, 1),
+    ])
+    everyone = np.ones(len(raw), dtype=bool)
+    population = np.column_stack([everyone, usual > 0, payments > 0, everyone, topups > 0, activity > 0])
+    evidence = np.column_stack([everyone, usual > 0, refunds >= MIN_REFUNDS, everyone, topups > 0, off_hours >= MIN_OFF_HOURS])
+    return features, population, evidence
+
+
+def robust_z(features, population):
+    """Per-column robust z-scores of features against the median and MAD of each column's population
+
+    Falls back to the mean absolute deviation where more than half the population shares
+    one value (MAD of 0), and never scales by less than MIN_SPREAD.
+    """
+    z = np.zeros_like(features)
+    if not len(features):
+        return z
+    masked = np.where(population, features, np.nan)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # All-NaN columns (nobody in a population)
+        median = np.nanmedian(masked, axis=0)
+        deviation = np.abs(masked - median)
+        mad = np.nanmedian(deviation, axis=0)
+        mean_ad = np.nanmean(deviation, axis=0)
+    spread = np.where(mad > 0, MAD_SCALE * mad, MEAN_AD_SCALE * np.nan_to_num(mean_ad))
+    spread = np.maximum(spread, MIN_SPREAD)
+    scored = np.isfinite(median)
+    z[:, scored] = (features[:, scored] - median[scored]) / spread[scored]
+    return z
+
+
+def score_features(raw):
+    """(features, z) for load_wallet_features() rows; z is 0 wherever a student lacks evidence"""
+    features, population, evidence = build_features(raw)
+    z = np.where(evidence, robust_z(features, population), 0.0)
+    return features, np.maximum(z, 0.0)
+
+
+def _reasons(z_row):
+    flagged = np.flatnonzero(z_row >= ANOMALY_Z_THRESHOLD)
+    return ', '.join(
+        f"{FEATURE_LABELS[FEATURES[i]]} (z {z_row[i]:.1f})"
+        for i in flagged[np.argsort(-z_row[flagged])]
+    )
+
+
+def detect_anomalies(day=None):
+    """Score the window ending on day (default yesterday) and record flagged students.
+
+    Replaces that day's still-open flags; flags an admin already reviewed or dismissed
+    are kept. Returns {'day', 'students', 'flagged'}.
+    """
+    day = day or now_myt().date() - timedelta(days=1)
+    student_ids, raw = load_wallet_features(day)
+    features, z = score_features(raw)
+    scores = z.max(axis=1) if len(z) else np.zeros(0)
+    flagged = np.flatnonzero(scores >= ANOMALY_Z_THRESHOLD)
+
+    WalletAnomaly.query.filter_by(detected_on=day, status='open').delete(synchronize_session=False)
+    reviewed = {
+        student_id for (student_id,) in db.session.query(WalletAnomaly.student_id).filter_by(detected_on=day)
+    }
+    rows = [
+        {
+            'student_id': int(student_ids[i]),
+            'detected_on': day,
+            'score': round(float(scores[i]), 2),
+            'reasons': _reasons(z[i]),
+            **{name: round(float(features[i, f]), 4) for f, name in enumerate(FEATURES)},
+            'status': 'open',
+            'created_at': now_myt().replace(tzinfo=None),
+        }
+        for i in flagged
+        if int(student_ids[i]) not in reviewed
+    ]
+    if rows:
+        db.session.execute(insert(WalletAnomaly), rows)
+    return {'day': day, 'students': len(student_ids), 'flagged': len(rows)}